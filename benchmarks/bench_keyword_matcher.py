@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-keyword substring scans vs the compiled KeywordMatcher
+Run from the repository root: python benchmarks/bench_keyword_matcher.py
+"""
+
+import os
+import random
+import sys
+import time
+from typing import List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ted_matching import KeywordMatcher
+from ted_search_engine import IndustryTemplates
+
+VOCABULARY = sorted({
+    word.lower()
+    for template in IndustryTemplates.TEMPLATES.values()
+    for keyword in template['keywords']
+    for word in keyword.split()
+} | {'supply', 'of', 'for', 'the', 'services', 'framework', 'agreement', 'lot', 'municipal', 'regional'})
+
+
+def make_keywords(count: int, rng: random.Random) -> List[str]:
+    keywords = set()
+    while len(keywords) < count:
+        keywords.add(' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(1, 3))))
+    return sorted(keywords)
+
+
+def make_texts(count: int, rng: random.Random) -> List[Tuple[str, str]]:
+    return [
+        (' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(6, 16))).title(),
+         ' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(2, 5))).title())
+        for _ in range(count)
+    ]
+
+
+def legacy_count(keywords: List[str], title: str, buyer: str) -> int:
+    """The scan _calculate_relevance_score used before the matcher"""
+    title_lower = title.lower()
+    buyer_lower = buyer.lower()
+    return sum(1 for kw in keywords if kw.lower() in title_lower or kw.lower() in buyer_lower)
+
+
+def run(keyword_count: int, tenders: int, rng: random.Random) -> dict:
+    keywords = make_keywords(keyword_count, rng)
+    texts = make_texts(tenders, rng)
+
+    started = time.perf_counter()
+    expected = [legacy_count(keywords, title, buyer) for title, buyer in texts]
+    legacy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matcher = KeywordMatcher(keywords)
+    compile_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = [matcher.count_matches(title, buyer) for title, buyer in texts]
+    matcher_seconds = time.perf_counter() - started
+
+    assert actual == expected, "matcher results differ from the legacy scan"
+    return {
+        'keywords': keyword_count,
+        'tenders': tenders,
+        'legacy_us_per_tender': legacy_seconds / tenders * 1e6,
+        'matcher_us_per_tender': matcher_seconds / tenders * 1e6,
+        'compile_ms': compile_seconds * 1e3,
+        'speedup': legacy_seconds / matcher_seconds if matcher_seconds else float('inf')
+    }
+
+
+def main():
+    rng = random.Random(42)
+    tenders = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print("=" * 80)
+    print(f"Keyword matching benchmark ({tenders} tenders, identical results verified)")
+    print("=" * 80)
+    print(f"{'keywords':>9} {'legacy µs/tender':>18} {'matcher µs/tender':>18} {'compile ms':>11} {'speedup':>8}")
+    for count in (10, 100, 1000):
+        r = run(count, tenders, rng)
+        print(f"{r['keywords']:>9} {r['legacy_us_per_tender']:>18.2f} {r['matcher_us_per_tender']:>18.2f} "
+              f"{r['compile_ms']:>11.2f} {r['speedup']:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of TEDSearchEngine.search_tenders against the local mock API
+Each scenario runs the mock server and the engine in separate fresh processes and
+records throughput, CPU time per stage and peak memory as JSON.
+
+Run from the repository root:
+    python benchmarks/bench_search_pipeline.py                      # 1k, 100k, 1M notices
+    python benchmarks/bench_search_pipeline.py --sizes 1000,100000 --latency 0.02 --rate-429 0.05
+    python benchmarks/bench_search_pipeline.py --sizes 100000 --single-phase       # every field for every notice
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(BENCH_DIR)
+
+KEYWORDS = ['software', 'cloud', 'platform', 'digital']
+COUNTRIES = ['DE']
+PAGE_SIZE = 250
+
+
+def _run_server(ready, stop, corpus_size: int, hits_per_query: int, latency: float,
+                rate_429: float, retry_after: float):
+    from mock_ted_server import MockTEDServer
+
+    async def serve():
+        server = MockTEDServer(corpus_size=corpus_size, hits_per_query=hits_per_query,
+                               latency=latency, rate_429=rate_429, retry_after=retry_after)
+        ready.put(await server.start())
+        while not stop.is_set():
+            await asyncio.sleep(0.1)
+        ready.put({'requests': server.requests, 'throttled': server.throttled})
+        await server.stop()
+
+    asyncio.run(serve())
+
+
+def _run_engine(url: str, notices: int, concurrency: int, json_decoder: str, two_phase: bool, results):
+    # Per-page INFO logging would dominate the CPU profile
+    logging.basicConfig(level=logging.WARNING)
+    from ted_query_planner import QueryPlanner
+    from ted_search_engine import TEDSearchEngine
+
+    cpu = {'plan': 0.0, 'process_and_score': 0.0}
+
+    class InstrumentedEngine(TEDSearchEngine):
+        def _build_search_queries(self, *args, **kwargs):
+            started = time.process_time()
+            try:
+                return super()._build_search_queries(*args, **kwargs)
+            finally:
+                cpu['plan'] += time.process_time() - started
+
+        def _process_and_score_results(self, *args, **kwargs):
+            started = time.process_time()
+            try:
+                return super()._process_and_score_results(*args, **kwargs)
+            finally:
+                cpu['process_and_score'] += time.process_time() - started
+
+    per_query = math.ceil(notices / len(KEYWORDS))
+
+    async def search():
+        # One query per keyword, each paging through its share of the notices
+        engine = InstrumentedEngine(
+            max_concurrency=concurrency, connection_limit=concurrency * 2,
+            requests_per_second=10000, page_size=PAGE_SIZE, json_decoder=json_decoder, two_phase=two_phase,
+            max_pages_per_query=math.ceil(per_query / PAGE_SIZE),
+            planner=QueryPlanner(max_clauses=1 + len(COUNTRIES),
+                                 max_pages_per_query=math.ceil(per_query / PAGE_SIZE))
+        )
+        engine.api_url = url
+        async with engine:
+            top = await engine.search_tenders(KEYWORDS, [], COUNTRIES, 2024, 2024, max_results=100)
+        return top, engine.metrics
+
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    top, metrics = asyncio.run(search())
+    wall = time.perf_counter() - wall_started
+    cpu_total = time.process_time() - cpu_started
+
+    results.put({
+        'wall_seconds': round(wall, 3),
+        'cpu_seconds': {
+            'total': round(cpu_total, 3),
+            'plan': round(cpu['plan'], 4),
+            'process_and_score': round(cpu['process_and_score'], 3),
+            # HTTP, JSON decoding, deduplication and top-K ranking
+            'fetch_decode_rank': round(cpu_total - cpu['plan'] - cpu['process_and_score'], 3)
+        },
+        # Wall time per stage as reported by the engine's own run metrics
+        'stage_seconds': metrics.timing()['stage_seconds'],
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'bytes_received': metrics.counters.get('bytes_received', 0),
+        'details_fetched': metrics.counters.get('enriched', 0),
+        'results': len(top)
+    })
+
+
+def run_scenario(notices: int, latency: float, rate_429: float, retry_after: float,
+                 concurrency: int, json_decoder: str = 'auto', two_phase: bool = True) -> Dict:
+    ctx = multiprocessing.get_context('spawn')
+    ready, stop, results = ctx.Queue(), ctx.Event(), ctx.Queue()
+
+    # Corpus larger than the hits, so the keyword queries barely overlap
+    per_query = math.ceil(notices / len(KEYWORDS))
+    server = ctx.Process(target=_run_server, args=(
+        ready, stop, notices * len(KEYWORDS), per_query, latency, rate_429, retry_after
+    ))
+    server.start()
+    url = ready.get(timeout=30)
+
+    try:
+        engine = ctx.Process(target=_run_engine, args=(url, notices, concurrency, json_decoder, two_phase, results))
+        engine.start()
+        measured = results.get()
+        engine.join()
+    finally:
+        stop.set()
+        server_stats = ready.get(timeout=30)
+        server.join()
+
+    fetched = per_query * len(KEYWORDS)
+    return {
+        'notices': notices,
+        'notices_fetched': fetched,
+        'latency_seconds': latency,
+        'rate_429': rate_429,
+        'concurrency': concurrency,
+        'json_decoder': json_decoder,
+        'two_phase': two_phase,
+        'api_requests': server_stats['requests'],
+        'throttled_requests': server_stats['throttled'],
+        **measured,
+        'notices_per_second': round(fetched / measured['wall_seconds'], 1) if measured['wall_seconds'] else None
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(BENCH_DIR),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='search_tenders end-to-end benchmark')
+    parser.add_argument('--sizes', default='1000,100000,1000000', help='comma-separated notice counts')
+    parser.add_argument('--latency', type=float, default=0.0, help='mock API latency per request (s)')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--retry-after', type=float, default=0.0)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--json-decoder', default='auto', choices=['auto', 'orjson', 'stdlib', 'incremental'])
+    parser.add_argument('--single-phase', action='store_true', help='fetch every field for every notice')
+    parser.add_argument('--output', default=None, help='JSON results path (default: benchmarks/results/...)')
+    args = parser.parse_args()
+
+    sizes: List[int] = [int(s) for s in args.sizes.split(',') if s.strip()]
+    report = {
+        'benchmark': 'search_pipeline',
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scenarios': []
+    }
+
+    print(f"{'notices':>9} {'wall s':>8} {'notices/s':>10} {'cpu s':>7} {'process s':>10} "
+          f"{'fetch+rank s':>13} {'peak MB':>8} {'MB recv':>8} {'429s':>5}")
+    for size in sizes:
+        scenario = run_scenario(size, args.latency, args.rate_429, args.retry_after, args.concurrency,
+                                args.json_decoder, not args.single_phase)
+        report['scenarios'].append(scenario)
+        cpu = scenario['cpu_seconds']
+        print(f"{size:>9} {scenario['wall_seconds']:>8.2f} {scenario['notices_per_second']:>10.0f} "
+              f"{cpu['total']:>7.2f} {cpu['process_and_score']:>10.2f} {cpu['fetch_decode_rank']:>13.2f} "
+              f"{scenario['peak_rss_mb']:>8.1f} {scenario['bytes_received'] / 1e6:>8.1f} "
+              f"{scenario['throttled_requests']:>5}", flush=True)
+
+    output = args.output or os.path.join(
+        BENCH_DIR, 'results', f"search_pipeline-{report['commit'] or 'local'}-{datetime.now():%Y%m%dT%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: processed tenders as dataset dicts vs slotted Tender records
+Run from the repository root: python benchmarks/bench_tender_memory.py
+"""
+
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+from typing import Dict, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ted_models import SearchMeta, StringPool
+from ted_query_planner import COUNTRY_MAPPING
+from ted_search_engine import TEDSearchEngine, IndustryTemplates
+
+COUNTRIES = sorted(COUNTRY_MAPPING.values())
+CPV_CODES = sorted({code for template in IndustryTemplates.TEMPLATES.values() for code in template['cpv_codes']})
+
+
+def make_notices(count: int, rng: random.Random) -> List[Tuple[Dict, SearchMeta]]:
+    """Decoded API notices with per-page search metadata; buyers, countries and CPV codes repeat like real result sets"""
+    buyers = [f"Municipality of Town {i}" for i in range(max(1, count // 20))]
+    notices = []
+    for i in range(count):
+        if i % 100 == 0:
+            group, timestamp = json.loads(json.dumps([['software', 'cloud', 'data'], '2024-05-02T08:00:00.000000']))
+            meta = SearchMeta('keyword', tuple(group), timestamp)
+        # Round-trip through JSON so no string is shared by construction
+        notices.append((json.loads(json.dumps({
+            'publication-number': f"{100000 + i}-2024",
+            'notice-title': {'eng': f"Framework agreement for software services lot {i}"},
+            'buyer-name': {'eng': [rng.choice(buyers)]},
+            'buyer-country': [rng.choice(COUNTRIES)],
+            'publication-date': '2024-05-01+02:00',
+            'deadline-receipt': '2030-06-01T12:00:00Z',
+            'classification-cpv': [{'cpv-code': rng.choice(CPV_CODES)} for _ in range(rng.randint(1, 3))],
+            'notice-type': rng.choice(['cn-standard', 'can-standard', 'pin-only']),
+            'value-eur': rng.randint(10000, 5000000),
+            'links': [{'href': f"https://ted.europa.eu/notice/{100000 + i}-2024/pdf", 'type': 'pdf'}]
+        })), meta))
+    return notices
+
+
+class UnpooledStrings(StringPool):
+    """Keeps every decoded string, like the dict records did"""
+
+    def intern(self, value):
+        return value
+
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    records = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return size
+
+
+def main():
+    rng = random.Random(42)
+    count = 20000
+    keywords = IndustryTemplates.get_keywords('it-software')
+    engine = TEDSearchEngine(batch_size=0)
+
+    def tenders():
+        notices = make_notices(count, rng)
+        records = [engine._process_result(n, keywords, [], [], False, 0, True, meta) for n, meta in notices]
+        del notices
+        return records
+
+    def dicts():
+        return [tender.to_dict() for tender in tenders()]
+
+    for name, build, strings in (('dict records', dicts, UnpooledStrings()),
+                                 ('Tender records', tenders, StringPool())):
+        engine.strings = strings
+        size = measure(build)
+        print(f"{name:>15}: {size / count:7.0f} bytes/tender")
+
+
+if __name__ == '__main__':
+    main()
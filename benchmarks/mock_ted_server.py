@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Local mock of the TED v3 search endpoint (POST /v3/notices/search)
+Serves deterministic synthetic notices shaped like real responses, with
+configurable latency, result size and 429 rate. Only the requested fields
+are returned, and "publication-number IN (...)" queries look notices up.
+
+Standalone: python benchmarks/mock_ted_server.py --notices 100000 --port 8765
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import zlib
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+COUNTRIES = ['DEU', 'FRA', 'ITA', 'ESP', 'NLD', 'AUT', 'BEL', 'POL', 'SWE', 'DNK', 'FIN', 'CZE']
+LANGUAGES = ['eng', 'deu', 'fra', 'ita', 'spa']
+CPV_CODES = [
+    '72000000', '72200000', '72212000', '48000000', '79400000', '45000000', '45200000',
+    '33100000', '71300000', '90500000', '80500000', '60100000', '09300000', '73000000'
+]
+TITLE_WORDS = [
+    'software', 'development', 'cloud', 'services', 'framework', 'agreement', 'consulting',
+    'construction', 'renovation', 'medical', 'equipment', 'training', 'transport', 'energy',
+    'maintenance', 'supply', 'digital', 'platform', 'infrastructure', 'waste', 'management'
+]
+NOTICE_TYPES = ['cn-standard', 'can-standard', 'pin-only', 'cn-social']
+
+# Query form of a lookup by publication numbers
+LOOKUP_PREFIX = 'publication-number IN ('
+
+
+def make_notice(index: int) -> Dict:
+    """Synthetic notice number index, identical on every call"""
+    words = [TITLE_WORDS[(index * 7 + k * 13) % len(TITLE_WORDS)] for k in range(4 + index % 5)]
+    title = ' '.join(words).capitalize()
+    languages = LANGUAGES[:1 + index % 3]
+    day = 1 + index % 28
+    month = 1 + (index // 28) % 12
+    return {
+        'publication-number': f"{index:08d}-2024",
+        'notice-identifier': f"{index:08x}-0000-4000-8000-000000000000",
+        'notice-title': {lang: f"{title} ({lang}) lot {index % 50}" for lang in languages},
+        'buyer-name': {languages[-1]: [f"Contracting authority {index % 997}"]},
+        'buyer-country': [COUNTRIES[index % len(COUNTRIES)]],
+        'publication-date': f"2024-{month:02d}-{day:02d}+01:00",
+        'deadline-receipt': f"{2023 + index % 5}-{month:02d}-{day:02d}T12:00:00Z",
+        'classification-cpv': [
+            {'cpv-code': CPV_CODES[(index + k) % len(CPV_CODES)]} for k in range(1 + index % 3)
+        ],
+        'notice-type': NOTICE_TYPES[index % len(NOTICE_TYPES)],
+        'value-eur': (index * 7919) % 5000000,
+        'links': [{'href': f"https://ted.europa.eu/en/notice/-/detail/{index:08d}-2024", 'type': 'html'}]
+    }
+
+
+class MockTEDServer:
+    """aiohttp app answering search requests from a virtual corpus
+
+    Every query matches `hits_per_query` notices (capped at the corpus
+    size), taken from the corpus at an offset derived from the query text,
+    so different queries overlap the way real OR-groups do.
+    """
+
+    def __init__(self, corpus_size: int = 10000, hits_per_query: Optional[int] = None,
+                 latency: float = 0.0, rate_429: float = 0.0, retry_after: float = 0.0,
+                 seed: int = 42):
+        self.corpus_size = max(1, corpus_size)
+        self.hits_per_query = min(self.corpus_size, hits_per_query or self.corpus_size)
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.requests = 0
+        self.throttled = 0
+        self._rng = random.Random(seed)
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ''
+
+    def _query_offset(self, query: str) -> int:
+        base = query.split(' SORT BY')[0]
+        return zlib.crc32(base.encode('utf-8')) % self.corpus_size
+
+    async def handle_search(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.rate_429 and self._rng.random() < self.rate_429:
+            self.throttled += 1
+            return web.Response(status=429, headers={'Retry-After': str(self.retry_after)})
+
+        body = await request.json()
+        page = max(1, int(body.get('page', 1)))
+        limit = max(1, min(250, int(body.get('limit', 10))))
+        query = body.get('query', '')
+
+        if query.startswith(LOOKUP_PREFIX):
+            numbers = query[len(LOOKUP_PREFIX):].rstrip(')').split()
+            indexes = [int(n.split('-')[0]) for n in numbers if n.split('-')[0].isdigit()]
+            notices: List[Dict] = [make_notice(i) for i in indexes if i < self.corpus_size][:limit]
+            total = len(notices)
+        else:
+            offset = self._query_offset(query)
+            start = (page - 1) * limit
+            end = min(self.hits_per_query, start + limit)
+            notices = [make_notice((offset + i) % self.corpus_size) for i in range(start, end)]
+            total = self.hits_per_query
+
+        fields = body.get('fields')
+        if fields:
+            notices = [{k: v for k, v in notice.items() if k in fields} for notice in notices]
+        payload = {'notices': notices, 'totalNoticeCount': total}
+        return web.Response(body=json.dumps(payload, separators=(',', ':')), content_type='application/json')
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post('/v3/notices/search', self.handle_search)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{bound_port}/v3/notices/search"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def _serve_forever(args):
+    server = MockTEDServer(
+        corpus_size=args.notices, hits_per_query=args.hits_per_query,
+        latency=args.latency, rate_429=args.rate_429, retry_after=args.retry_after
+    )
+    url = await server.start(args.host, args.port)
+    print(f"Mock TED search API listening on {url}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--notices', type=int, default=10000, help='corpus size')
+    parser.add_argument('--hits-per-query', type=int, default=None)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per request')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--retry-after', type=float, default=0.0)
+    try:
+        asyncio.run(_serve_forever(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -9,17 +9,402 @@ import asyncio
 import logging
 import sys
 import os
+import re
+import signal
+import time
 from datetime import datetime
-from apify import Actor
+from typing import Any, AsyncIterator, Dict, List, Optional
+from apify import Actor, Event
 
 # Add the parent directory to the Python path to import ted_search_engine
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from ted_search_engine import TEDSearchEngine, IndustryTemplates
+from ted_cache import ResponseCache
+from ted_dedup import SeenHistory, open_seen_history
+from ted_documents import DocumentFetcher
+from ted_export import export_files, open_export_writer
+from ted_metrics import CProfileHook, RunMetrics
+from ted_models import Tender
+from ted_profiles import SearchProfile
+from ted_pushdown import PushdownCapabilities
+from ted_query_planner import QueryPlanner
+from ted_state import CrawlState, KeyValueStateStore, LocalStateStore
+from ted_store import NoticeStore
+from ted_watch import QueryWatcher
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Named key-value store that survives between runs (the default store is per run)
+STATE_STORE_NAME = 'ted-tender-crawler'
+
+# Response cache file and the record it is persisted in
+CACHE_PATH = 'storage/ted_response_cache.sqlite'
+CACHE_KEY = 'RESPONSE_CACHE'
+
+# Local notice store file and the record it is persisted in
+NOTICE_STORE_PATH = 'storage/ted_notices.sqlite'
+NOTICE_STORE_KEY = 'NOTICE_STORE'
+
+# Cross-run dedup history files and the records they are persisted in
+DEDUP_PATHS = {'bloom': 'storage/ted_seen.bloom', 'disk': 'storage/ted_seen.sqlite'}
+DEDUP_KEYS = {'bloom': 'DEDUP_HISTORY_BLOOM', 'disk': 'DEDUP_HISTORY_DISK'}
+
+# Record holding the filter predicates the API was last probed to support
+PUSHDOWN_KEY = 'PUSHDOWN_CAPABILITIES'
+
+# Working directory for document downloads saved to the key-value store
+DOCUMENT_PATH = 'storage/documents'
+
+# Directory for cProfile dumps of profiled stages
+PROFILE_DIRECTORY = 'storage/profiles'
+
+
+class SearchSummary:
+    """Running summary statistics, so results never need to be held in memory"""
+    
+    def __init__(self):
+        self.total = 0
+        self.score_sum = 0
+        self.high_relevance = 0
+        self.active = 0
+        self.new = 0
+        self.updated = 0
+    
+    def add(self, result: Tender):
+        self.total += 1
+        if result.change_type == 'new':
+            self.new += 1
+        elif result.change_type == 'updated':
+            self.updated += 1
+        self.score_sum += result.relevance_score
+        if result.relevance_score > 70:
+            self.high_relevance += 1
+        if result.status == 'active':
+            self.active += 1
+    
+    @property
+    def average_score(self) -> float:
+        return self.score_sum / self.total if self.total else 0.0
+
+
+async def _iterate(items: List[Tender]) -> AsyncIterator[Tender]:
+    for item in items:
+        yield item
+
+
+async def _take(records: AsyncIterator[Tender], limit: int) -> AsyncIterator[Tender]:
+    """Stop a record stream after limit items"""
+    if limit <= 0:
+        return
+    count = 0
+    async for record in records:
+        yield record
+        count += 1
+        if count >= limit:
+            break
+    await records.aclose()
+
+
+async def push_in_batches(records: AsyncIterator[Tender], batch_size: int,
+                          summary: SearchSummary, state: Optional[CrawlState] = None,
+                          exporter=None, metrics: Optional[RunMetrics] = None,
+                          history: Optional[SeenHistory] = None, dataset=None,
+                          documents: Optional[DocumentFetcher] = None) -> int:
+    """Push records to the dataset (and export file) in batches as they are produced
+    
+    Tenders count as emitted (state, history, export) only once their batch
+    is pushed, so an interrupted push leaves the rest to be emitted again.
+    """
+    metrics = metrics or RunMetrics()
+    if documents is not None:
+        # Each batch's documents are downloaded before its tenders are pushed
+        records = documents.attach(records, batch_size)
+    batch = []
+    pending: List[Tender] = []
+    export_seconds = 0.0
+    
+    async def flush():
+        nonlocal export_seconds
+        started = time.perf_counter()
+        if dataset is not None:
+            await dataset.push_data(batch)
+        else:
+            await Actor.push_data(batch)
+        metrics.add_time('push', time.perf_counter() - started)
+        for record in pending:
+            summary.add(record)
+            if state is not None:
+                state.mark_emitted(record)
+            if history is not None:
+                history.add(record.notice_id)
+        if exporter is not None:
+            started = time.perf_counter()
+            for record in pending:
+                exporter.write(record)
+            export_seconds += time.perf_counter() - started
+        Actor.log.info(f"Pushed {summary.total} tenders")
+    
+    async for record in records:
+        pending.append(record)
+        batch.append(record.to_dict())
+        if len(batch) >= batch_size:
+            await flush()
+            batch, pending = [], []
+    
+    if batch:
+        await flush()
+    if exporter is not None:
+        metrics.add_time('export', export_seconds, calls=summary.total)
+    return summary.total
+
+
+async def store_export(exporter) -> List[str]:
+    """Close an export and save its files to the key-value store
+
+    Run-level exports go to the default store; exports that accumulate
+    across runs (Parquet) go to the named store.
+    """
+    exporter.close()
+    if exporter.persistent:
+        store = await Actor.open_key_value_store(name=STATE_STORE_NAME)
+    else:
+        store = await Actor.open_key_value_store()
+    
+    keys = []
+    for path, key in export_files(exporter):
+        with open(path, 'rb') as f:
+            # The platform client streams the open file instead of loading it
+            await store.set_value(key, f if Actor.is_at_home() else f.read(), content_type=exporter.content_type)
+        keys.append(key)
+    Actor.log.info(f"Saved {exporter.rows} tenders to {len(keys)} key-value store record(s)")
+    return keys
+
+
+async def restore_file(path: str, key: str):
+    """Copy a persisted file from the named key-value store unless it exists locally"""
+    if os.path.exists(path):
+        return
+    store = await Actor.open_key_value_store(name=STATE_STORE_NAME)
+    snapshot = await store.get_value(key)
+    if snapshot:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(snapshot)
+
+
+async def persist_file(path: str, key: str):
+    """Save a local file to the named key-value store for the next run"""
+    store = await Actor.open_key_value_store(name=STATE_STORE_NAME)
+    with open(path, 'rb') as f:
+        await store.set_value(key, f.read(), content_type='application/octet-stream')
+
+
+async def open_document_fetcher(directory: Optional[str], max_concurrency: int, per_host_limit: int,
+                                max_document_mb: float, metrics: RunMetrics) -> DocumentFetcher:
+    """Document downloader keeping files in directory, or saving them to the default key-value store"""
+    if not directory:
+        store = await Actor.open_key_value_store()
+        
+        async def store_sink(key: str, path: str, content_type: str):
+            with open(path, 'rb') as f:
+                # The platform client streams the open file instead of loading it
+                await store.set_value(key, f if Actor.is_at_home() else f.read(),
+                                      content_type=content_type or 'application/octet-stream')
+        sink = store_sink
+    else:
+        sink = None
+    return DocumentFetcher(
+        directory or DOCUMENT_PATH, sink=sink, max_concurrency=max_concurrency,
+        per_host_limit=per_host_limit, max_bytes=int(max_document_mb * 1024 * 1024), metrics=metrics
+    )
+
+
+async def open_response_cache(ttl_seconds: float, max_entries: int) -> ResponseCache:
+    """Restore the response cache from the key-value store and open it"""
+    await restore_file(CACHE_PATH, CACHE_KEY)
+    return ResponseCache(CACHE_PATH, ttl_seconds=ttl_seconds, max_entries=max_entries)
+
+
+async def save_response_cache(cache: ResponseCache):
+    """Close the response cache and persist it for the next run"""
+    stats = cache.stats()
+    Actor.log.info(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+    cache.close()
+    await persist_file(cache.path, CACHE_KEY)
+
+
+async def open_notice_store(path: Optional[str]) -> NoticeStore:
+    """Open the local notice store, restoring the default one from the key-value store"""
+    if not path:
+        await restore_file(NOTICE_STORE_PATH, NOTICE_STORE_KEY)
+    return NoticeStore(path or NOTICE_STORE_PATH)
+
+
+async def save_notice_store(store: NoticeStore, persist: bool):
+    """Close the notice store, persisting it when it lives in the default location"""
+    stats = store.stats()
+    Actor.log.info(
+        f"Local notice store: {stats['notices']} notices "
+        f"({stats['oldest_publication']} to {stats['newest_publication']})"
+    )
+    store.close()
+    if persist:
+        await persist_file(store.path, NOTICE_STORE_KEY)
+
+
+async def save_metrics(metrics: RunMetrics, prometheus: bool, profiler: Optional[CProfileHook]):
+    """Save run metrics (and stage profiles) to the default key-value store"""
+    metrics.finish()
+    timing = metrics.timing()
+    Actor.log.info(
+        f"Run took {timing['total_seconds']}s: {timing['requests']} requests, "
+        f"{timing['retries']} retries, {timing['notices_per_second']} notices/s"
+    )
+    Actor.log.info(f"Stage seconds: {timing['stage_seconds']}")
+    await Actor.set_value('METRICS', metrics.to_dict())
+    if prometheus:
+        await Actor.set_value('METRICS_PROMETHEUS', metrics.to_prometheus(),
+                              content_type='text/plain; version=0.0.4')
+    if profiler is not None:
+        store = await Actor.open_key_value_store()
+        for path in profiler.dump():
+            stage = os.path.splitext(os.path.basename(path))[0]
+            with open(path, 'rb') as f:
+                await store.set_value(f"PROFILE_{stage.upper()}", f.read(), content_type='application/octet-stream')
+        Actor.log.info(f"Saved cProfile stats for stages: {', '.join(profiler.profiles)}")
+
+
+async def open_dedup_history(kind: str, capacity: int, error_rate: float,
+                             max_memory_mb: float) -> SeenHistory:
+    """Restore the cross-run dedup history from the key-value store and open it"""
+    await restore_file(DEDUP_PATHS[kind], DEDUP_KEYS[kind])
+    history = open_seen_history(
+        kind, DEDUP_PATHS[kind], capacity=capacity, error_rate=error_rate,
+        max_memory_bytes=int(max_memory_mb * 1024 * 1024) if max_memory_mb else None
+    )
+    Actor.log.info(f"Dedup history: {history.stats()}")
+    return history
+
+
+async def save_dedup_history(history: SeenHistory, kind: str):
+    """Commit the dedup history and persist it for the next run"""
+    history.save()
+    Actor.log.info(f"Dedup history: {history.stats()}")
+    history.close()
+    await persist_file(history.path, DEDUP_KEYS[kind])
+
+
+async def load_pushdown_capabilities() -> Optional[PushdownCapabilities]:
+    """Filter capabilities probed by a recent run, if not yet stale"""
+    store = await Actor.open_key_value_store(name=STATE_STORE_NAME)
+    capabilities = PushdownCapabilities.from_dict(await store.get_value(PUSHDOWN_KEY))
+    if capabilities is None or not capabilities.is_fresh():
+        return None
+    return capabilities
+
+
+async def save_pushdown_capabilities(capabilities: PushdownCapabilities):
+    """Keep freshly probed filter capabilities for the next runs"""
+    store = await Actor.open_key_value_store(name=STATE_STORE_NAME)
+    await store.set_value(PUSHDOWN_KEY, capabilities.to_dict())
+
+
+def apply_template(settings: Dict[str, Any]):
+    """Replace searchKeywords and cpvCodes with those of the settings' industryTemplate"""
+    template = settings.get('industryTemplate', 'custom')
+    if template == 'custom':
+        return
+    template_keywords = IndustryTemplates.get_keywords(template)
+    template_cpv = IndustryTemplates.get_cpv_codes(template)
+    if template_keywords:
+        settings['searchKeywords'] = template_keywords
+    if template_cpv:
+        settings['cpvCodes'] = template_cpv
+
+
+def build_profiles(entries: List[Dict[str, Any]], defaults: Dict[str, Any]) -> List[SearchProfile]:
+    """Search profiles from the profiles input; unset fields fall back to the top-level input"""
+    profiles = []
+    names = set()
+    for i, entry in enumerate(entries):
+        settings = dict(entry)
+        apply_template(settings)
+        settings = dict(defaults, **settings)
+        name = str(settings.get('name') or f"profile-{i + 1}")
+        if name in names:
+            raise ValueError(f"Duplicate profile name: {name}")
+        names.add(name)
+        profiles.append(SearchProfile(
+            name=name,
+            keywords=settings['searchKeywords'],
+            cpv_codes=settings['cpvCodes'],
+            countries=settings['countries'],
+            year_from=settings['yearFrom'],
+            year_to=settings['yearTo'],
+            active_only=settings['activeOnly'],
+            min_value=settings['minValue'],
+            max_results=settings['maxResults'],
+            include_documents=settings['includeDocuments'],
+            scoring_criteria=entry.get('scoringCriteria', {})
+        ))
+    return profiles
+
+
+def profile_slug(name: str) -> str:
+    """Storage-safe form of a profile name"""
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'profile'
+
+
+async def push_profiles(results: Dict[str, List[Tender]], push_batch_size: int, output_format: str,
+                        export_directory: str, metrics: RunMetrics,
+                        documents: Optional[DocumentFetcher] = None) -> List[Dict[str, Any]]:
+    """Push each profile's tenders to its own dataset (and export); returns per-profile summaries"""
+    summaries = []
+    for name, tenders in results.items():
+        slug = profile_slug(name)
+        # Run-scoped dataset, like the default one (aliases need apify 3.0)
+        dataset = await Actor.open_dataset(alias=f"profile-{slug}")
+        summary = SearchSummary()
+        exporter = open_export_writer(output_format, export_directory, name=f"tenders_{slug}")
+        await push_in_batches(_iterate(tenders), push_batch_size, summary, exporter=exporter,
+                              metrics=metrics, dataset=dataset, documents=documents)
+        if exporter is not None:
+            started = time.perf_counter()
+            await store_export(exporter)
+            metrics.add_time('export', time.perf_counter() - started)
+        Actor.log.info(f"Profile {name}: {summary.total} tenders pushed to dataset {dataset.id}")
+        summaries.append({
+            'profile': name,
+            'dataset_id': dataset.id,
+            'total_found': summary.total,
+            'average_score': round(summary.average_score, 1),
+            'high_relevance_count': summary.high_relevance,
+            'active_count': summary.active
+        })
+    return summaries
+
+
+def stop_on_shutdown(watcher: QueryWatcher):
+    """Stop watch mode on SIGINT/SIGTERM and when the platform aborts or migrates the run"""
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, watcher.stop)
+        except (NotImplementedError, RuntimeError):
+            pass  # No signal handlers outside the main thread or on Windows
+    Actor.on(Event.ABORTING, lambda _: watcher.stop())
+    Actor.on(Event.MIGRATING, lambda _: watcher.stop())
+
+
+async def open_state_store(state_key: str, state_directory: Optional[str]):
+    """Local directory stand-in if configured, otherwise the named key-value store"""
+    if state_directory:
+        return LocalStateStore(state_directory, key=state_key)
+    store = await Actor.open_key_value_store(name=STATE_STORE_NAME)
+    return KeyValueStateStore(store, key=state_key)
+
 
 async def main():
     async with Actor:
@@ -31,16 +416,8 @@ async def main():
         
         # Apply industry template if specified
         if actor_input.get('industryTemplate', 'custom') != 'custom':
-            template = actor_input['industryTemplate']
-            Actor.log.info(f"Applying industry template: {template}")
-            
-            template_keywords = IndustryTemplates.get_keywords(template)
-            template_cpv = IndustryTemplates.get_cpv_codes(template)
-            
-            if template_keywords:
-                actor_input['searchKeywords'] = template_keywords
-            if template_cpv:
-                actor_input['cpvCodes'] = template_cpv
+            Actor.log.info(f"Applying industry template: {actor_input['industryTemplate']}")
+            apply_template(actor_input)
         
         # Validate and set defaults
         search_keywords = actor_input.get('searchKeywords', ['consulting', 'services'])
@@ -52,7 +429,46 @@ async def main():
         min_value = actor_input.get('minValue', 0)
         max_results = actor_input.get('maxResults', 100)
         output_format = actor_input.get('outputFormat', 'json')
+        export_directory = actor_input.get('exportDirectory', 'storage/exports')
         include_documents = actor_input.get('includeDocuments', True)
+        download_documents = actor_input.get('downloadDocuments', False)
+        document_concurrency = actor_input.get('documentConcurrency', 8)
+        documents_per_host = actor_input.get('documentsPerHost', 2)
+        max_document_mb = actor_input.get('maxDocumentMb', 50)
+        document_directory = actor_input.get('documentDirectory')
+        max_concurrency = actor_input.get('maxConcurrency', 4)
+        connection_limit = actor_input.get('connectionLimit', 10)
+        stream_results = actor_input.get('streamResults', False)
+        push_batch_size = max(1, actor_input.get('pushBatchSize', 100))
+        dry_run = actor_input.get('dryRun', False)
+        collapse_cpv_codes = actor_input.get('collapseCpvCodes', True)
+        expand_cpv_codes = actor_input.get('expandCpvCodes', False)
+        shard_by_date = actor_input.get('shardByDate', False)
+        batch_size = actor_input.get('batchSize', 500)
+        filter_pushdown = actor_input.get('filterPushdown', True)
+        two_phase = actor_input.get('twoPhaseRetrieval', True)
+        json_decoder = actor_input.get('jsonDecoder', 'auto')
+        dedup_history_kind = actor_input.get('dedupHistory', 'off')
+        dedup_capacity = actor_input.get('dedupCapacity', 5000000)
+        dedup_error_rate = actor_input.get('dedupErrorRate', 0.001)
+        dedup_max_memory_mb = actor_input.get('dedupMaxMemoryMb', 0)
+        incremental = actor_input.get('incremental', False)
+        watch = actor_input.get('watch', False)
+        watch_interval_minutes = actor_input.get('watchIntervalMinutes', 15)
+        watch_budget_minutes = actor_input.get('watchBudgetMinutes', 0)
+        state_key = actor_input.get('stateKey', 'CRAWL_STATE')
+        state_directory = actor_input.get('stateDirectory')
+        use_cache = actor_input.get('useCache', False)
+        cache_ttl_minutes = actor_input.get('cacheTtlMinutes', 60)
+        cache_max_entries = actor_input.get('cacheMaxEntries', 10000)
+        use_local_store = actor_input.get('useLocalStore', False)
+        search_local_store = actor_input.get('searchLocalStore', False)
+        local_store_path = actor_input.get('localStorePath')
+        requests_per_second = actor_input.get('requestsPerSecond', 2.0)
+        metrics_prometheus = actor_input.get('metricsPrometheus', False)
+        profile_stages = actor_input.get('profileStages', [])
+        max_retries = actor_input.get('maxRetries', 5)
+        max_pages_per_query = actor_input.get('maxPagesPerQuery', 10)
         scoring_criteria = actor_input.get('scoringCriteria', {
             'keywordMatch': 40,
             'cpvMatch': 30, 
@@ -60,6 +476,34 @@ async def main():
             'valueMatch': 10
         })
         
+        # Batch of search profiles sharing one fetch plan
+        profiles = None
+        if actor_input.get('profiles'):
+            profiles = build_profiles(actor_input['profiles'], {
+                'searchKeywords': search_keywords, 'cpvCodes': cpv_codes, 'countries': countries,
+                'yearFrom': year_from, 'yearTo': year_to, 'activeOnly': active_only,
+                'minValue': min_value, 'maxResults': max_results, 'includeDocuments': include_documents
+            })
+            Actor.log.info(f"Profiles: {', '.join(p.name for p in profiles)}")
+            unsupported = [name for name, enabled in (
+                ('incremental', incremental), ('dedupHistory', dedup_history_kind != 'off'),
+                ('streamResults', stream_results), ('searchLocalStore', search_local_store)
+            ) if enabled]
+            if unsupported:
+                Actor.log.warning(f"Ignoring {', '.join(unsupported)}: not supported with profiles")
+                incremental = stream_results = search_local_store = False
+                dedup_history_kind = 'off'
+            if watch:
+                Actor.log.warning("Ignoring watch: not supported with profiles")
+                watch = False
+        
+        # Watch mode polls incrementally and must see fresh responses
+        if watch:
+            incremental = True
+            if use_cache or search_local_store:
+                Actor.log.warning("Ignoring useCache and searchLocalStore in watch mode")
+                use_cache = search_local_store = False
+        
         # Log search parameters
         Actor.log.info(f"Search Keywords: {search_keywords}")
         Actor.log.info(f"CPV Codes: {cpv_codes}")
@@ -68,14 +512,118 @@ async def main():
         Actor.log.info(f"Active Only: {active_only}")
         Actor.log.info(f"Max Results: {max_results}")
         
+        # Load state from previous runs for incremental mode
+        state_store = crawl_state = None
+        if incremental:
+            if not watch:
+                Actor.log.info("Incremental mode: maxResults is not applied, every new or updated tender is pushed")
+            state_store = await open_state_store(state_key, state_directory)
+            crawl_state = await state_store.load()
+            Actor.log.info(
+                f"Incremental mode: {len(crawl_state.watermarks)} query watermarks, "
+                f"{len(crawl_state.emitted)} notices already emitted"
+            )
+        
+        # Run metrics, with cProfile around the requested stages
+        profiler = CProfileHook(profile_stages, PROFILE_DIRECTORY) if profile_stages else None
+        metrics = RunMetrics(span_hooks=[profiler] if profiler else None)
+        
         # Initialize search engine
-        search_engine = TEDSearchEngine()
+        response_cache = None
+        if use_cache:
+            response_cache = await open_response_cache(cache_ttl_minutes * 60, cache_max_entries)
+        
+        notice_store = None
+        if use_local_store or search_local_store:
+            notice_store = await open_notice_store(local_store_path)
+        
+        dedup_history = None
+        if dedup_history_kind != 'off' and not dry_run:
+            dedup_history = await open_dedup_history(
+                dedup_history_kind, dedup_capacity, dedup_error_rate, dedup_max_memory_mb
+            )
+        
+        documents = None
+        if download_documents and not dry_run:
+            if include_documents or profiles:
+                documents = await open_document_fetcher(
+                    document_directory, document_concurrency, documents_per_host, max_document_mb, metrics
+                )
+            else:
+                Actor.log.warning("Ignoring downloadDocuments: includeDocuments is off")
+        
+        pushdown_capabilities = None
+        if filter_pushdown:
+            pushdown_capabilities = await load_pushdown_capabilities()
+        
+        search_engine = TEDSearchEngine(
+            max_concurrency=max_concurrency,
+            connection_limit=connection_limit,
+            requests_per_second=requests_per_second,
+            max_retries=max_retries,
+            max_pages_per_query=max_pages_per_query,
+            cache=response_cache,
+            store=notice_store,
+            shard_by_date=shard_by_date,
+            batch_size=batch_size,
+            metrics=metrics,
+            json_decoder=json_decoder,
+            dedup_history=dedup_history,
+            filter_pushdown=filter_pushdown,
+            pushdown_capabilities=pushdown_capabilities,
+            two_phase=two_phase,
+            planner=QueryPlanner(
+                collapse_cpv=collapse_cpv_codes,
+                expand_cpv=expand_cpv_codes,
+                max_pages_per_query=max_pages_per_query
+            )
+        )
         search_engine.set_scoring_criteria(scoring_criteria)
         
         try:
+            # Dry run: report the query plan without calling the API
+            if dry_run and profiles:
+                plan = search_engine.explain_profiles(profiles)
+                Actor.log.info(
+                    f"Dry run: {plan['query_count']} shared queries for {len(profiles)} profiles "
+                    f"(separate runs would use {plan['separate_query_count']}), "
+                    f"{plan['expected_calls']['min']}-{plan['expected_calls']['max']} API calls"
+                )
+                for query in plan['queries']:
+                    Actor.log.info(f"  [{query['type']}] {query['query']} -> {', '.join(query['profiles'])}")
+                await Actor.set_value('QUERY_PLAN', plan)
+                return
+            if dry_run:
+                plan = search_engine.explain_search(
+                    search_keywords, cpv_codes, countries, year_from, year_to, min_value, active_only
+                )
+                Actor.log.info(
+                    f"Dry run: {plan['query_count']} queries "
+                    f"(fixed grouping would use {plan['legacy_query_count']}), "
+                    f"{plan['expected_calls']['min']}-{plan['expected_calls']['max']} API calls"
+                )
+                for query in plan['queries']:
+                    Actor.log.info(f"  [{query['type']}] {query['query']}")
+                await Actor.set_value('QUERY_PLAN', plan)
+                return
+            
             # Execute search
             Actor.log.info("Starting TED.EU search...")
-            results = await search_engine.search_tenders(
+            if profiles:
+                results_by_profile = await search_engine.search_profiles(profiles)
+                summaries = await push_profiles(
+                    results_by_profile, push_batch_size, output_format, export_directory, metrics, documents
+                )
+                await Actor.push_data({
+                    '_summary': True,
+                    'total_found': sum(s['total_found'] for s in summaries),
+                    'profiles': summaries,
+                    'search_timestamp': datetime.now().isoformat(),
+                    'timing': metrics.timing()
+                })
+                return
+            
+            search_args = dict(
                 keywords=search_keywords,
                 cpv_codes=cpv_codes,
                 countries=countries,
@@ -83,48 +631,95 @@ async def main():
                 year_to=year_to,
                 active_only=active_only,
                 min_value=min_value,
-                max_results=max_results,
-                include_documents=include_documents
+                include_documents=include_documents,
+                state=crawl_state
             )
             
-            Actor.log.info(f"Found {len(results)} tenders")
+            summary = SearchSummary()
+            exporter = open_export_writer(output_format, export_directory)
             
-            # Process and push results
-            processed_count = 0
-            for result in results:
-                await Actor.push_data(result)
-                processed_count += 1
+            if watch:
+                # Keep polling with the same engine, pushing only new or changed tenders
+                search_args.pop('state')
+                watcher = QueryWatcher(
+                    search_engine, crawl_state, search_args,
+                    interval_seconds=watch_interval_minutes * 60,
+                    budget_seconds=watch_budget_minutes * 60
+                )
+                stop_on_shutdown(watcher)
                 
-                # Log progress every 10 items
-                if processed_count % 10 == 0:
-                    Actor.log.info(f"Processed {processed_count}/{len(results)} tenders")
+                async def emit(records: AsyncIterator[Tender]):
+                    await push_in_batches(records, push_batch_size, summary, crawl_state, exporter, metrics,
+                                          dedup_history, documents=documents)
+                
+                watch_summary = await watcher.run(emit, checkpoint=lambda: state_store.save(crawl_state))
+                Actor.log.info(f"Watch mode ended after {watch_summary['polls']} polls")
+                await Actor.set_value('WATCH_SCHEDULE', watch_summary)
+                records = None
+            elif search_local_store:
+                # Answer from notices stored by earlier crawls, without API calls
+                search_args.pop('state')
+                results = search_engine.search_local(max_results=max_results, **search_args)
+                Actor.log.info(f"Found {len(results)} tenders in the local store")
+                records = _iterate(results)
+            elif stream_results:
+                # Push tenders as they arrive, in arrival order; incremental runs push
+                # every match, since watermarks move past whatever is cut off
+                records = search_engine.stream_tenders(**search_args)
+                if crawl_state is None:
+                    records = _take(records, max_results)
+            else:
+                results = await search_engine.search_tenders(max_results=max_results, **search_args)
+                Actor.log.info(f"Found {len(results)} tenders")
+                records = _iterate(results)
+            
+            # Process and push results
+            if records is not None:
+                await push_in_batches(records, push_batch_size, summary, crawl_state, exporter, metrics,
+                                      dedup_history, documents=documents)
+            if exporter is not None:
+                started = time.perf_counter()
+                await store_export(exporter)
+                metrics.add_time('export', time.perf_counter() - started)
+            
+            # Persist state only after everything was pushed
+            if state_store is not None:
+                await state_store.save(crawl_state)
+                Actor.log.info(f"Incremental run: {summary.new} new, {summary.updated} updated tenders")
+            if dedup_history is not None:
+                await save_dedup_history(dedup_history, dedup_history_kind)
+                dedup_history = None
             
             # Summary statistics
-            if results:
-                avg_score = sum(r['relevance_score'] for r in results) / len(results)
-                high_relevance = len([r for r in results if r['relevance_score'] > 70])
-                active_tenders = len([r for r in results if r['status'] == 'active'])
+            if summary.total:
+                avg_score = summary.average_score
                 
                 Actor.log.info(f"=== SEARCH SUMMARY ===")
-                Actor.log.info(f"Total tenders found: {len(results)}")
+                Actor.log.info(f"Total tenders found: {summary.total}")
                 Actor.log.info(f"Average relevance score: {avg_score:.1f}")
-                Actor.log.info(f"High relevance tenders (>70): {high_relevance}")
-                Actor.log.info(f"Active tenders: {active_tenders}")
+                Actor.log.info(f"High relevance tenders (>70): {summary.high_relevance}")
+                Actor.log.info(f"Active tenders: {summary.active}")
                 
                 # Push summary data
                 await Actor.push_data({
                     '_summary': True,
-                    'total_found': len(results),
+                    'total_found': summary.total,
                     'average_score': round(avg_score, 1),
-                    'high_relevance_count': high_relevance,
-                    'active_count': active_tenders,
+                    'high_relevance_count': summary.high_relevance,
+                    'active_count': summary.active,
+                    'new_count': summary.new,
+                    'updated_count': summary.updated,
                     'search_timestamp': datetime.now().isoformat(),
                     'search_parameters': {
                         'keywords': search_keywords,
                         'countries': countries,
                         'date_range': f"{year_from}-{year_to}",
-                        'active_only': active_only
-                    }
+                        'active_only': active_only,
+                        'incremental': incremental,
+                        'watch': watch
+                    },
+                    'documents': documents.stats() if documents is not None else None,
+                    'timing': metrics.timing()
                 })
             else:
                 Actor.log.info("No tenders found matching criteria")
@@ -132,6 +727,27 @@ async def main():
         except Exception as e:
             Actor.log.error(f"Error during search: {e}")
             await Actor.fail(f"TED search failed: {str(e)}")
+        finally:
+            await search_engine.close()
+            if documents is not None:
+                stats = documents.stats()
+                Actor.log.info(
+                    f"Documents: {stats['stored']} stored from {stats['urls']} links, "
+                    f"{stats['duplicates']} duplicates, {stats['failed']} failed"
+                )
+                await documents.close()
+            probed = search_engine.pushdown_capabilities
+            if probed is not None and probed is not pushdown_capabilities and probed.complete:
+                await save_pushdown_capabilities(probed)
+            if response_cache is not None:
+                await save_response_cache(response_cache)
+            if notice_store is not None:
+                await save_notice_store(notice_store, persist=not local_store_path and not search_local_store)
+            if dedup_history is not None:
+                # Not saved: the run failed before its tenders were pushed
+                dedup_history.close()
+            if not dry_run:
+                await save_metrics(metrics, metrics_prometheus, profiler)
 
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Columnar batch processing for TED search results
+Turns a page of notices into column arrays and scores/filters them with NumPy/pandas
+"""
+
+import logging
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from ted_cpv import CPVIndex
+from ted_extract import ExtractionPlan, get_deadline
+from ted_models import SearchMeta, Tender
+
+logger = logging.getLogger(__name__)
+
+# Largest value kept in an int64 column; anything bigger falls back to Python ints
+_INT64_SAFE = 2 ** 62
+
+
+def extract_values(raw_values: List[Any]) -> np.ndarray:
+    """Vectorized equivalent of TEDSearchEngine._extract_value over a column"""
+    values = [0] * len(raw_values)
+    string_rows, string_values = [], []
+
+    for i, value in enumerate(raw_values):
+        if isinstance(value, (int, float)):
+            try:
+                values[i] = int(value)
+            except (ValueError, OverflowError):
+                values[i] = 0
+        elif isinstance(value, str):
+            string_rows.append(i)
+            string_values.append(value)
+
+    if string_values:
+        # Concatenating every digit run equals stripping all non-digits
+        digits = pd.Series(string_values, dtype=object).str.replace(r'\D', '', regex=True)
+        numeric = pd.to_numeric(digits.where(digits.str.len().between(1, 18)), errors='coerce')
+        for row, digit_text, number in zip(string_rows, digits, numeric):
+            if not pd.isna(number):
+                values[row] = int(number)
+            elif digit_text:
+                values[row] = int(digit_text)
+
+    if all(-_INT64_SAFE < v < _INT64_SAFE for v in values):
+        return np.array(values, dtype=np.int64)
+    return np.array(values, dtype=object)
+
+
+def _statuses(engine, deadlines: List[str]) -> np.ndarray:
+    """Status per row, parsing each distinct deadline once"""
+    status_by_deadline = {d: engine._status_for_deadline(d) for d in set(deadlines)}
+    return np.array([status_by_deadline[d] for d in deadlines], dtype=object)
+
+
+def process_batch(engine, results: List[Dict], keywords: List[str], cpv_codes: List[str],
+                  countries: List[str], active_only: bool, min_value: int,
+                  include_documents: bool, metas: List[SearchMeta]) -> List[Tender]:
+    """Process, score and filter a batch of raw notices with their search metadata
+
+    Produces exactly what TEDSearchEngine._process_result gives row by row.
+    """
+    if not results:
+        return []
+
+    # Extraction into columns
+    strings = engine.strings
+    plan = ExtractionPlan.detect(results)
+    notice_ids = [r.get('publication-number', '') for r in results]
+    titles = [plan.title(r) for r in results]
+    buyers = [strings.intern(plan.buyer_name(r)) for r in results]
+    country_col = [strings.intern(plan.country(r)) for r in results]
+    publication_dates = [r.get('publication-date', '') for r in results]
+    deadlines = [get_deadline(r.get('deadline-receipt')) for r in results]
+    cpv_col = [strings.intern_all(plan.cpv_codes(r)) for r in results]
+    notice_types = [strings.intern(r.get('notice-type', '')) for r in results]
+    values = extract_values([r.get('value-eur', 0) for r in results])
+    urls = [plan.ted_url(r) for r in results]
+
+    weights = engine.scoring_criteria
+    rows = len(results)
+    score = np.zeros(rows, dtype=np.float64)
+
+    # Keyword matching
+    keyword_score = np.zeros(rows, dtype=np.float64)
+    if keywords:
+        matcher = engine._get_keyword_matcher(keywords)
+        matches = np.fromiter(
+            (matcher.count_matches(t, b) for t, b in zip(titles, buyers)), dtype=np.float64, count=rows
+        )
+        keyword_score = np.minimum(100, (matches / len(keywords)) * 100)
+    score += (keyword_score * weights['keywordMatch'] / 100)
+
+    # CPV code matching
+    cpv_score = np.zeros(rows, dtype=np.float64)
+    if cpv_codes:
+        # Notices share a small set of CPV lists, so score each distinct list once
+        index = engine.cpv_index
+        matches_by_codes: Dict[tuple, float] = {}
+        cpv_matches = np.zeros(rows, dtype=np.float64)
+        for i, tender_cpv in enumerate(cpv_col):
+            if not tender_cpv:
+                continue
+            matches = matches_by_codes.get(tender_cpv)
+            if matches is None:
+                prefixes = CPVIndex.prefix_set(tender_cpv)
+                matches = matches_by_codes[tender_cpv] = sum(index.match_score(cpv, prefixes) for cpv in cpv_codes)
+            cpv_matches[i] = matches
+        has_cpv = np.fromiter((bool(c) for c in cpv_col), dtype=bool, count=rows)
+        cpv_score = np.where(has_cpv, np.minimum(100, (cpv_matches / len(cpv_codes)) * 100), 0.0)
+    score += (cpv_score * weights['cpvMatch'] / 100)
+
+    # Country preference
+    country_score = np.where(pd.Series(country_col, dtype=object).isin(countries).to_numpy(), 100.0, 0.0)
+    score += (country_score * weights['countryMatch'] / 100)
+
+    # Value matching
+    above_minimum = np.asarray(values >= min_value, dtype=bool)
+    value_score = np.select(
+        [np.asarray(values > min_value * 10, dtype=bool),
+         np.asarray(values > min_value * 5, dtype=bool),
+         np.asarray(values > min_value, dtype=bool)],
+        [100.0, 75.0, 50.0],
+        default=0.0
+    )
+    value_score = np.where(above_minimum, value_score, 0.0)
+    score += (value_score * weights['valueMatch'] / 100)
+
+    relevance = np.minimum(100, np.trunc(score)).astype(np.int64)
+    statuses = _statuses(engine, deadlines)
+
+    # Filters
+    keep = np.ones(rows, dtype=bool)
+    if active_only:
+        keep &= statuses == 'active'
+    if min_value > 0:
+        keep &= above_minimum
+
+    processed = []
+    for i in np.flatnonzero(keep):
+        meta = metas[i]
+        processed.append(Tender(
+            notice_id=notice_ids[i],
+            title=titles[i],
+            buyer_name=buyers[i],
+            country=country_col[i],
+            publication_date=publication_dates[i],
+            deadline_date=deadlines[i],
+            cpv_codes=cpv_col[i],
+            notice_type=notice_types[i],
+            estimated_value_eur=int(values[i]),
+            ted_url=urls[i],
+            search_type=meta.type,
+            search_group=strings.intern(meta.group),
+            found_timestamp=strings.intern(meta.timestamp),
+            document_links=plan.document_links(results[i], strings.intern) if include_documents else None,
+            relevance_score=int(relevance[i]),
+            status=statuses[i]
+        ))
+
+    return processed
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Persistent response cache for TED search requests
+SQLite-backed, keyed by a normalized hash of the request, with TTL and LRU eviction
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+from ted_json import loads
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """On-disk cache of TED API responses with TTL and size-bounded LRU eviction"""
+
+    def __init__(self, path: str = 'storage/ted_response_cache.sqlite',
+                 ttl_seconds: float = 3600, max_entries: int = 10000,
+                 max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " body BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """Hash a search request after normalizing whitespace and field order"""
+        normalized = dict(request)
+        if isinstance(normalized.get('query'), str):
+            normalized['query'] = ' '.join(normalized['query'].split())
+        if isinstance(normalized.get('fields'), list):
+            normalized['fields'] = sorted(set(normalized['fields']))
+        encoded = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def get(self, request: Dict[str, Any]) -> Optional[Dict]:
+        """Return the cached response for a request, or None if missing or expired"""
+        key = self.make_key(request)
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT body, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None or now - row[1] > self.ttl_seconds:
+            if row is not None:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+            self.misses += 1
+            return None
+
+        self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        self.hits += 1
+        return loads(row[0])
+
+    def set(self, request: Dict[str, Any], response: Dict):
+        """Store a response and evict least recently used entries over the limits"""
+        key = self.make_key(request)
+        body = json.dumps(response, separators=(',', ':')).encode('utf-8')
+        if len(body) > self.max_bytes:
+            return
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, body, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, body, len(body), now, now)
+        )
+        self._evict()
+        self._conn.commit()
+
+    def _evict(self):
+        # Expired entries first, then least recently used until under both limits
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        removed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            removed += 1
+        logger.debug(f"Evicted {removed} cached responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': count,
+            'bytes': total
+        }
+
+    def clear(self):
+        self._conn.execute("DELETE FROM responses")
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+CPV taxonomy index
+Prefix trie over the significant digits of CPV codes (division, group, class, category)
+"""
+
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TAXONOMY_PATH = os.path.join(BASE_DIR, 'cpv_taxonomy.json')
+VALIDATION_PATH = os.path.join(BASE_DIR, 'cpv_validation_results.json')
+
+
+def normalize_cpv(code: str) -> str:
+    """8-digit CPV code without the check digit suffix (45000000-7 -> 45000000)"""
+    digits = str(code).split('-')[0].strip()
+    return digits[:8].ljust(8, '0') if digits.isdigit() else ''
+
+
+def significant_digits(code: str) -> str:
+    """Digits that place a code in the hierarchy (trailing zeros removed, at least the division)"""
+    digits = normalize_cpv(code)
+    stripped = digits.rstrip('0')
+    return stripped if len(stripped) >= 2 else digits[:2]
+
+
+def cpv_level(code: str) -> int:
+    """Hierarchy depth: 1 division, 2 group, 3 class, 4 category, 5-7 subdivisions"""
+    return max(1, len(significant_digits(code)) - 1)
+
+
+def _code_for(prefix: str) -> str:
+    return prefix.ljust(8, '0')
+
+
+class _Node:
+    __slots__ = ('children', 'code', 'label')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        self.code: Optional[str] = None
+        self.label: Optional[str] = None
+
+
+class CPVIndex:
+    """Prefix trie of known CPV codes with O(code length) hierarchy lookups"""
+
+    def __init__(self, codes: Optional[Dict[str, str]] = None, invalid: Iterable[str] = ()):
+        self._root = _Node()
+        self._size = 0
+        self.invalid: Set[str] = {normalize_cpv(c) for c in invalid if normalize_cpv(c)}
+        for code, label in (codes or {}).items():
+            self.add(code, label)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, code: str) -> bool:
+        node = self._find(significant_digits(code))
+        return node is not None and node.code is not None
+
+    def add(self, code: str, label: str = ''):
+        """Insert a code (and its label) into the trie"""
+        digits = significant_digits(code)
+        if not digits:
+            return
+        node = self._root
+        for digit in digits:
+            node = node.children.setdefault(digit, _Node())
+        if node.code is None:
+            self._size += 1
+        node.code = normalize_cpv(code)
+        node.label = label or node.label
+
+    def label(self, code: str) -> Optional[str]:
+        node = self._find(significant_digits(code))
+        return node.label if node is not None else None
+
+    def is_valid(self, code: str) -> bool:
+        """False for malformed codes and codes the API rejected in validation runs"""
+        normalized = normalize_cpv(code)
+        return bool(normalized) and normalized not in self.invalid
+
+    def ancestors(self, code: str) -> List[str]:
+        """Hierarchy ancestors from division down to the direct parent"""
+        digits = significant_digits(code)
+        return [_code_for(digits[:length]) for length in range(2, len(digits))]
+
+    def known_ancestors(self, code: str) -> List[str]:
+        """Ancestors present in the taxonomy, found in one walk down the trie"""
+        digits = significant_digits(code)
+        found = []
+        node = self._root
+        for depth, digit in enumerate(digits[:-1], start=1):
+            node = node.children.get(digit)
+            if node is None:
+                break
+            if node.code is not None and depth >= 2:
+                found.append(node.code)
+        return found
+
+    def descendants(self, code: str) -> List[str]:
+        """Known codes below a code in the hierarchy"""
+        node = self._find(significant_digits(code))
+        if node is None:
+            return []
+        found = []
+        stack = list(node.children.values())
+        while stack:
+            current = stack.pop()
+            if current.code is not None:
+                found.append(current.code)
+            stack.extend(current.children.values())
+        return sorted(found)
+
+    @staticmethod
+    def covers(ancestor: str, code: str) -> bool:
+        """True if code equals ancestor or lies in its subtree"""
+        return significant_digits(code).startswith(significant_digits(ancestor))
+
+    def minimal_cover(self, codes: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """Drop invalid codes and codes covered by a broader code in the same set
+
+        Returns (kept, dropped), both in input order.
+        """
+        unique: Dict[str, str] = {}
+        for code in codes:
+            if code and str(code).strip():
+                unique.setdefault(normalize_cpv(code), str(code).strip())
+
+        trie = CPVIndex()
+        for code in unique:
+            if self.is_valid(code):
+                trie.add(code)
+
+        kept, dropped = [], []
+        for code, original in unique.items():
+            if not self.is_valid(code) or trie._has_strict_ancestor(significant_digits(code)):
+                dropped.append(original)
+            else:
+                kept.append(code)
+        return kept, dropped
+
+    def expand(self, codes: Iterable[str]) -> List[str]:
+        """Valid codes plus all their known descendants, without duplicates"""
+        expanded: Dict[str, None] = {}
+        for code in codes:
+            if not self.is_valid(code):
+                continue
+            expanded[normalize_cpv(code)] = None
+            for child in self.descendants(code):
+                if self.is_valid(child):
+                    expanded[child] = None
+        return list(expanded)
+
+    def match_score(self, requested: str, tender_prefixes: Set[str]) -> float:
+        """Hierarchy-depth match of one requested code against a tender's codes
+
+        tender_prefixes comes from prefix_set(). A tender code inside the
+        requested subtree scores 1.0; otherwise the deepest shared ancestor
+        scores its share of the requested code's depth (0 if no shared division).
+        """
+        digits = significant_digits(requested)
+        if digits in tender_prefixes:
+            return 1.0
+        for length in range(len(digits) - 1, 1, -1):
+            if digits[:length] in tender_prefixes:
+                return (length - 1) / (len(digits) - 1)
+        return 0.0
+
+    @staticmethod
+    def prefix_set(codes: Iterable[str]) -> Set[str]:
+        """Every hierarchy prefix (from the division) of the given codes"""
+        prefixes = set()
+        for code in codes:
+            digits = normalize_cpv(code)
+            if not digits:
+                continue
+            prefixes.add(digits[:2])
+            for length in range(3, 9):
+                prefix = digits[:length].rstrip('0')
+                if len(prefix) > 2:
+                    prefixes.add(prefix)
+        return prefixes
+
+    def _find(self, digits: str) -> Optional[_Node]:
+        node = self._root
+        for digit in digits:
+            node = node.children.get(digit)
+            if node is None:
+                return None
+        return node
+
+    def _has_strict_ancestor(self, digits: str) -> bool:
+        node = self._root
+        for depth, digit in enumerate(digits[:-1], start=1):
+            node = node.children.get(digit)
+            if node is None:
+                return False
+            if node.code is not None and depth >= 2:
+                return True
+        return False
+
+
+def load_invalid_codes(path: str = VALIDATION_PATH) -> Set[str]:
+    """CPV codes the API rejected in test_cpv_codes.py validation results"""
+    if not os.path.exists(path):
+        return set()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+        return {r['cpv_code'] for r in results if r.get('status') == 'INVALID'}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Could not read CPV validation results: {e}")
+        return set()
+
+
+_default_index: Optional[CPVIndex] = None
+
+
+def default_index() -> CPVIndex:
+    """Bundled taxonomy plus known-invalid codes, loaded once"""
+    global _default_index
+    if _default_index is None:
+        with open(TAXONOMY_PATH, 'r', encoding='utf-8') as f:
+            codes = json.load(f)['codes']
+        _default_index = CPVIndex(codes, invalid=load_invalid_codes())
+    return _default_index
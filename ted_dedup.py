@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Deduplication of notices within and across runs
+Repeats within a run merge their query provenance into the first copy;
+notices emitted by earlier runs are remembered in a Bloom filter or an
+on-disk set, both memory-bounded and persisted between runs
+"""
+
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import struct
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from ted_models import SearchMeta, Tender
+
+logger = logging.getLogger(__name__)
+
+_BLOOM_MAGIC = b'TEDBLOOM'
+_BLOOM_HEADER = struct.Struct('<8sQIQ')
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of notice ids, saved as one binary file
+
+    Sized for capacity ids at error_rate false positives; max_bytes caps
+    the bit array, raising the effective error rate instead. A false
+    positive makes a new notice look already emitted.
+    """
+
+    def __init__(self, path: str, capacity: int = 5_000_000, error_rate: float = 0.001,
+                 max_bytes: Optional[int] = None):
+        self.path = path
+        capacity = max(1, capacity)
+        error_rate = min(max(error_rate, 1e-9), 0.5)
+        num_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        if max_bytes:
+            num_bits = min(num_bits, max_bytes * 8)
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path, 'rb') as f:
+            magic, num_bits, num_hashes, count = _BLOOM_HEADER.unpack(f.read(_BLOOM_HEADER.size))
+            if magic != _BLOOM_MAGIC:
+                raise ValueError(f"{self.path} is not a Bloom filter file")
+            bits = bytearray(f.read())
+        if (num_bits, num_hashes) != (self.num_bits, self.num_hashes):
+            # The bit layout cannot change without rehashing every id, which is not stored
+            logger.warning(
+                f"Keeping the saved Bloom filter size ({num_bits} bits, {num_hashes} hashes); "
+                f"new capacity or error rate settings apply to a fresh filter only"
+            )
+        self.num_bits, self.num_hashes, self.count, self.bits = num_bits, num_hashes, count, bits
+
+    def _positions(self, key: str) -> List[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def __len__(self):
+        return self.count
+
+    def add(self, key: str):
+        bits = self.bits
+        added = False
+        for p in self._positions(key):
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                bits[p >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.bits)
+
+    @property
+    def false_positive_rate(self) -> float:
+        """Expected false-positive rate at the current fill"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'kind': 'bloom',
+            'entries': self.count,
+            'memory_bytes': self.memory_bytes,
+            'false_positive_rate': round(self.false_positive_rate, 6)
+        }
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_BLOOM_HEADER.pack(_BLOOM_MAGIC, self.num_bits, self.num_hashes, self.count))
+            f.write(self.bits)
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        pass
+
+
+class DiskSeenSet:
+    """Exact set of notice ids in SQLite; memory is bounded by the page cache
+
+    Additions become durable on save(); closing without saving drops them,
+    so a failed run does not mark unpushed notices as emitted.
+    """
+
+    def __init__(self, path: str, cache_bytes: int = 16 * 1024 * 1024):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        # Negative cache_size is in KiB
+        self._conn.execute(f"PRAGMA cache_size = {-max(1, cache_bytes // 1024)}")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS seen (id TEXT PRIMARY KEY) WITHOUT ROWID")
+        self._conn.commit()
+
+    def __contains__(self, key: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM seen WHERE id = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def add(self, key: str):
+        self._conn.execute("INSERT OR IGNORE INTO seen (id) VALUES (?)", (key,))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'kind': 'disk',
+            'entries': len(self),
+            'file_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+
+    def save(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+SeenHistory = Union[BloomFilter, DiskSeenSet]
+
+
+def open_seen_history(kind: str, path: str, capacity: int = 5_000_000, error_rate: float = 0.001,
+                      max_memory_bytes: Optional[int] = None) -> SeenHistory:
+    """'bloom' or 'disk' history of emitted notice ids"""
+    if kind == 'bloom':
+        return BloomFilter(path, capacity, error_rate, max_memory_bytes)
+    if kind == 'disk':
+        return DiskSeenSet(path, max_memory_bytes or 16 * 1024 * 1024)
+    raise ValueError(f"Unknown dedup history: {kind}")
+
+
+class Deduplicator:
+    """Drops repeated notices of a run, merging their provenance into the first copy
+
+    Provenance reaches tenders the consumer still holds (tracked weakly, so
+    nothing is kept alive) and notices still waiting for batch processing.
+    With a history, notices emitted by earlier runs are skipped as well; the
+    caller adds tenders to it once they are actually delivered.
+    """
+
+    def __init__(self, history: Optional[SeenHistory] = None):
+        self.history = history
+        self.repeats = 0
+        self.merged = 0
+        self.skipped = 0
+        self._seen = set()
+        self._live: 'weakref.WeakValueDictionary[str, Tender]' = weakref.WeakValueDictionary()
+        # Notices accepted but not yet emitted or filtered, with provenance queued for them
+        self._pending: Dict[str, List[SearchMeta]] = {}
+
+    def first_sighting(self, notice_id: str, meta: SearchMeta) -> bool:
+        """True if the notice should be processed, False for repeats and earlier runs' notices"""
+        if not notice_id:
+            return False
+        if notice_id in self._seen:
+            self.repeats += 1
+            tender = self._live.get(notice_id)
+            if tender is not None:
+                tender.add_provenance(meta)
+                self.merged += 1
+            elif notice_id in self._pending:
+                self._pending[notice_id].append(meta)
+                self.merged += 1
+            return False
+        self._seen.add(notice_id)
+        if self.history is not None and notice_id in self.history:
+            self.skipped += 1
+            return False
+        self._pending[notice_id] = []
+        return True
+
+    def emitted(self, tender: Tender):
+        """Attach queued provenance and track the tender for later repeats"""
+        for meta in self._pending.pop(tender.notice_id, ()):
+            tender.add_provenance(meta)
+        self._live[tender.notice_id] = tender
+
+    def settle(self, notice_ids: Iterable[str]):
+        """Forget queued provenance of processed notices that were not emitted"""
+        for notice_id in notice_ids:
+            self._pending.pop(notice_id, None)
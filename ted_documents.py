@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Concurrent download of tender documents
+Linked documents are streamed to disk with bounded, per-host limited
+concurrency, resumed with Range requests after a dropped connection and
+stored once per content hash, however many notices link them
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from ted_metrics import RunMetrics
+from ted_models import Tender
+from ted_rate_limiter import backoff_delay, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from a response before they are hashed and written
+CHUNK_SIZE = 256 * 1024
+
+# Store callback: (key, local path, content type); the file may be removed afterwards
+DocumentSink = Callable[[str, str, str], Awaitable[None]]
+
+
+class DocumentError(Exception):
+    """A document that cannot be downloaded (retrying would not help)"""
+
+
+def document_key(sha256: str, content_type: str, url: str) -> str:
+    """Storage key named after the content hash, with an extension for the file type"""
+    extension = mimetypes.guess_extension(content_type) if content_type else None
+    if not extension:
+        extension = os.path.splitext(urlsplit(url).path)[1].lower()
+    if not extension or len(extension) > 8 or not extension[1:].isalnum():
+        extension = ''
+    return f"doc-{sha256}{extension}"
+
+
+class DocumentFetcher:
+    """Downloads tender document links and records where each one was stored
+
+    Each URL is fetched once per run and each distinct content is stored
+    once; links to a file already stored get its key. Downloads go to a
+    .part file hashed as it is written, so a dropped connection resumes
+    from the bytes on disk instead of starting over. Without a sink the
+    documents stay in the directory, named by their key.
+    """
+
+    def __init__(self, directory: str = 'storage/documents', sink: Optional[DocumentSink] = None,
+                 max_concurrency: int = 8, per_host_limit: int = 2, max_bytes: int = 50 * 1024 * 1024,
+                 max_retries: int = 3, timeout_seconds: float = 300, connect_timeout: float = 30,
+                 metrics: Optional[RunMetrics] = None):
+        self.directory = directory
+        self.sink = sink
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_host_limit = max(1, per_host_limit)
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        # Longest wait for the next bytes of a response, and for a connection
+        self.timeout_seconds = timeout_seconds
+        self.connect_timeout = connect_timeout
+        self.metrics = metrics or RunMetrics()
+        # URL -> download, shared by every notice linking it
+        self._by_url: Dict[str, asyncio.Task] = {}
+        # Content hash -> storing of the first download with that content
+        self._by_hash: Dict[str, asyncio.Task] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Taken before a request, so waiting for a slot is not part of its timeouts
+        self._limit = asyncio.Semaphore(self.max_concurrency)
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            # The semaphores keep downloads within the connector's limit
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, ttl_dns_cache=300)
+            # Bodies are hashed and resumed as raw bytes, so ask for them unencoded
+            self._session = aiohttp.ClientSession(
+                connector=connector, auto_decompress=False,
+                headers={'Accept-Encoding': 'identity'}
+            )
+        return self._session
+
+    async def close(self):
+        for task in self._by_url.values():
+            task.cancel()
+        await asyncio.gather(*self._by_url.values(), return_exceptions=True)
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def stats(self) -> Dict[str, int]:
+        counters = self.metrics.counters
+        return {
+            'urls': len(self._by_url),
+            'stored': len(self._by_hash),
+            'duplicates': counters.get('documents_duplicate', 0),
+            'failed': counters.get('documents_failed', 0),
+            'bytes': counters.get('document_bytes', 0)
+        }
+
+    async def fetch(self, url: str) -> Optional[str]:
+        """Key the document at url is stored under, or None if it could not be fetched"""
+        task = self._by_url.get(url)
+        if task is None:
+            task = self._by_url[url] = asyncio.ensure_future(self._fetch(url))
+        return await asyncio.shield(task)
+
+    async def attach(self, records: AsyncIterator[Tender], window: int = 100) -> AsyncIterator[Tender]:
+        """Pass tenders through with their documents stored, a window of tenders at a time"""
+        pending: List[Tender] = []
+        try:
+            async for tender_info in records:
+                pending.append(tender_info)
+                if len(pending) >= max(1, window):
+                    await self._store_links(pending)
+                    for item in pending:
+                        yield item
+                    pending = []
+            if pending:
+                await self._store_links(pending)
+                for item in pending:
+                    yield item
+        finally:
+            await records.aclose()
+
+    async def _store_links(self, tenders: List[Tender]):
+        links = [link for t in tenders for link in t.document_links or () if link.stored_key is None]
+        if not links:
+            return
+        started = time.perf_counter()
+        keys = await asyncio.gather(*(self.fetch(link.url) for link in links))
+        for link, key in zip(links, keys):
+            # An empty key marks a document that could not be fetched
+            link.stored_key = key or ''
+        self.metrics.add_time('documents', time.perf_counter() - started)
+
+    def _part_path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.part')
+
+    async def _fetch(self, url: str) -> Optional[str]:
+        part = self._part_path(url)
+        try:
+            sha256, content_type = await self._download(url, part)
+        except (DocumentError, OSError) as e:
+            self.metrics.count('documents_failed')
+            logger.warning(f"Skipping document {url}: {e}")
+            self._discard(part)
+            self._discard(part + '.json')
+            return None
+
+        store = self._by_hash.get(sha256)
+        if store is not None:
+            # Same content as a file linked elsewhere
+            self.metrics.count('documents_duplicate')
+            self._discard(part)
+            self._discard(part + '.json')
+        else:
+            key = document_key(sha256, content_type, url)
+            store = self._by_hash[sha256] = asyncio.ensure_future(self._store(key, part, content_type))
+        return await asyncio.shield(store)
+
+    async def _store(self, key: str, part: str, content_type: str) -> Optional[str]:
+        path = os.path.join(self.directory, key)
+        os.replace(part, path)
+        self._discard(part + '.json')
+        self.metrics.count('documents_stored')
+        if self.sink is None:
+            return key
+        try:
+            await self.sink(key, path, content_type)
+        except Exception as e:
+            self.metrics.count('documents_failed')
+            logger.warning(f"Could not store document {key}: {e}")
+            return None
+        finally:
+            self._discard(path)
+        return key
+
+    @staticmethod
+    def _discard(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    async def _download(self, url: str, part: str) -> Tuple[str, str]:
+        """Stream url into part, resuming what is there; returns (sha256, content type)"""
+        last_error = ''
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.metrics.count('document_retries')
+            try:
+                return await self._download_once(url, part)
+            except aiohttp.ClientResponseError as e:
+                last_error = f"{e.status} {e.message}"
+                if e.status != 429 and e.status < 500:
+                    raise DocumentError(last_error)
+                delay = parse_retry_after(e.headers.get('Retry-After') if e.headers else None)
+                if delay is None:
+                    delay = backoff_delay(attempt)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = str(e) or type(e).__name__
+                delay = backoff_delay(attempt)
+            if attempt < self.max_retries:
+                logger.info(f"Document download interrupted ({last_error}), resuming in {delay:.1f}s: {url}")
+                await asyncio.sleep(delay)
+        raise DocumentError(f"giving up after {self.max_retries + 1} attempts: {last_error}")
+
+    async def _download_once(self, url: str, part: str) -> Tuple[str, str]:
+        # Resume state: bytes already on disk and the validator of the response they came from
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        resume = self._read_resume(part) if offset else {}
+        headers = {}
+        if offset:
+            headers['Range'] = f"bytes={offset}-"
+            if resume.get('validator'):
+                headers['If-Range'] = resume['validator']
+
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout,
+                                        sock_read=self.timeout_seconds)
+        # Host slot first, so a download queued behind its host does not hold a run-wide slot
+        async with self._host_limit(url), self._limit:
+            return await self._request(url, part, offset, resume, headers, timeout)
+
+    async def _request(self, url: str, part: str, offset: int, resume: Dict[str, str],
+                       headers: Dict[str, str], timeout: aiohttp.ClientTimeout) -> Tuple[str, str]:
+        session = await self._get_session()
+        async with session.get(url, headers=headers, timeout=timeout) as response:
+            if response.status == 416 and offset:
+                # The part no longer fits the file; start over on the next attempt
+                self._discard(part)
+                raise aiohttp.ClientPayloadError(f"range {offset}- not satisfiable")
+            if response.status >= 400:
+                raise aiohttp.ClientResponseError(
+                    response.request_info, response.history, status=response.status,
+                    message=response.reason or '', headers=response.headers
+                )
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+            if offset and response.status == 206 and self._range_start(response) == offset:
+                self.metrics.count('documents_resumed')
+                digest = self._hash_file(part)
+                mode = 'ab'
+                content_type = content_type or resume.get('content_type', '')
+            else:
+                # Whole body: a new download, or the server ignored or refused the range
+                offset, digest, mode = 0, hashlib.sha256(), 'wb'
+                self._write_resume(part, response, content_type)
+
+            length = response.content_length
+            if length is not None and offset + length > self.max_bytes:
+                raise DocumentError(f"larger than {self.max_bytes} bytes")
+            size = offset
+            with open(part, mode) as f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise DocumentError(f"larger than {self.max_bytes} bytes")
+                    digest.update(chunk)
+                    f.write(chunk)
+                    self.metrics.count('document_bytes', len(chunk))
+        return digest.hexdigest(), content_type
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return limit
+
+    @staticmethod
+    def _range_start(response: aiohttp.ClientResponse) -> Optional[int]:
+        """First byte of a Content-Range: bytes START-END/TOTAL header"""
+        value = response.headers.get('Content-Range', '')
+        try:
+            return int(value.split()[1].split('-')[0])
+        except (IndexError, ValueError):
+            return None
+
+    @staticmethod
+    def _hash_file(path: str) -> Any:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest
+
+    @staticmethod
+    def _read_resume(part: str) -> Dict[str, str]:
+        try:
+            with open(part + '.json', 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write_resume(part: str, response: aiohttp.ClientResponse, content_type: str):
+        # A strong ETag or Last-Modified lets If-Range refuse a resume onto changed content
+        etag = response.headers.get('ETag', '')
+        validator = etag if etag and not etag.startswith('W/') else response.headers.get('Last-Modified', '')
+        with open(part + '.json', 'w', encoding='utf-8') as f:
+            json.dump({'validator': validator, 'content_type': content_type}, f)
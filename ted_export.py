@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Streaming CSV, Excel and partitioned Parquet export of tenders
+Rows are written as tenders arrive (Parquet in bounded chunks), so memory stays
+flat regardless of export size
+"""
+
+import csv
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from ted_models import Tender
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = [
+    'notice_id', 'title', 'buyer_name', 'country', 'publication_date', 'deadline_date',
+    'cpv_codes', 'notice_type', 'estimated_value_eur', 'ted_url', 'search_type',
+    'search_group', 'found_timestamp', 'document_links', 'relevance_score', 'status',
+    'change_type'
+]
+
+# Separator for list values flattened into one cell
+LIST_SEPARATOR = '; '
+
+# Typed columns of the Parquet export; country and publication_year are partition keys
+PARQUET_SCHEMA = pa.schema([
+    ('notice_id', pa.string()),
+    ('title', pa.string()),
+    ('buyer_name', pa.string()),
+    ('country', pa.string()),
+    ('publication_year', pa.int32()),
+    ('publication_date', pa.timestamp('us', tz='UTC')),
+    ('deadline_date', pa.timestamp('us', tz='UTC')),
+    ('cpv_codes', pa.list_(pa.string())),
+    ('notice_type', pa.string()),
+    ('estimated_value_eur', pa.int64()),
+    ('ted_url', pa.string()),
+    ('search_type', pa.string()),
+    ('search_group', pa.list_(pa.string())),
+    ('found_timestamp', pa.timestamp('us')),
+    ('document_links', pa.list_(pa.struct([
+        ('url', pa.string()), ('type', pa.string()), ('description', pa.string())
+    ]))),
+    ('relevance_score', pa.int32()),
+    ('status', pa.string()),
+    ('change_type', pa.string())
+])
+
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def export_row(tender: Tender) -> List[Any]:
+    """Flat row in EXPORT_COLUMNS order"""
+    return [
+        tender.notice_id,
+        tender.title,
+        tender.buyer_name,
+        tender.country,
+        tender.publication_date,
+        tender.deadline_date,
+        LIST_SEPARATOR.join(tender.cpv_codes),
+        tender.notice_type,
+        tender.estimated_value_eur,
+        tender.ted_url,
+        tender.search_type,
+        LIST_SEPARATOR.join(str(g) for g in tender.search_group),
+        tender.found_timestamp,
+        LIST_SEPARATOR.join(link.url for link in tender.document_links or ()),
+        tender.relevance_score,
+        tender.status,
+        tender.change_type or ''
+    ]
+
+
+class CsvExportWriter:
+    """Appends tenders to a CSV file, flushing every flush_every rows"""
+
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+    # Whether files accumulate across runs (stored in the named store)
+    persistent = False
+
+    def __init__(self, path: str, flush_every: int = 1000):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.rows = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, tender: Tender):
+        self._writer.writerow(export_row(tender))
+        self.rows += 1
+        if self.rows % self.flush_every == 0:
+            self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class ExcelExportWriter:
+    """Appends tenders to an .xlsx workbook using openpyxl's write-only mode
+
+    Write-only worksheets stream rows to disk instead of keeping cells in
+    memory. A new sheet is started when one reaches Excel's row limit.
+    """
+
+    content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    extension = 'xlsx'
+    persistent = False
+
+    MAX_ROWS = 1048576
+
+    def __init__(self, path: str, sheet_title: str = 'Tenders'):
+        self.path = path
+        self.sheet_title = sheet_title
+        self.rows = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._workbook = Workbook(write_only=True)
+        self._sheet = None
+        self._sheet_rows = 0
+        self._sheets = 0
+        self._closed = False
+
+    def _new_sheet(self):
+        self._sheets += 1
+        title = self.sheet_title if self._sheets == 1 else f"{self.sheet_title} {self._sheets}"
+        self._sheet = self._workbook.create_sheet(title)
+        self._sheet.append(EXPORT_COLUMNS)
+        self._sheet_rows = 1
+
+    def _cell(self, value: Any):
+        if not isinstance(value, str):
+            return value
+        value = ILLEGAL_CHARACTERS_RE.sub('', value)[:32767]
+        if value.startswith('='):
+            # Keep text that looks like a formula as text
+            cell = WriteOnlyCell(self._sheet, value=value)
+            cell.data_type = 's'
+            return cell
+        return value
+
+    def write(self, tender: Tender):
+        if self._sheet is None or self._sheet_rows >= self.MAX_ROWS:
+            self._new_sheet()
+        self._sheet.append([self._cell(value) for value in export_row(tender)])
+        self._sheet_rows += 1
+        self.rows += 1
+
+    def close(self):
+        if self._closed:
+            return
+        if self._sheet is None:
+            self._new_sheet()
+        self._workbook.save(self.path)
+        self._closed = True
+
+
+class ParquetExportWriter:
+    """Appends tenders to a Parquet dataset partitioned by country and publication year
+
+    Rows are buffered up to rows_per_chunk and written as new files named
+    after the run, so repeated (incremental) runs add files to the
+    partitions instead of rewriting existing ones.
+    """
+
+    content_type = 'application/vnd.apache.parquet'
+    extension = 'parquet'
+    persistent = True
+
+    PARTITION_COLUMNS = ['country', 'publication_year']
+
+    def __init__(self, path: str, rows_per_chunk: int = 50000, run_id: Optional[str] = None):
+        self.path = path
+        self.rows_per_chunk = max(1, rows_per_chunk)
+        self.run_id = run_id or datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        self.rows = 0
+        self.written_files: List[str] = []
+        self._chunks = 0
+        self._buffer: Dict[str, list] = {name: [] for name in PARQUET_SCHEMA.names}
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, tender: Tender):
+        buffer = self._buffer
+        year = tender.publication_date[:4]
+        value = tender.estimated_value_eur
+        buffer['notice_id'].append(tender.notice_id)
+        buffer['title'].append(tender.title)
+        buffer['buyer_name'].append(tender.buyer_name)
+        buffer['country'].append(tender.country or None)
+        buffer['publication_year'].append(int(year) if year.isdigit() else None)
+        buffer['publication_date'].append(tender.publication_date)
+        buffer['deadline_date'].append(tender.deadline_date)
+        buffer['cpv_codes'].append(list(tender.cpv_codes))
+        buffer['notice_type'].append(tender.notice_type)
+        buffer['estimated_value_eur'].append(value if _INT64_MIN <= value <= _INT64_MAX else None)
+        buffer['ted_url'].append(tender.ted_url)
+        buffer['search_type'].append(tender.search_type)
+        buffer['search_group'].append([str(g) for g in tender.search_group])
+        buffer['found_timestamp'].append(tender.found_timestamp)
+        buffer['document_links'].append([link.to_dict() for link in tender.document_links or ()])
+        buffer['relevance_score'].append(tender.relevance_score)
+        buffer['status'].append(tender.status)
+        buffer['change_type'].append(tender.change_type)
+        self.rows += 1
+        if len(buffer['notice_id']) >= self.rows_per_chunk:
+            self._flush()
+
+    @staticmethod
+    def _timestamps(values: List[str], utc: bool) -> pd.Series:
+        """ISO dates/datetimes as timestamps; unparseable values become null"""
+        series = pd.Series(values, dtype=object)
+        # TED publishes dates with an offset (2024-03-01+01:00), which ISO8601 parsing rejects
+        series = series.str.replace(r'^(\d{4}-\d{2}-\d{2})(?=[+-]\d{2}:\d{2}$|Z$)', r'\1T00:00:00', regex=True)
+        return pd.to_datetime(series, format='ISO8601', utc=utc, errors='coerce')
+
+    def _flush(self):
+        buffer = self._buffer
+        if not buffer['notice_id']:
+            return
+        columns = dict(buffer)
+        columns['publication_date'] = self._timestamps(buffer['publication_date'], utc=True)
+        columns['deadline_date'] = self._timestamps(buffer['deadline_date'], utc=True)
+        columns['found_timestamp'] = self._timestamps(buffer['found_timestamp'], utc=False)
+        table = pa.Table.from_pydict(
+            {name: pa.array(columns[name], type=PARQUET_SCHEMA.field(name).type, from_pandas=True)
+             for name in PARQUET_SCHEMA.names},
+            schema=PARQUET_SCHEMA
+        )
+        pq.write_to_dataset(
+            table, self.path,
+            partition_cols=self.PARTITION_COLUMNS,
+            basename_template=f"{self.run_id}-{self._chunks}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+            file_visitor=lambda written: self.written_files.append(written.path)
+        )
+        self._chunks += 1
+        self._buffer = {name: [] for name in PARQUET_SCHEMA.names}
+
+    def close(self):
+        self._flush()
+
+
+def export_files(exporter) -> List[Tuple[str, str]]:
+    """(local path, key-value store key) of every file an export produced"""
+    if isinstance(exporter, ParquetExportWriter):
+        root = os.path.basename(os.path.normpath(exporter.path))
+        files = []
+        for path in exporter.written_files:
+            relative = os.path.relpath(path, exporter.path)
+            # Record keys allow neither '/' nor '='
+            key = '.'.join([root] + relative.replace('=', '-').split(os.sep))
+            files.append((path, key))
+        return files
+    return [(exporter.path, f"{os.path.splitext(os.path.basename(exporter.path))[0]}.{exporter.extension}")]
+
+
+def open_export_writer(output_format: str, directory: str = 'storage/exports',
+                       name: str = 'tenders') -> Optional[Any]:
+    """Writer for the outputFormat input, or None for the JSON dataset only"""
+    if output_format == 'csv':
+        return CsvExportWriter(os.path.join(directory, f"{name}.csv"))
+    if output_format == 'excel':
+        return ExcelExportWriter(os.path.join(directory, f"{name}.xlsx"))
+    if output_format == 'parquet':
+        return ParquetExportWriter(os.path.join(directory, f"{name}_parquet"))
+    if output_format != 'json':
+        logger.warning(f"Unknown output format '{output_format}', writing the dataset only")
+    return None
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Compiled field extraction for TED notices
+Detects each field's shape once per batch (or takes it from a declared schema)
+and extracts it with a specialised function, falling back to the defensive
+getters for any notice that does not fit
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ted_models import DocumentLink
+
+# Field shapes
+LANG_MAP = 'lang_map'          # {"eng": "text"} or {"eng": ["text", ...]}
+LIST = 'list'                  # ["DEU", ...]
+TEXT = 'text'                  # "DEU"
+DICT_LIST = 'dict_list'        # [{"cpv-code": "72000000"}, ...]
+MIXED = 'mixed'                # no single shape, or nothing seen yet
+
+# Shapes the TED v3 search API returns for the fields the engine reads
+TED_SCHEMA = {
+    'notice-title': LANG_MAP,
+    'buyer-name': LANG_MAP,
+    'buyer-country': LIST,
+    'classification-cpv': DICT_LIST,
+    'links': DICT_LIST
+}
+
+# Notices inspected per field when detecting shapes
+SAMPLE_SIZE = 20
+
+
+# Defensive getters: any shape, one isinstance cascade per call
+
+def get_text(value: Any) -> str:
+    """Text of a multilingual field, English first, then the first language"""
+    try:
+        if isinstance(value, dict):
+            # Try English first, then any available language
+            first_lang_key = list(value.keys())[0] if value else ''
+            lang_value = value.get('eng', value.get(first_lang_key, ''))
+
+            # Handle case where language value is a list
+            if isinstance(lang_value, list) and lang_value:
+                return str(lang_value[0])
+            return str(lang_value) if lang_value else ''
+        elif isinstance(value, list) and value:
+            if isinstance(value[0], dict):
+                # Handle nested dict in list
+                first_item = value[0]
+                first_lang_key = list(first_item.keys())[0] if first_item else ''
+                lang_value = first_item.get('eng', first_item.get(first_lang_key, ''))
+                if isinstance(lang_value, list) and lang_value:
+                    return str(lang_value[0])
+                return str(lang_value)
+            return str(value[0])
+        return str(value) if value else ''
+    except (AttributeError, TypeError):
+        return ''
+
+
+def get_country(value: Any) -> str:
+    """First buyer country (the field can be a list)"""
+    if isinstance(value, list) and value:
+        return str(value[0])
+    return str(value) if value else ''
+
+
+def get_deadline(value: Any) -> str:
+    """First submission deadline (the field can be a list)"""
+    if isinstance(value, list):
+        value = value[0] if value else ''
+    return str(value) if value else ''
+
+
+def get_cpv_codes(value: Any) -> List[str]:
+    try:
+        if isinstance(value, list):
+            return [str(cpv.get('cpv-code', '')) for cpv in value if cpv.get('cpv-code')]
+        elif isinstance(value, dict):
+            return [str(value.get('cpv-code', ''))] if value.get('cpv-code') else []
+        return []
+    except (AttributeError, TypeError):
+        return []
+
+
+def get_ted_url(result: Dict) -> str:
+    """Direct link if present, else a URL built from the publication number or identifier"""
+    links = result.get('links', [])
+    if links and isinstance(links, list):
+        for link in links:
+            if isinstance(link, dict) and link.get('href'):
+                return link['href']
+
+    pub_number = result.get('publication-number', '')
+    if pub_number:
+        return f"https://ted.europa.eu/udl?uri=TED:NOTICE:{pub_number}:TEXT:EN:HTML"
+
+    notice_id = result.get('notice-identifier', '')
+    if notice_id:
+        return f"https://ted.europa.eu/notices/{notice_id}"
+    return ''
+
+
+def get_document_links(value: Any, intern: Callable = lambda v: v) -> Tuple[DocumentLink, ...]:
+    try:
+        document_links = []
+        if isinstance(value, list):
+            for link in value:
+                if isinstance(link, dict):
+                    link_info = DocumentLink(
+                        url=link.get('href', ''),
+                        type=intern(link.get('type', 'document')),
+                        description=link.get('description', '')
+                    )
+                    if link_info.url:
+                        document_links.append(link_info)
+        return tuple(document_links)
+    except (AttributeError, TypeError):
+        return ()
+
+
+def detect_shape(values: Iterable[Any]) -> str:
+    """Shape shared by all present values, or MIXED"""
+    shapes = set()
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            shapes.add(LANG_MAP)
+        elif isinstance(value, str):
+            shapes.add(TEXT)
+        elif isinstance(value, list):
+            items = [v for v in value if v is not None]
+            shapes.add(DICT_LIST if items and all(isinstance(v, dict) for v in items) else LIST)
+        else:
+            return MIXED
+    return shapes.pop() if len(shapes) == 1 else MIXED
+
+
+# Specialised extractors: one type check per field, fallback when it fails
+
+def _language_text(languages: Dict) -> Optional[str]:
+    """English or first-language text of a non-empty language map, None for other shapes"""
+    lang_value = languages['eng'] if 'eng' in languages else next(iter(languages.values()))
+    if lang_value.__class__ is str:
+        return lang_value
+    if lang_value.__class__ is list and lang_value and lang_value[0].__class__ is str:
+        return lang_value[0]
+    return None
+
+
+def _lang_map_text(field: str) -> Callable[[Dict], str]:
+    def extract(notice: Dict) -> str:
+        value = notice.get(field)
+        if value.__class__ is dict and value:
+            text = _language_text(value)
+            if text is not None:
+                return text
+        elif value is None:
+            return ''
+        return get_text(value)
+    return extract
+
+
+def _lang_map_list_text(field: str) -> Callable[[Dict], str]:
+    def extract(notice: Dict) -> str:
+        value = notice.get(field)
+        if value.__class__ is list and value and value[0].__class__ is dict and value[0]:
+            text = _language_text(value[0])
+            if text is not None:
+                return text
+        elif value is None:
+            return ''
+        return get_text(value)
+    return extract
+
+
+def _list_text(field: str) -> Callable[[Dict], str]:
+    def extract(notice: Dict) -> str:
+        value = notice.get(field)
+        if value.__class__ is list and value and value[0].__class__ is str:
+            return value[0]
+        if value is None:
+            return ''
+        return get_text(value)
+    return extract
+
+
+def _plain_text(field: str) -> Callable[[Dict], str]:
+    def extract(notice: Dict) -> str:
+        value = notice.get(field)
+        if value.__class__ is str:
+            return value
+        if value is None:
+            return ''
+        return get_text(value)
+    return extract
+
+
+def _generic_text(field: str) -> Callable[[Dict], str]:
+    def extract(notice: Dict) -> str:
+        return get_text(notice.get(field, {}))
+    return extract
+
+
+TEXT_EXTRACTORS = {LANG_MAP: _lang_map_text, DICT_LIST: _lang_map_list_text, LIST: _list_text, TEXT: _plain_text}
+
+
+def _country(shape: str) -> Callable[[Dict], str]:
+    def from_list(notice: Dict) -> str:
+        value = notice.get('buyer-country')
+        if value.__class__ is list and value and value[0].__class__ is str:
+            return value[0]
+        return get_country(value)
+
+    def from_text(notice: Dict) -> str:
+        value = notice.get('buyer-country')
+        if value.__class__ is str:
+            return value
+        return get_country(value)
+
+    def generic(notice: Dict) -> str:
+        return get_country(notice.get('buyer-country', ''))
+
+    return {LIST: from_list, TEXT: from_text}.get(shape, generic)
+
+
+def _cpv_codes(shape: str) -> Callable[[Dict], List[str]]:
+    def from_dict_list(notice: Dict) -> List[str]:
+        value = notice.get('classification-cpv')
+        if value.__class__ is not list:
+            return get_cpv_codes(value) if value is not None else []
+        codes = []
+        for cpv in value:
+            if cpv.__class__ is not dict:
+                return get_cpv_codes(value)
+            code = cpv.get('cpv-code')
+            if code:
+                codes.append(code if code.__class__ is str else str(code))
+        return codes
+
+    def generic(notice: Dict) -> List[str]:
+        return get_cpv_codes(notice.get('classification-cpv', []))
+
+    return from_dict_list if shape == DICT_LIST else generic
+
+
+def _document_links(shape: str) -> Callable[[Dict, Callable], Tuple[DocumentLink, ...]]:
+    def from_dict_list(notice: Dict, intern: Callable) -> Tuple[DocumentLink, ...]:
+        value = notice.get('links')
+        if value.__class__ is not list:
+            return get_document_links(value, intern)
+        document_links = []
+        try:
+            for link in value:
+                if link.__class__ is not dict:
+                    return get_document_links(value, intern)
+                url = link.get('href', '')
+                if url:
+                    document_links.append(DocumentLink(
+                        url, intern(link.get('type', 'document')), link.get('description', '')
+                    ))
+        except TypeError:
+            return ()
+        return tuple(document_links)
+
+    def generic(notice: Dict, intern: Callable) -> Tuple[DocumentLink, ...]:
+        return get_document_links(notice.get('links', []), intern)
+
+    return from_dict_list if shape == DICT_LIST else generic
+
+
+def _ted_url(shape: str) -> Callable[[Dict], str]:
+    def from_dict_list(notice: Dict) -> str:
+        links = notice.get('links')
+        if links.__class__ is list:
+            for link in links:
+                if link.__class__ is dict:
+                    href = link.get('href')
+                    if href:
+                        return href
+            pub_number = notice.get('publication-number', '')
+            if pub_number:
+                return f"https://ted.europa.eu/udl?uri=TED:NOTICE:{pub_number}:TEXT:EN:HTML"
+        return get_ted_url(notice)
+
+    return from_dict_list if shape == DICT_LIST else get_ted_url
+
+
+class ExtractionPlan:
+    """Field extractors specialised to known field shapes
+
+    Every extractor checks the one shape it was built for and hands any
+    other value to the defensive getter, so a wrong guess costs speed, not
+    correctness.
+    """
+
+    def __init__(self, shapes: Optional[Dict[str, str]] = None):
+        self.shapes = dict(TED_SCHEMA if shapes is None else shapes)
+        shape = self.shapes.get
+        self.title = TEXT_EXTRACTORS.get(shape('notice-title'), _generic_text)('notice-title')
+        self.buyer_name = TEXT_EXTRACTORS.get(shape('buyer-name'), _generic_text)('buyer-name')
+        self.country = _country(shape('buyer-country', MIXED))
+        self.cpv_codes = _cpv_codes(shape('classification-cpv', MIXED))
+        self.document_links = _document_links(shape('links', MIXED))
+        self.ted_url = _ted_url(shape('links', MIXED))
+
+    @classmethod
+    def detect(cls, notices: List[Dict], sample_size: int = SAMPLE_SIZE) -> 'ExtractionPlan':
+        """Plan from the shapes seen in a sample of a batch; unseen fields use the schema"""
+        sample = notices[:sample_size]
+        shapes = {}
+        for field, declared in TED_SCHEMA.items():
+            detected = detect_shape(n.get(field) for n in sample)
+            shapes[field] = declared if detected == MIXED and all(n.get(field) is None for n in sample) else detected
+        return cls(shapes)
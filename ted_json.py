@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+JSON decoding for TED API responses
+orjson when it is installed, the standard library otherwise, and an incremental
+decoder that parses the notices array element by element as the body arrives
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Callable, Dict, List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DECODERS = ('auto', 'orjson', 'stdlib', 'incremental')
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def _orjson_loads(body) -> Any:
+    # orjson rejects NaN and Infinity, which the stdlib accepts
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return json.loads(body)
+
+
+def get_loads(name: str = 'auto') -> Callable[[Any], Any]:
+    """Whole-body decoder for bytes or str: 'auto' picks orjson if available"""
+    if name not in ('auto', 'orjson', 'stdlib'):
+        raise ValueError(f"Unknown JSON decoder: {name}")
+    if name == 'orjson' and orjson is None:
+        raise ValueError("JSON decoder 'orjson' requested but orjson is not installed")
+    if name != 'stdlib' and orjson is not None:
+        return _orjson_loads
+    return json.loads
+
+
+# Fastest available decoder
+loads = get_loads()
+
+
+class NoticeStreamDecoder:
+    """Incremental decoder for a search response fed in byte chunks
+
+    Elements of the top-level array under array_key are decoded as soon as
+    they are complete, so decoding overlaps the download and the body is
+    never held whole as bytes or text. Other top-level values are decoded
+    whole once they have arrived.
+    """
+
+    def __init__(self, array_key: str = 'notices'):
+        self.array_key = array_key
+        self.data: Dict[str, Any] = {}
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._scanner = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._state = 'start'
+        self._key = ''
+        self._items: List[Any] = []
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Add a chunk of the body; returns the array elements it completed"""
+        self._buffer = self._buffer[self._pos:] + self._text.decode(chunk)
+        self._pos = 0
+        return self._parse(final=False)
+
+    def close(self) -> Dict[str, Any]:
+        """Finish the body and return the decoded top-level object"""
+        self._buffer = self._buffer[self._pos:] + self._text.decode(b'', final=True)
+        self._pos = 0
+        self._parse(final=True)
+        if self._state != 'end':
+            raise ValueError("Truncated JSON response")
+        return self.data
+
+    def _value(self, buffer: str, pos: int, final: bool):
+        """Decode the value at pos, or return None if it may still be incomplete"""
+        try:
+            value, end = self._scanner.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None
+        # A number at the end of the buffer may continue in the next chunk
+        if end >= len(buffer) and not final:
+            return None
+        return value, end
+
+    def _parse(self, final: bool) -> List[Any]:
+        completed = []
+        buffer = self._buffer
+        while True:
+            pos = _WHITESPACE.match(buffer, self._pos).end()
+            self._pos = pos
+            if pos >= len(buffer):
+                return completed
+            char = buffer[pos]
+            state = self._state
+
+            if state == 'start':
+                if char != '{':
+                    raise ValueError(f"Expected a JSON object, got {char!r}")
+                self._pos, self._state = pos + 1, 'first_key'
+            elif state in ('first_key', 'key'):
+                if char == '}' and state == 'first_key':
+                    self._pos, self._state = pos + 1, 'end'
+                    continue
+                decoded = self._value(buffer, pos, final)
+                if decoded is None:
+                    return completed
+                self._key, self._pos = decoded
+                if not isinstance(self._key, str):
+                    raise ValueError(f"Expected a string key, got {self._key!r}")
+                self._state = 'colon'
+            elif state == 'colon':
+                if char != ':':
+                    raise ValueError(f"Expected ':' after key {self._key!r}")
+                self._pos, self._state = pos + 1, 'value'
+            elif state == 'value':
+                if self._key == self.array_key and char == '[':
+                    self._items = self.data[self._key] = []
+                    self._pos, self._state = pos + 1, 'first_item'
+                    continue
+                decoded = self._value(buffer, pos, final)
+                if decoded is None:
+                    return completed
+                self.data[self._key], self._pos = decoded
+                self._state = 'next_key'
+            elif state in ('first_item', 'item'):
+                if char == ']' and state == 'first_item':
+                    self._pos, self._state = pos + 1, 'next_key'
+                    continue
+                decoded = self._value(buffer, pos, final)
+                if decoded is None:
+                    return completed
+                item, self._pos = decoded
+                self._items.append(item)
+                completed.append(item)
+                self._state = 'next_item'
+            elif state == 'next_item':
+                if char not in ',]':
+                    raise ValueError(f"Expected ',' or ']' in {self.array_key}, got {char!r}")
+                self._pos, self._state = pos + 1, 'item' if char == ',' else 'next_key'
+            elif state == 'next_key':
+                if char not in ',}':
+                    raise ValueError(f"Expected ',' or '}}', got {char!r}")
+                self._pos, self._state = pos + 1, 'key' if char == ',' else 'end'
+            else:
+                raise ValueError("Unexpected data after the JSON object")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Compiled keyword matching for relevance scoring
+Aho-Corasick automaton that finds every keyword in one pass over a string
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, Set
+
+
+class KeywordMatcher:
+    """Case-insensitive substring matcher for a fixed keyword list
+
+    Matches are reported as keyword indices, so duplicate keywords count
+    separately, exactly like `kw.lower() in text.lower()` per keyword.
+    Short lists are scanned with str.__contains__ over the pre-lowered
+    keywords, which beats a pure-Python automaton below SCAN_THRESHOLD.
+    """
+
+    SCAN_THRESHOLD = 24
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = list(keywords)
+        patterns = [kw.lower() for kw in self.keywords]
+        self._patterns = patterns
+        # Texts are joined with NUL for the scan, so no keyword may contain one
+        self._use_scan = len(patterns) < self.SCAN_THRESHOLD and not any('\0' in p for p in patterns)
+
+        # An empty keyword is a substring of everything
+        self._always: FrozenSet[int] = frozenset(i for i, p in enumerate(patterns) if not p)
+
+        # Trie: goto transitions and the keyword indices ending at each node
+        goto: List[Dict[str, int]] = [{}]
+        output: List[Set[int]] = [set()]
+        for index, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    output.append(set())
+                node = nxt
+            output[node].add(index)
+
+        # Failure links in BFS order; outputs inherit from their failure node
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for node in queue:
+            for ch, child in goto[node].items():
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(ch, 0)
+                output[child] |= output[fail[child]]
+                queue.append(child)
+
+        self._goto = goto
+        self._fail = fail
+        self._output: List[FrozenSet[int]] = [frozenset(o) for o in output]
+        # Full transition table, filled lazily per (state, character)
+        self._delta: List[Dict[str, int]] = [dict(g) for g in goto]
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def _step(self, state: int, ch: str) -> int:
+        start = state
+        while state and ch not in self._goto[state]:
+            state = self._fail[state]
+        nxt = self._goto[state].get(ch, 0)
+        self._delta[start][ch] = nxt
+        return nxt
+
+    def find(self, text: str) -> Set[int]:
+        """Indices of all keywords occurring in text"""
+        if self._use_scan:
+            text = text.lower() if text else ''
+            return {i for i, pattern in enumerate(self._patterns) if pattern in text}
+        matched = set(self._always)
+        if not text or len(self._goto) == 1:
+            return matched
+        delta = self._delta
+        output = self._output
+        state = 0
+        for ch in text.lower():
+            nxt = delta[state].get(ch)
+            if nxt is None:
+                nxt = self._step(state, ch)
+            state = nxt
+            if output[state]:
+                matched |= output[state]
+        return matched
+
+    def count_matches(self, *texts: str) -> int:
+        """Number of keywords found in at least one of the texts"""
+        if self._use_scan:
+            joined = '\0'.join(texts).lower()
+            return sum(1 for pattern in self._patterns if pattern in joined)
+        matched: Set[int] = set()
+        for text in texts:
+            matched |= self.find(text)
+        return len(matched)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Run metrics for the search pipeline
+Stage timings, request latency histograms and counters, exportable as JSON or Prometheus text
+"""
+
+import cProfile
+import os
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Sequence
+
+# Request latency buckets in seconds (upper bounds)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# A span hook is called with the stage name and returns a context manager
+# entered around that stage, e.g. to start a profiler or emit trace events
+SpanHook = Callable[[str], ContextManager]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        cumulative['+Inf'] = self.count
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 4),
+            'mean': round(self.sum / self.count, 4) if self.count else None,
+            'min': round(self.min, 4) if self.min is not None else None,
+            'max': round(self.max, 4) if self.max is not None else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': cumulative
+        }
+
+
+class RunMetrics:
+    """Counters, stage durations and request latencies of one crawl"""
+
+    # Stages in pipeline order, for stable reporting
+    STAGES = ('plan', 'shard', 'request', 'parse', 'dedup', 'score', 'rank', 'push', 'export')
+
+    def __init__(self, span_hooks: Optional[List[SpanHook]] = None):
+        self.started = time.time()
+        self._started_perf = time.perf_counter()
+        self.finished_perf: Optional[float] = None
+        self.counters: Dict[str, int] = {}
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_calls: Dict[str, int] = {}
+        self.request_latency = Histogram()
+        self.span_hooks: List[SpanHook] = list(span_hooks or [])
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, stage: str, seconds: float, calls: int = 1):
+        """Add time measured by the caller (for hot loops where a span is too costly)"""
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+        self.stage_calls[stage] = self.stage_calls.get(stage, 0) + calls
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Time a synchronous block as part of a stage, running any span hooks around it
+
+        The block must not await: hooks such as cProfile would stay on while
+        other tasks run. Time awaited work with add_time instead.
+        """
+        with ExitStack() as stack:
+            for hook in self.span_hooks:
+                stack.enter_context(hook(stage))
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.add_time(stage, time.perf_counter() - started)
+
+    def observe_request(self, latency: float, status: int, size: int = 0):
+        """Record one HTTP request; status 0 means a network error or timeout"""
+        self.request_latency.observe(latency)
+        self.add_time('request', latency)
+        self.count('requests')
+        self.count(f"responses_{status}" if status else 'network_errors')
+        if status == 429:
+            self.count('rate_limited')
+        if size:
+            self.count('bytes_received', size)
+
+    def finish(self):
+        self.finished_perf = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_perf or time.perf_counter()) - self._started_perf
+
+    @property
+    def cache_hit_ratio(self) -> Optional[float]:
+        lookups = self.counters.get('cache_hits', 0) + self.counters.get('cache_misses', 0)
+        return round(self.counters.get('cache_hits', 0) / lookups, 3) if lookups else None
+
+    @property
+    def notices_per_second(self) -> float:
+        elapsed = self.elapsed
+        return round(self.counters.get('notices_unique', 0) / elapsed, 1) if elapsed else 0.0
+
+    def timing(self) -> Dict[str, Any]:
+        """Compact timing section for the run summary"""
+        stages = [s for s in self.STAGES if s in self.stage_seconds]
+        stages += sorted(s for s in self.stage_seconds if s not in self.STAGES)
+        return {
+            'total_seconds': round(self.elapsed, 3),
+            'stage_seconds': {s: round(self.stage_seconds[s], 3) for s in stages},
+            'requests': self.counters.get('requests', 0),
+            'retries': self.counters.get('retries', 0),
+            'rate_limited': self.counters.get('rate_limited', 0),
+            'notices_per_second': self.notices_per_second,
+            'cache_hit_ratio': self.cache_hit_ratio
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            **self.timing(),
+            'stage_calls': dict(self.stage_calls),
+            'counters': dict(sorted(self.counters.items())),
+            'request_latency_seconds': self.request_latency.to_dict()
+        }
+
+    def to_prometheus(self, prefix: str = 'ted_crawler') -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = [
+            f"# HELP {prefix}_run_duration_seconds Wall time of the run",
+            f"# TYPE {prefix}_run_duration_seconds gauge",
+            f"{prefix}_run_duration_seconds {self.elapsed:.6f}",
+            f"# HELP {prefix}_stage_seconds_total Time spent per pipeline stage",
+            f"# TYPE {prefix}_stage_seconds_total counter"
+        ]
+        for stage, seconds in self.stage_seconds.items():
+            lines.append(f'{prefix}_stage_seconds_total{{stage="{stage}"}} {seconds:.6f}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        lines.append(f"# HELP {prefix}_notices_per_second Unique notices processed per second")
+        lines.append(f"# TYPE {prefix}_notices_per_second gauge")
+        lines.append(f"{prefix}_notices_per_second {self.notices_per_second}")
+        if self.cache_hit_ratio is not None:
+            lines.append(f"# TYPE {prefix}_cache_hit_ratio gauge")
+            lines.append(f"{prefix}_cache_hit_ratio {self.cache_hit_ratio}")
+
+        histogram = self.request_latency
+        name = f"{prefix}_request_latency_seconds"
+        lines.append(f"# HELP {name} TED API request latency")
+        lines.append(f"# TYPE {name} histogram")
+        running = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            running += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {running}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum {histogram.sum:.6f}")
+        lines.append(f"{name}_count {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+class CProfileHook:
+    """Span hook that profiles selected stages with cProfile
+
+    Each profiled stage gets its own .prof file (readable with pstats or
+    snakeviz) in the output directory when dump() is called.
+    """
+
+    def __init__(self, stages: Sequence[str] = ('score',), directory: str = 'storage/profiles'):
+        self.stages = set(stages)
+        self.directory = directory
+        self.profiles: Dict[str, cProfile.Profile] = {}
+
+    @contextmanager
+    def __call__(self, stage: str) -> Iterator[None]:
+        if stage not in self.stages:
+            yield
+            return
+        profile = self.profiles.setdefault(stage, cProfile.Profile())
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+
+    def dump(self) -> List[str]:
+        os.makedirs(self.directory, exist_ok=True)
+        paths = []
+        for stage, profile in self.profiles.items():
+            path = os.path.join(self.directory, f"{stage}.prof")
+            profile.dump_stats(path)
+            paths.append(path)
+        return paths
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Compact tender records
+Slotted dataclasses for processed notices, with repeated strings shared through a pool
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class StringPool:
+    """Per-run interning of repeated values (countries, CPV codes, buyers, search groups)
+
+    Unlike sys.intern, the pool is dropped with the engine or on clear(),
+    so unbounded values such as buyer names do not outlive the run.
+    """
+
+    def __init__(self):
+        self._values: Dict[Hashable, Hashable] = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def intern(self, value):
+        """Canonical instance of an equal value seen before"""
+        return self._values.setdefault(value, value)
+
+    def intern_all(self, values: Iterable) -> Tuple:
+        """Pooled tuple of pooled values"""
+        return self.intern(tuple(self.intern(v) for v in values))
+
+    def clear(self):
+        self._values.clear()
+
+
+@dataclass(frozen=True, slots=True)
+class SearchMeta:
+    """Where a raw notice came from, shared by all notices of a page"""
+    type: str = ''
+    group: Tuple[str, ...] = ()
+    timestamp: str = ''
+    # Search profiles the query was planned for, in multi-profile runs
+    profiles: Tuple[str, ...] = ()
+
+
+NO_META = SearchMeta()
+
+
+@dataclass(slots=True)
+class DocumentLink:
+    url: str
+    type: str = 'document'
+    description: str = ''
+    # Key of the downloaded copy when documents are fetched ('' if the download failed)
+    stored_key: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, str]:
+        link = {'url': self.url, 'type': self.type, 'description': self.description}
+        if self.stored_key is not None:
+            link['stored_key'] = self.stored_key
+        return link
+
+
+@dataclass(slots=True, weakref_slot=True)
+class Tender:
+    """One processed notice, serialized with to_dict() for the dataset"""
+    notice_id: str
+    title: str
+    buyer_name: str
+    country: str
+    publication_date: str
+    deadline_date: str
+    cpv_codes: Tuple[str, ...]
+    notice_type: str
+    estimated_value_eur: int
+    ted_url: str
+    search_type: str = ''
+    search_group: Tuple[str, ...] = ()
+    found_timestamp: str = ''
+    # None when documents were not requested (the key is then left out)
+    document_links: Optional[Tuple[DocumentLink, ...]] = None
+    relevance_score: int = 0
+    status: str = 'unknown'
+    change_type: Optional[str] = None
+    # Other queries (type, group) that also returned the notice
+    provenance: Tuple[SearchMeta, ...] = ()
+
+    def add_provenance(self, meta: SearchMeta):
+        """Record another query that matched this notice, once per type and group"""
+        if meta.type == self.search_type and meta.group == self.search_group:
+            return
+        for other in self.provenance:
+            if other.type == meta.type and other.group == meta.group:
+                return
+        self.provenance += (meta,)
+
+    def matched_by(self) -> List[Dict[str, Any]]:
+        """Every query that returned the notice, the one it was first found by first"""
+        matches = [{'search_type': self.search_type, 'search_group': list(self.search_group)}]
+        matches.extend({'search_type': m.type, 'search_group': list(m.group)} for m in self.provenance)
+        return matches
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dataset record, in the field order the actor has always produced"""
+        record = {
+            'notice_id': self.notice_id,
+            'title': self.title,
+            'buyer_name': self.buyer_name,
+            'country': self.country,
+            'publication_date': self.publication_date,
+            'deadline_date': self.deadline_date,
+            'cpv_codes': list(self.cpv_codes),
+            'notice_type': self.notice_type,
+            'estimated_value_eur': self.estimated_value_eur,
+            'ted_url': self.ted_url,
+            'search_metadata': {
+                'search_type': self.search_type,
+                'search_group': list(self.search_group),
+                'found_timestamp': self.found_timestamp,
+                'matched_by': self.matched_by()
+            }
+        }
+        if self.document_links is not None:
+            record['document_links'] = [link.to_dict() for link in self.document_links]
+        record['relevance_score'] = self.relevance_score
+        record['status'] = self.status
+        if self.change_type is not None:
+            record['change_type'] = self.change_type
+        return record
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Batch runs over several search profiles
+Plans one shared set of queries for the union of the profiles' criteria and
+routes each fetched notice to the profiles whose own queries would return it
+"""
+
+import heapq
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from ted_dedup import Deduplicator
+from ted_models import SearchMeta, Tender
+from ted_pushdown import FilterPushdown, in_year_range
+from ted_query_planner import COUNTRY_MAPPING, QueryPlanner
+
+
+@dataclass
+class SearchProfile:
+    """One saved search: criteria, filters, result cap and scoring weights"""
+    name: str
+    keywords: List[str]
+    cpv_codes: List[str]
+    countries: List[str]
+    year_from: int = 2024
+    year_to: int = 2024
+    active_only: bool = False
+    min_value: int = 0
+    max_results: int = 100
+    include_documents: bool = True
+    # Overrides of the engine's scoring weights
+    scoring_criteria: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def country_codes(self) -> FrozenSet[str]:
+        """Country codes as given and in the API's 3-letter form"""
+        return frozenset(self.countries) | frozenset(COUNTRY_MAPPING.get(c, c) for c in self.countries)
+
+    def search_args(self) -> Dict[str, Any]:
+        """Arguments of an equivalent single-profile search"""
+        return dict(
+            keywords=self.keywords, cpv_codes=self.cpv_codes, countries=self.countries,
+            year_from=self.year_from, year_to=self.year_to, active_only=self.active_only,
+            min_value=self.min_value, include_documents=self.include_documents
+        )
+
+
+def _term_key(kind: str, value: str) -> Tuple[str, str]:
+    return (kind, ' '.join(value.lower().split()) if kind == 'keyword' else value)
+
+
+def plan_profiles(planner: QueryPlanner, profiles: List[SearchProfile],
+                  pushdown: Optional[FilterPushdown] = None) -> List[Dict]:
+    """Shared queries for several profiles, each tagged with the profiles it serves
+
+    Terms wanted by the same set of profiles are planned together, restricted
+    to those profiles' countries, so every notice a query returns would also
+    have been returned to each profile it is tagged with (up to that
+    profile's own countries). A term shared by many profiles is queried once.
+    Pushed-down filters are the loosest of the profiles sharing a query.
+    """
+    # Profiles that want each keyword or CPV term, and its text as first given
+    wanted_by: Dict[Tuple[str, str], List[str]] = {}
+    text: Dict[Tuple[str, str], str] = {}
+    for profile in profiles:
+        terms = ([('keyword', kw) for kw in profile.keywords]
+                 + [('cpv', cpv) for cpv in profile.cpv_codes])
+        for kind, value in terms:
+            key = _term_key(kind, value)
+            if not key[1]:
+                continue
+            text.setdefault(key, value)
+            names = wanted_by.setdefault(key, [])
+            if profile.name not in names:
+                names.append(profile.name)
+
+    groups: Dict[Tuple[str, ...], List[Tuple[str, str]]] = {}
+    for key, names in wanted_by.items():
+        groups.setdefault(tuple(names), []).append(key)
+
+    by_name = {profile.name: profile for profile in profiles}
+    queries: Dict[str, Dict] = {}
+
+    def add(planned: List[Dict], names: Tuple[str, ...]):
+        members = [by_name[name] for name in names]
+        if pushdown is not None:
+            planned = pushdown.apply(
+                planned, min(p.year_from for p in members), max(p.year_to for p in members),
+                min(p.min_value for p in members), all(p.active_only for p in members)
+            )
+        for query in planned:
+            existing = queries.get(query['query'])
+            if existing is None:
+                queries[query['query']] = dict(query, profiles=names)
+            else:
+                existing['profiles'] = existing['profiles'] + tuple(n for n in names if n not in existing['profiles'])
+
+    for names, keys in groups.items():
+        members = [by_name[name] for name in names]
+        # A profile without countries searches all of them
+        if all(p.countries for p in members):
+            countries = list(dict.fromkeys(c for p in members for c in p.countries))
+        else:
+            countries = []
+        add(planner.plan(
+            [text[k] for k in keys if k[0] == 'keyword'],
+            [text[k] for k in keys if k[0] == 'cpv'],
+            countries,
+            min(p.year_from for p in members),
+            max(p.year_to for p in members),
+            min(p.min_value for p in members)
+        ), names)
+
+    # Profiles without keywords or CPV codes get the planner's per-country queries
+    for profile in profiles:
+        if not profile.keywords and not profile.cpv_codes:
+            add(planner.plan([], [], profile.countries, profile.year_from,
+                             profile.year_to, profile.min_value), (profile.name,))
+
+    return list(queries.values())
+
+
+def explain_profiles(planner: QueryPlanner, profiles: List[SearchProfile],
+                     pushdown: Optional[FilterPushdown] = None) -> Dict[str, Any]:
+    """Dry-run description of the shared plan next to one plan per profile"""
+    queries = plan_profiles(planner, profiles, pushdown)
+    separate = {
+        profile.name: len(planner.plan(profile.keywords, profile.cpv_codes, profile.countries,
+                                       profile.year_from, profile.year_to, profile.min_value))
+        for profile in profiles
+    }
+    return {
+        'query_count': len(queries),
+        'separate_query_count': sum(separate.values()),
+        'profile_query_counts': separate,
+        'expected_calls': {
+            'min': len(queries),
+            'max': len(queries) * planner.max_pages_per_query
+        },
+        'queries': [
+            {
+                'query': q['query'],
+                'type': q['type'],
+                'group': q['group'],
+                'profiles': list(q['profiles']),
+                'length': len(q['query']),
+                'cost': q['cost']
+            }
+            for q in queries
+        ]
+    }
+
+
+def _buyer_countries(notice: Dict) -> Tuple[str, ...]:
+    value = notice.get('buyer-country')
+    if isinstance(value, list):
+        return tuple(str(v) for v in value if v)
+    return (str(value),) if value else ()
+
+
+class ProfileResults:
+    """One profile's share of a multi-profile run
+
+    Notices routed to the profile are deduplicated, processed and scored with
+    its own criteria and weights, and the best max_results are kept exactly
+    as search_tenders keeps them.
+    """
+
+    def __init__(self, profile: SearchProfile, scoring_criteria: Dict[str, int],
+                 filter_years: bool = False):
+        self.profile = profile
+        # Publication years are checked here when queries may span other profiles' years
+        self.filter_years = filter_years
+        self.scoring_criteria = dict(scoring_criteria, **profile.scoring_criteria)
+        self.dedup = Deduplicator()
+        self.country_codes = profile.country_codes
+        self.routed = 0
+        self.emitted = 0
+        self._pending: List[Dict] = []
+        self._pending_meta: List[SearchMeta] = []
+        self._top: List[Tuple[int, int, Tender]] = []
+        self._sequence = 0
+
+    def accepts(self, notice: Dict) -> bool:
+        """Whether the notice is in the profile's countries (shared queries may span more)"""
+        if not self.country_codes:
+            return True
+        countries = _buyer_countries(notice)
+        return not countries or any(c in self.country_codes for c in countries)
+
+    def add(self, engine, notice: Dict, meta: SearchMeta):
+        if not self.accepts(notice):
+            return
+        if self.filter_years and not in_year_range(notice, self.profile.year_from, self.profile.year_to):
+            return
+        if not self.dedup.first_sighting(notice.get('publication-number', ''), meta):
+            return
+        self.routed += 1
+        self._pending.append(notice)
+        self._pending_meta.append(meta)
+        if len(self._pending) >= max(1, engine.batch_size):
+            self.flush(engine)
+
+    def flush(self, engine):
+        """Process the notices waiting for a batch"""
+        batch, metas = self._pending, self._pending_meta
+        self._pending, self._pending_meta = [], []
+        if not batch:
+            return
+        profile = self.profile
+        # Processing is synchronous, so the engine's weights can be swapped for the batch
+        engine_criteria = engine.scoring_criteria
+        engine.scoring_criteria = self.scoring_criteria
+        try:
+            processed = engine._process_and_score_results(
+                batch, profile.keywords, profile.cpv_codes, profile.countries,
+                profile.active_only, profile.min_value, profile.include_documents, metas
+            )
+        finally:
+            engine.scoring_criteria = engine_criteria
+        for tender_info in processed:
+            self.dedup.emitted(tender_info)
+            self._rank(tender_info)
+        self.dedup.settle(r.get('publication-number', '') for r in batch)
+        self.emitted += len(processed)
+
+    def _rank(self, tender_info: Tender):
+        max_results = self.profile.max_results
+        if max_results <= 0:
+            return
+        entry = (tender_info.relevance_score, -self._sequence, tender_info)
+        self._sequence += 1
+        if len(self._top) < max_results:
+            heapq.heappush(self._top, entry)
+        elif entry[:2] > self._top[0][:2]:
+            heapq.heapreplace(self._top, entry)
+
+    def results(self) -> List[Tender]:
+        """Best tenders, highest score first, ties in arrival order"""
+        return [entry[2] for entry in sorted(self._top, key=lambda e: e[:2], reverse=True)]
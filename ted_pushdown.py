@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Filter pushdown for the TED search API
+Which filter predicates (publication date, value, deadline) the API accepts is
+probed once and cached; supported ones are added to the query text, and the
+rest stay client-side filters
+"""
+
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from ted_extract import get_deadline
+
+# Predicate -> (notice field, candidate syntaxes in order of preference)
+PREDICATES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    'publication_date': ('publication-date', (
+        'publication-date>={start} AND publication-date<={end}',
+        'publication-date>="{start}" AND publication-date<="{end}"'
+    )),
+    'value': ('value-eur', (
+        'value-eur>={value}',
+        'value-eur>="{value}"'
+    )),
+    'deadline': ('deadline-receipt', (
+        'deadline-receipt>={today}',
+        'deadline-receipt>="{today}"'
+    ))
+}
+
+# Probed capabilities are reused by later runs for this long
+MAX_AGE_SECONDS = 24 * 3600
+
+
+def probe_values(today: Optional[date] = None) -> Dict[str, Any]:
+    """Arguments for probe queries: last year's dates, a mid-size value, today"""
+    today = today or date.today()
+    return {
+        'start': f"{today.year - 1}0101",
+        'end': f"{today.year - 1}1231",
+        'value': 1000000,
+        'today': today.strftime('%Y%m%d')
+    }
+
+
+def probe_queries(predicate: str, today: Optional[date] = None) -> List[Tuple[str, str]]:
+    """(syntax, probe query) for each candidate syntax of a predicate"""
+    values = probe_values(today)
+    return [(syntax, syntax.format(**values)) for syntax in PREDICATES[predicate][1]]
+
+
+def probe_fields(predicate: str, fields: List[str]) -> List[str]:
+    """Fields to request in a predicate's probe: fields plus the one it filters on"""
+    field = PREDICATES[predicate][0]
+    return fields if field in fields else fields + [field]
+
+
+def honors_probe(predicate: str, notices: List[Dict], today: Optional[date] = None) -> Optional[bool]:
+    """Whether a probe answer shows the predicate applied, or None if it cannot tell
+
+    False if any notice should have been excluded. True needs at least one
+    notice that carries the predicate's field and satisfies it; an empty
+    answer, or one without the field, proves nothing.
+    """
+    verdicts = [satisfies(predicate, notice, today) for notice in notices]
+    if False in verdicts:
+        return False
+    if True in verdicts:
+        return True
+    return None
+
+
+def satisfies(predicate: str, notice: Dict, today: Optional[date] = None) -> Optional[bool]:
+    """Whether a notice passes a predicate's probe values (None if it lacks the field)"""
+    today = today or date.today()
+    values = probe_values(today)
+    if predicate == 'publication_date':
+        published = str(notice.get('publication-date', '') or '')[:10]
+        if not published:
+            return None
+        start = f"{values['start'][:4]}-{values['start'][4:6]}-{values['start'][6:]}"
+        end = f"{values['end'][:4]}-{values['end'][4:6]}-{values['end'][6:]}"
+        return start <= published <= end
+    if predicate == 'value':
+        value = _number(notice.get('value-eur'))
+        if value is None:
+            return None
+        return value >= values['value']
+    if predicate == 'deadline':
+        deadline = get_deadline(notice.get('deadline-receipt'))[:10]
+        if not deadline:
+            return None
+        # A day of slack for deadlines the API compares in another time zone
+        return deadline >= (today - timedelta(days=1)).isoformat()
+    return None
+
+
+def _number(value: Any) -> Optional[float]:
+    """A plain numeric field value, or None if it is missing or not a number"""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class PushdownCapabilities:
+    """Syntax the API accepted for each predicate (None if rejected), with the probe time
+
+    complete is False when some probe failed for reasons other than the API
+    rejecting the predicate; such results serve the run but are not saved.
+    """
+
+    def __init__(self, syntax: Optional[Dict[str, Optional[str]]] = None,
+                 probed_at: float = 0.0, complete: bool = True):
+        self.syntax = dict(syntax or {})
+        self.probed_at = probed_at
+        self.complete = complete
+
+    def supports(self, predicate: str) -> bool:
+        return bool(self.syntax.get(predicate))
+
+    def is_fresh(self, max_age: float = MAX_AGE_SECONDS) -> bool:
+        return (self.complete and set(self.syntax) >= set(PREDICATES)
+                and time.time() - self.probed_at < max_age)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'version': 1, 'syntax': self.syntax, 'probed_at': self.probed_at}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional['PushdownCapabilities']:
+        if not data or data.get('version') != 1:
+            return None
+        return cls(data.get('syntax', {}), data.get('probed_at', 0.0))
+
+
+class FilterPushdown:
+    """Adds the supported filter predicates to planned queries"""
+
+    def __init__(self, capabilities: PushdownCapabilities, today: Optional[date] = None):
+        self.capabilities = capabilities
+        self.today = today or date.today()
+
+    def clauses(self, year_from: int, year_to: int, min_value: int,
+                active_only: bool) -> List[Tuple[str, str]]:
+        """(predicate, clause) for every filter the API can apply"""
+        wanted = {
+            'publication_date': {'start': f"{year_from}0101", 'end': f"{year_to}1231"},
+            'value': {'value': min_value} if min_value > 0 else None,
+            # Deadlines later today still count as active; the client-side status check trims them
+            'deadline': {'today': self.today.strftime('%Y%m%d')} if active_only else None
+        }
+        return [
+            (predicate, self.capabilities.syntax[predicate].format(**values))
+            for predicate, values in wanted.items()
+            if values is not None and self.capabilities.supports(predicate)
+        ]
+
+    def pushed(self, year_from: int, year_to: int, min_value: int, active_only: bool) -> List[str]:
+        return [predicate for predicate, _ in self.clauses(year_from, year_to, min_value, active_only)]
+
+    def apply(self, search_queries: List[Dict], year_from: int, year_to: int,
+              min_value: int, active_only: bool) -> List[Dict]:
+        """Copies of the queries restricted by the pushed filters
+
+        base_query (the incremental state key) keeps the date and value
+        clauses, so a looser filter starts from fresh watermarks instead of
+        skipping notices the stricter one never fetched. Only the deadline
+        clause, which changes every day, is left out.
+        """
+        clauses = self.clauses(year_from, year_to, min_value, active_only)
+        if not clauses:
+            return search_queries
+        restricted = []
+        for search_config in search_queries:
+            query = search_config['query']
+            # Country queries already carry their own date and value clauses
+            extra = [(predicate, clause) for predicate, clause in clauses
+                     if f"{PREDICATES[predicate][0]}>=" not in query]
+            if extra:
+                base_query = search_config.get('base_query', query)
+                stable = [clause for predicate, clause in extra if predicate != 'deadline']
+                search_config = dict(
+                    search_config, query=f"({query}) AND {' AND '.join(c for _, c in extra)}",
+                    base_query=f"({base_query}) AND {' AND '.join(stable)}" if stable else base_query
+                )
+            restricted.append(search_config)
+        return restricted
+
+
+def in_year_range(notice: Dict, year_from: int, year_to: int) -> bool:
+    """Client-side publication-year filter; notices without a date are kept"""
+    year = str(notice.get('publication-date', '') or '')[:4]
+    return not year.isdigit() or year_from <= int(year) <= year_to
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Query planner for the TED search API
+Packs keyword and CPV clauses into as few queries as the API limits allow
+"""
+
+import calendar
+import math
+from datetime import date, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+from ted_cpv import CPVIndex, default_index
+
+# Convert country codes to 3-letter ISO format
+COUNTRY_MAPPING = {
+    'DE': 'DEU', 'FR': 'FRA', 'IT': 'ITA', 'ES': 'ESP', 'NL': 'NLD',
+    'GB': 'GBR', 'AT': 'AUT', 'BE': 'BEL', 'DK': 'DNK', 'FI': 'FIN',
+    'SE': 'SWE', 'NO': 'NOR', 'PL': 'POL', 'CZ': 'CZE', 'SK': 'SVK',
+    'HU': 'HUN', 'RO': 'ROU', 'BG': 'BGR', 'HR': 'HRV', 'SI': 'SVN',
+    'LT': 'LTU', 'LV': 'LVA', 'EE': 'EST', 'MT': 'MLT', 'CY': 'CYP',
+    'LU': 'LUX', 'IE': 'IRL', 'PT': 'PRT', 'GR': 'GRC', 'CH': 'CHE'
+}
+
+
+class DateWindow:
+    """Inclusive publication-date range used to shard a query"""
+
+    __slots__ = ('start', 'end', 'granularity')
+
+    def __init__(self, start: date, end: date, granularity: str):
+        self.start = start
+        self.end = end
+        self.granularity = granularity  # year, month, week or day
+
+    def __repr__(self):
+        return f"DateWindow({self.start.isoformat()}..{self.end.isoformat()}, {self.granularity})"
+
+    @property
+    def label(self) -> str:
+        return f"{self.start.isoformat()}..{self.end.isoformat()}"
+
+    @property
+    def clause(self) -> str:
+        return (f"publication-date>={self.start.strftime('%Y%m%d')} "
+                f"AND publication-date<={self.end.strftime('%Y%m%d')}")
+
+    def split(self) -> List['DateWindow']:
+        """Next finer windows (year -> months -> weeks -> days); [] for a single day"""
+        if self.granularity == 'year':
+            return [
+                DateWindow(date(self.start.year, month, 1),
+                           date(self.start.year, month, calendar.monthrange(self.start.year, month)[1]),
+                           'month')
+                for month in range(self.start.month, self.end.month + 1)
+            ]
+        if self.granularity == 'month':
+            step = timedelta(days=7)
+            windows, start = [], self.start
+            while start <= self.end:
+                windows.append(DateWindow(start, min(self.end, start + step - timedelta(days=1)), 'week'))
+                start += step
+            return windows
+        if self.granularity == 'week':
+            return [DateWindow(self.start + timedelta(days=i), self.start + timedelta(days=i), 'day')
+                    for i in range((self.end - self.start).days + 1)]
+        return []
+
+
+def year_windows(year_from: int, year_to: int, today: Optional[date] = None) -> List[DateWindow]:
+    """One window per year of the range, clipped to today"""
+    today = today or date.today()
+    windows = []
+    for year in range(year_from, year_to + 1):
+        start = date(year, 1, 1)
+        if start > today:
+            break
+        windows.append(DateWindow(start, min(date(year, 12, 31), today), 'year'))
+    return windows
+
+
+def shard_query(search_config: Dict, window: DateWindow) -> Dict:
+    """Copy of a planned query restricted to one publication-date window"""
+    shard = dict(search_config, query=f"({search_config['query']}) AND {window.clause}", window=window.label)
+    if 'base_query' in search_config:
+        shard['base_query'] = f"({search_config['base_query']}) AND {window.clause}"
+    return shard
+
+
+def collapse_cpv_codes(cpv_codes: List[str], index: Optional[CPVIndex] = None) -> Tuple[List[str], List[str]]:
+    """Drop invalid codes and codes already covered by a broader code in the same list
+
+    Returns (kept, dropped), both in input order.
+    """
+    return (index or default_index()).minimal_cover(cpv_codes)
+
+
+def collapse_keywords(keywords: List[str]) -> Tuple[List[str], List[str]]:
+    """Drop duplicate keywords and phrases that contain another keyword as whole words"""
+    unique = []
+    seen = set()
+    for kw in keywords:
+        key = ' '.join(kw.lower().split())
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(kw)
+
+    padded = {kw: f" {' '.join(kw.lower().split())} " for kw in unique}
+    kept, dropped = [], []
+    for kw in unique:
+        covered = any(other != kw and padded[other] in padded[kw] for other in unique)
+        (dropped if covered else kept).append(kw)
+    return kept, dropped
+
+
+class QueryPlanner:
+    """Builds the minimal set of search queries for a set of criteria"""
+
+    # Fixed grouping used before the planner existed, for explain() comparisons
+    LEGACY_KEYWORD_GROUP = 3
+    LEGACY_CPV_GROUP = 5
+
+    def __init__(self, max_query_length: int = 1500, max_clauses: int = 30,
+                 collapse_cpv: bool = True, max_pages_per_query: int = 10,
+                 expand_cpv: bool = False, cpv_index: Optional[CPVIndex] = None):
+        self.max_query_length = max_query_length
+        self.max_clauses = max_clauses
+        self.collapse_cpv = collapse_cpv
+        # For APIs that match CPV codes exactly: query known descendants too
+        self.expand_cpv = expand_cpv
+        self.max_pages_per_query = max_pages_per_query
+        self.cpv_index = cpv_index or default_index()
+
+    def plan(self, keywords: List[str], cpv_codes: List[str], countries: List[str],
+             year_from: int, year_to: int, min_value: int) -> List[Dict]:
+        """Plan queries as {'query', 'type', 'group', 'cost'} dicts"""
+        return self._plan(keywords, cpv_codes, countries, year_from, year_to, min_value)[0]
+
+    def explain(self, keywords: List[str], cpv_codes: List[str], countries: List[str],
+                year_from: int, year_to: int, min_value: int) -> Dict[str, Any]:
+        """Dry-run description of the plan and its expected API call count"""
+        queries, dropped = self._plan(keywords, cpv_codes, countries, year_from, year_to, min_value)
+        legacy_count = (math.ceil(len(keywords) / self.LEGACY_KEYWORD_GROUP)
+                        + math.ceil(len(cpv_codes) / self.LEGACY_CPV_GROUP))
+        if not keywords and not cpv_codes:
+            legacy_count = len(countries)
+
+        return {
+            'query_count': len(queries),
+            'legacy_query_count': legacy_count,
+            'expected_calls': {
+                'min': len(queries),
+                'max': len(queries) * self.max_pages_per_query
+            },
+            'dropped_keywords': dropped['keywords'],
+            'dropped_cpv_codes': dropped['cpv_codes'],
+            'queries': [
+                {
+                    'query': q['query'],
+                    'type': q['type'],
+                    'group': q['group'],
+                    'length': len(q['query']),
+                    'cost': q['cost']
+                }
+                for q in queries
+            ]
+        }
+
+    def estimate_cost(self, query: str, terms: int) -> Dict[str, int]:
+        """Rough cost of one query: its complexity and the calls it may take"""
+        return {
+            'clauses': terms,
+            'length': len(query),
+            'min_calls': 1,
+            'max_calls': self.max_pages_per_query
+        }
+
+    def _plan(self, keywords: List[str], cpv_codes: List[str], countries: List[str],
+              year_from: int, year_to: int, min_value: int) -> Tuple[List[Dict], Dict[str, List[str]]]:
+        queries = []
+        dropped = {'keywords': [], 'cpv_codes': []}
+
+        # Date range formatting (must be YYYYMMDD)
+        start_date = f"{year_from}0101"
+        end_date = f"{year_to}1231"
+
+        mapped_countries = [COUNTRY_MAPPING.get(c, c) for c in countries]
+
+        # Country filter, shared by every topic query
+        country_clause = ''
+        if mapped_countries:
+            country_query = ' OR '.join([f'buyer-country="{country}"' for country in mapped_countries])
+            country_clause = f"({country_query})"
+
+        # Date range and contract value filters are added by ted_pushdown
+        # where the API accepts them, and applied client-side otherwise
+
+        kept_keywords, dropped['keywords'] = collapse_keywords(keywords)
+        if self.expand_cpv:
+            kept_cpv = self.cpv_index.expand(cpv_codes)
+            dropped['cpv_codes'] = [c for c in cpv_codes if not self.cpv_index.is_valid(c)]
+        elif self.collapse_cpv:
+            kept_cpv, dropped['cpv_codes'] = collapse_cpv_codes(cpv_codes, self.cpv_index)
+        else:
+            kept_cpv = list(dict.fromkeys(c for c in cpv_codes if self.cpv_index.is_valid(c)))
+            dropped['cpv_codes'] = [c for c in cpv_codes if not self.cpv_index.is_valid(c)]
+
+        # Keyword and CPV clauses are packed greedily into shared OR-groups
+        terms = ([('keyword', kw, f'notice-title="{kw}"') for kw in kept_keywords]
+                 + [('cpv', cpv, f'classification-cpv="{cpv}"') for cpv in kept_cpv])
+
+        suffix = f" AND {country_clause}" if country_clause else ''
+        term_budget = max(1, self.max_clauses - len(mapped_countries))
+
+        batch: List[Tuple[str, str, str]] = []
+        for term in terms:
+            candidate = batch + [term]
+            if batch and (len(candidate) > term_budget
+                          or len(self._topic_query(candidate) + suffix) > self.max_query_length):
+                queries.append(self._make_query(batch, suffix, len(mapped_countries)))
+                candidate = [term]
+            batch = candidate
+        if batch:
+            queries.append(self._make_query(batch, suffix, len(mapped_countries)))
+
+        # Country-focused search if no specific criteria
+        if not keywords and not cpv_codes:
+            for country in countries:
+                query_parts = []
+                query_parts.append(f'buyer-country="{country}"')
+                query_parts.append(f'publication-date>={start_date}')
+                query_parts.append(f'publication-date<={end_date}')
+
+                if min_value > 0:
+                    query_parts.append(f'value-eur>={min_value}')
+
+                final_query = ' AND '.join(query_parts)
+                queries.append({
+                    'query': final_query, 'type': 'country', 'group': [country],
+                    'cost': self.estimate_cost(final_query, len(query_parts))
+                })
+
+        return queries, dropped
+
+    @staticmethod
+    def _topic_query(batch: List[Tuple[str, str, str]]) -> str:
+        return f"({' OR '.join(clause for _, _, clause in batch)})"
+
+    def _make_query(self, batch: List[Tuple[str, str, str]], suffix: str, country_terms: int) -> Dict:
+        kinds = {kind for kind, _, _ in batch}
+        final_query = self._topic_query(batch) + suffix
+        return {
+            'query': final_query,
+            'type': kinds.pop() if len(kinds) == 1 else 'mixed',
+            'group': [value for _, value, _ in batch],
+            'cost': self.estimate_cost(final_query, len(batch) + country_terms)
+        }
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Adaptive rate control for TED API requests
+Token bucket pacing, Retry-After handling, jittered backoff and AIMD concurrency
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Hashable, Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds to wait"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter for the given retry attempt (0-based)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Token bucket shared by all in-flight requests"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = max(0.01, rate)
+        self.capacity = max(1.0, capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def block_for(self, seconds: float):
+        """Stop handing out tokens for the given number of seconds (Retry-After)"""
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        # Nothing accumulates while the server has asked us to wait
+        self._tokens = 0.0
+        self._updated = max(self._updated, self._blocked_until)
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit driven by 429s and response latency"""
+
+    def __init__(self, initial: int = 2, minimum: int = 1, maximum: int = 8,
+                 decrease_factor: float = 0.5, latency_tolerance: float = 3.0,
+                 baseline_decay: float = 0.05):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self._successes = 0
+        # Typical latency per request size, drifting towards recent samples
+        self.baseline_decay = baseline_decay
+        self._baselines: Dict[Hashable, float] = {}
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency: float, size: Hashable = None):
+        """Additive increase once a full window of requests succeeded quickly
+
+        Latency is compared with the baseline of requests of the same size
+        (page limit), so small probes do not make full pages look congested.
+        """
+        baseline = self._baselines.get(size)
+        if baseline is None or latency < baseline:
+            self._baselines[size] = latency
+        else:
+            self._baselines[size] = baseline + self.baseline_decay * (latency - baseline)
+        if baseline is not None and latency > baseline * self.latency_tolerance:
+            self._decrease()
+            return
+        self._successes += 1
+        if self._successes >= int(self.limit):
+            self._successes = 0
+            self.limit = min(float(self.maximum), self.limit + 1)
+
+    def on_overload(self):
+        """Multiplicative decrease after a 429 or server overload"""
+        self._decrease()
+
+    def _decrease(self):
+        # Only back off once per burst of failures from the same window
+        now = time.monotonic()
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        self._successes = 0
+        self.limit = max(float(self.minimum), self.limit * self.decrease_factor)
+
+
+class RateController:
+    """Combined pacing, concurrency and retry policy for the TED API"""
+
+    def __init__(self, requests_per_second: float = 2.0, burst: Optional[float] = None,
+                 max_concurrency: int = 4, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_cap: float = 30.0):
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial=max(1, max_concurrency // 2), maximum=max_concurrency
+        )
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    async def acquire(self):
+        """Wait for a concurrency slot and a token"""
+        await self.limiter.acquire()
+        try:
+            await self.bucket.acquire()
+        except BaseException:
+            await self.limiter.release()
+            raise
+
+    async def release(self):
+        await self.limiter.release()
+
+    def record_success(self, latency: float, size: Hashable = None):
+        self.limiter.on_success(latency, size)
+
+    def record_rate_limited(self, retry_after: Optional[float], attempt: int) -> float:
+        """Register a 429 and return how long the caller should wait before retrying"""
+        self.limiter.on_overload()
+        delay = retry_after if retry_after is not None else self.backoff(attempt)
+        self.bucket.block_for(delay)
+        return delay
+
+    def record_failure(self, attempt: int, overloaded: bool = False) -> float:
+        """Register a retryable error and return the backoff delay"""
+        if overloaded:
+            self.limiter.on_overload()
+        return self.backoff(attempt)
+
+    def backoff(self, attempt: int) -> float:
+        return backoff_delay(attempt, self.backoff_base, self.backoff_cap)
@@ -4,17 +4,59 @@ Generic TED.EU Search Engine
 Adapted from specialized version to be configurable for any industry/keywords
 """
 
-import requests
 import asyncio
 import aiohttp
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+import heapq
+import sys
+import math
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 import logging
-import json
 import re
+import time
+
+from ted_batch import process_batch
+from ted_cache import ResponseCache
+from ted_cpv import CPVIndex
+from ted_dedup import Deduplicator, SeenHistory
+from ted_extract import (ExtractionPlan, get_country, get_cpv_codes, get_deadline,
+                         get_document_links, get_ted_url, get_text)
+from ted_json import NoticeStreamDecoder, get_loads
+from ted_matching import KeywordMatcher
+from ted_metrics import RunMetrics
+from ted_models import NO_META, DocumentLink, SearchMeta, StringPool, Tender
+from ted_profiles import ProfileResults, SearchProfile, explain_profiles, plan_profiles
+from ted_pushdown import (PREDICATES, FilterPushdown, PushdownCapabilities, honors_probe,
+                          in_year_range, probe_fields, probe_queries)
+from ted_query_planner import COUNTRY_MAPPING, QueryPlanner, shard_query, year_windows
+from ted_rate_limiter import RateController, parse_retry_after
+from ted_state import CrawlState
+from ted_store import NoticeStore
 
 logger = logging.getLogger(__name__)
 
+# Notice fields requested for every candidate (enough for keyword and country scoring)
+SEARCH_FIELDS = [
+    "notice-identifier", "publication-number", "buyer-name", "buyer-country",
+    "publication-date", "notice-title", "BT-24-Procedure"
+]
+
+# Heavier fields for status, value and CPV scoring and document links
+DETAIL_FIELDS = ["deadline-receipt", "value-eur", "classification-cpv", "notice-type", "links"]
+
+# Notices whose detail fields are kept in memory for the engine's lifetime
+DETAIL_CACHE_SIZE = 10000
+
+
+class TEDAPIError(Exception):
+    """Raised when a TED API request fails permanently"""
+    
+    def __init__(self, status: int, message: str):
+        super().__init__(f"API error: {status} - {message}")
+        self.status = status
+
+
 class IndustryTemplates:
     """Pre-defined keyword and CPV code templates for common industries"""
     
@@ -178,15 +220,41 @@ class IndustryTemplates:
     def list_templates(cls) -> List[str]:
         """List available templates"""
         return list(cls.TEMPLATES.keys())
+    
+    # Keyword matchers compiled once per template
+    MATCHERS = {name: KeywordMatcher(template['keywords']) for name, template in TEMPLATES.items()}
+    
+    @classmethod
+    def get_matcher(cls, template_name: str) -> Optional[KeywordMatcher]:
+        """Get the precompiled keyword matcher for a template"""
+        return cls.MATCHERS.get(template_name)
+    
+    @classmethod
+    def find_matcher(cls, keywords: List[str]) -> Optional[KeywordMatcher]:
+        """Get a precompiled matcher whose keywords are exactly these"""
+        for matcher in cls.MATCHERS.values():
+            if matcher.keywords == keywords:
+                return matcher
+        return None
 
 class TEDSearchEngine:
     """Generic TED.EU search engine with configurable filtering"""
     
-    def __init__(self):
+    def __init__(self, max_concurrency: int = 4, connection_limit: int = 10,
+                 requests_per_second: float = 2.0, max_retries: int = 5,
+                 page_size: int = 100, max_pages_per_query: int = 10,
+                 page_prefetch: int = 2, cache: Optional[ResponseCache] = None,
+                 planner: Optional[QueryPlanner] = None, shard_by_date: bool = False,
+                 batch_size: int = 500, store: Optional[NoticeStore] = None,
+                 metrics: Optional[RunMetrics] = None, json_decoder: str = 'auto',
+                 dedup_history: Optional[SeenHistory] = None, filter_pushdown: bool = False,
+                 pushdown_capabilities: Optional[PushdownCapabilities] = None,
+                 two_phase: bool = True):
         self.api_url = "https://api.ted.europa.eu/v3/notices/search"
         self.headers = {
             "Content-Type": "application/json",
             "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
             "User-Agent": "TED-Apify-Actor/1.0"
         }
         
@@ -198,8 +266,97 @@ class TEDSearchEngine:
             'valueMatch': 10
         }
         
-        # Rate limiting
-        self.request_delay = 1.0  # seconds between requests
+        # Concurrency and connection pooling
+        self.max_concurrency = max(1, max_concurrency)
+        self.connection_limit = max(1, connection_limit)
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        # Pagination
+        self.page_size = max(1, min(250, page_size))  # API maximum is 250
+        self.max_pages_per_query = max(1, max_pages_per_query)
+        self.page_prefetch = max(1, page_prefetch)
+        
+        # Query planning
+        self.planner = planner or QueryPlanner(max_pages_per_query=self.max_pages_per_query)
+        self.shard_by_date = shard_by_date
+        
+        # CPV taxonomy for hierarchy-aware matching
+        self.cpv_index = self.planner.cpv_index
+        
+        # Keyword matchers compiled once per keyword list (several in multi-profile runs)
+        self._keyword_matchers: Dict[int, Tuple[List[str], KeywordMatcher]] = {}
+        
+        # Optional on-disk response cache
+        self.cache = cache
+        
+        # Optional local notice store, filled from every crawl
+        self.store = store
+        
+        # Optional cross-run history of emitted notices (Bloom filter or disk set)
+        self.dedup_history = dedup_history
+        
+        # Date, value and deadline filters moved into the query text where the
+        # API supports them (probed once unless capabilities are given)
+        self.filter_pushdown = filter_pushdown
+        self.pushdown_capabilities = pushdown_capabilities
+        
+        # Ranked searches fetch detail fields only for their shortlist,
+        # cached per publication number (and in the response cache if any)
+        self.two_phase = two_phase
+        self._details: OrderedDict = OrderedDict()
+        # Whether publication-number IN (...) lookups work (None until probed)
+        self.lookup_supported: Optional[bool] = None
+        
+        # Stage timings, request latencies and counters
+        self.metrics = metrics or RunMetrics()
+        
+        # Response decoding: 'auto' (orjson if installed), 'orjson', 'stdlib',
+        # or 'incremental' to parse notices while the body is still arriving
+        self.json_decoder = json_decoder
+        self._json_loads = get_loads('auto' if json_decoder == 'incremental' else json_decoder)
+        
+        # Notices scored together in the columnar path (0 = one at a time)
+        self.batch_size = max(0, batch_size)
+        
+        # Repeated strings shared by all tenders of a search
+        self.strings = StringPool()
+        
+        # Field extractors for the declared TED shapes (batches detect their own)
+        self.extraction_plan = ExtractionPlan()
+        
+        # Rate limiting (shared token bucket, AIMD concurrency, retries)
+        self.rate_controller = RateController(
+            requests_per_second=requests_per_second,
+            max_concurrency=self.max_concurrency,
+            max_retries=max_retries
+        )
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared keep-alive session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                keepalive_timeout=60,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                auto_decompress=True
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the pooled HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
     def set_scoring_criteria(self, criteria: Dict[str, int]):
         """Set custom scoring criteria weights"""
@@ -209,314 +366,1082 @@ class TEDSearchEngine:
     async def search_tenders(self, keywords: List[str], cpv_codes: List[str],
                            countries: List[str], year_from: int, year_to: int,
                            active_only: bool = False, min_value: int = 0,
-                           max_results: int = 100, include_documents: bool = True) -> List[Dict]:
-        """Main search orchestration method"""
+                           max_results: int = 100, include_documents: bool = True,
+                           state: Optional[CrawlState] = None) -> List[Tender]:
+        """Main search orchestration method
         
-        logger.info(f"Starting search with {len(keywords)} keywords, {len(cpv_codes)} CPV codes")
+        With a CrawlState every match is returned, ranked: watermarks move
+        past all notices a query returned, so any left below a max_results
+        cut would never be fetched again.
+        """
+        if state is not None:
+            max_results = sys.maxsize
         
-        all_results = []
+        # Full crawls (incremental or archived to the local store) need every
+        # notice's details anyway; ranked searches fetch them for the shortlist
+        if (self.two_phase and self.lookup_supported is not False
+                and state is None and self.store is None and max_results > 0):
+            final_results = await self._search_two_phase(
+                keywords, cpv_codes, countries, year_from, year_to,
+                active_only, min_value, max_results, include_documents
+            )
+            if final_results is not None:
+                return final_results
         
-        # Build search queries
+        # Keep only the best max_results in a bounded min-heap; the sequence
+        # number breaks ties in arrival order, matching a stable full sort
+        top_results = []
+        sequence = 0
+        rank_seconds = 0.0
+        
+        async for tender_info in self.stream_tenders(
+            keywords, cpv_codes, countries, year_from, year_to,
+            active_only, min_value, include_documents, state
+        ):
+            if max_results <= 0:
+                continue
+            started = time.perf_counter()
+            entry = (tender_info.relevance_score, -sequence, tender_info)
+            sequence += 1
+            if len(top_results) < max_results:
+                heapq.heappush(top_results, entry)
+            elif entry[:2] > top_results[0][:2]:
+                heapq.heapreplace(top_results, entry)
+            rank_seconds += time.perf_counter() - started
+        
+        with self.metrics.span('rank'):
+            final_results = [entry[2] for entry in sorted(top_results, key=lambda e: e[:2], reverse=True)]
+        self.metrics.add_time('rank', rank_seconds, calls=0)
+        
+        logger.info(f"Final results: {len(final_results)}")
+        return final_results
+    
+    async def _search_two_phase(self, keywords: List[str], cpv_codes: List[str],
+                                countries: List[str], year_from: int, year_to: int,
+                                active_only: bool, min_value: int, max_results: int,
+                                include_documents: bool) -> Optional[List[Tender]]:
+        """Rank candidates on the search fields, fetching details only for the shortlist
+        
+        The search fields give exact keyword and country scores; CPV and value
+        matches can add at most their weights. Candidates are enriched in
+        order of that upper bound until none left could enter the top
+        max_results, so the result is the same as with every field fetched.
+        None if details could not be looked up (the caller searches again);
+        lookups are probed on the first hits, so that costs one page, not a
+        whole search.
+        """
+        metrics = self.metrics
+        weights = self.scoring_criteria
+        headroom = math.ceil(weights['valueMatch']) + (math.ceil(weights['cpvMatch']) if cpv_codes else 0)
+        # The provisional score is a lower bound of the final one, unless
+        # details can still filter the tender out
+        prune = not active_only and min_value <= 0
+        
+        # (score upper bound, -arrival sequence, provisional tender)
+        candidates: List[Tuple[int, int, Tender]] = []
+        # The max_results best (lower bound, -arrival sequence) seen so far
+        floor: List[Tuple[int, int]] = []
+        arrivals = 0
+        compact_at = 2 * max(max_results, self.page_size)
+        rank_seconds = 0.0
+        
+        # Probe lookups on the first hits, so an API without them falls back
+        # before phase 1 has paged through every query
+        if self.lookup_supported is None:
+            sample = await self._lookup_sample(
+                keywords, cpv_codes, countries, year_from, year_to, min_value, active_only
+            )
+            if sample and not await self.probe_lookup(sample):
+                metrics.count('two_phase_fallbacks')
+                logger.warning("publication-number lookups unavailable, searching with every field")
+                return None
+        
+        records = self.stream_tenders(
+            keywords, cpv_codes, countries, year_from, year_to,
+            active_only, min_value, False, fields=SEARCH_FIELDS
+        )
+        try:
+            async for tender_info in records:
+                started = time.perf_counter()
+                entry = (min(100, tender_info.relevance_score + headroom), -arrivals, tender_info)
+                arrivals += 1
+                if prune:
+                    lower = (tender_info.relevance_score, entry[1])
+                    if len(floor) < max_results:
+                        heapq.heappush(floor, lower)
+                    elif lower > floor[0]:
+                        heapq.heapreplace(floor, lower)
+                    # Candidates that max_results others are sure to beat can never be selected
+                    if len(floor) >= max_results and floor[0] > entry[:2]:
+                        rank_seconds += time.perf_counter() - started
+                        continue
+                candidates.append(entry)
+                if prune and len(candidates) >= compact_at and len(floor) >= max_results:
+                    candidates = [c for c in candidates if not floor[0] > c[:2]]
+                    compact_at = 2 * max(len(candidates), max_results, self.page_size)
+                rank_seconds += time.perf_counter() - started
+        finally:
+            await records.aclose()
+        if self.lookup_supported is None and candidates:
+            # The first planned query had no hits to probe with
+            await self.probe_lookup([entry[2].notice_id for entry in candidates[:2]])
+        if self.lookup_supported is not True and candidates:
+            metrics.count('two_phase_fallbacks')
+            logger.warning("publication-number lookups unavailable, searching with every field")
+            return None
+        
+        started = time.perf_counter()
+        if prune and len(floor) >= max_results:
+            candidates = [c for c in candidates if not floor[0] > c[:2]]
+        candidates.sort(key=lambda e: e[:2], reverse=True)
+        metrics.add_time('rank', rank_seconds + time.perf_counter() - started)
+        
+        top_results: List[Tuple[int, int, Tender]] = []
+        position = 0
+        enriched = 0
+        while position < len(candidates):
+            # Enough for the places still open, in lookups of up to a page each
+            shortlist = []
+            wanted = max(self.page_size, max_results - len(top_results))
+            while position < len(candidates) and len(shortlist) < wanted:
+                entry = candidates[position]
+                if len(top_results) >= max_results and top_results[0][:2] > entry[:2]:
+                    break
+                shortlist.append(entry)
+                position += 1
+            if not shortlist:
+                break
+            
+            details = await self._fetch_details([entry[2].notice_id for entry in shortlist])
+            if details is None:
+                # Never score on missing deadlines and values
+                metrics.count('two_phase_fallbacks')
+                logger.warning("Detail lookups failed, searching again with every field")
+                return None
+            enriched += len(shortlist)
+            
+            started = time.perf_counter()
+            completed = []
+            for _, sequence, tender_info in shortlist:
+                tender_info = self._apply_details(
+                    tender_info, details[tender_info.notice_id], keywords, cpv_codes, countries,
+                    active_only, min_value, include_documents
+                )
+                if tender_info is not None:
+                    completed.append((tender_info.relevance_score, sequence, tender_info))
+            metrics.add_time('score', time.perf_counter() - started, calls=len(shortlist))
+            
+            started = time.perf_counter()
+            for entry in completed:
+                if len(top_results) < max_results:
+                    heapq.heappush(top_results, entry)
+                elif entry[:2] > top_results[0][:2]:
+                    heapq.heapreplace(top_results, entry)
+            metrics.add_time('rank', time.perf_counter() - started, calls=0)
+        
+        metrics.count('candidates', arrivals)
+        metrics.count('enriched', enriched)
+        logger.info(f"Fetched details for {enriched} of {arrivals} candidates")
+        
+        with metrics.span('rank'):
+            final_results = [entry[2] for entry in sorted(top_results, key=lambda e: e[:2], reverse=True)]
+        logger.info(f"Final results: {len(final_results)}")
+        return final_results
+    
+    async def _lookup_sample(self, keywords: List[str], cpv_codes: List[str], countries: List[str],
+                             year_from: int, year_to: int, min_value: int,
+                             active_only: bool) -> List[str]:
+        """Publication numbers of the first hits of the first planned query, to probe lookups with"""
+        await self.probe_pushdown()
         search_queries = self._build_search_queries(
-            keywords, cpv_codes, countries, year_from, year_to, min_value
+            keywords, cpv_codes, countries, year_from, year_to, min_value, active_only
         )
+        if not search_queries:
+            return []
+        search_params = {
+            "query": search_queries[0]['query'],
+            "page": 1,
+            "limit": 2,
+            "paginationMode": "PAGE_NUMBER",
+            "fields": ["publication-number"]
+        }
+        try:
+            data = await self._post_search(search_params)
+        except TEDAPIError as e:
+            logger.warning(f"Could not sample notices to probe lookups with: {e}")
+            return []
+        numbers = [notice.get('publication-number', '') for notice in data.get('notices', [])]
+        return [number for number in numbers if number]
+    
+    async def _fetch_details(self, publication_numbers: List[str]) -> Optional[Dict[str, Dict]]:
+        """Detail fields of notices by publication number, from the caches or in batched lookups
+        
+        None if any notice's details could not be looked up.
+        """
+        metrics = self.metrics
+        details: Dict[str, Dict] = {}
+        
+        def from_cache(numbers: List[str]) -> List[str]:
+            missing = []
+            for number in numbers:
+                notice = self._details.get(number)
+                if notice is None and self.cache is not None:
+                    notice = self.cache.get(self._detail_key(number))
+                if notice is not None:
+                    metrics.count('detail_cache_hits')
+                    self._remember_details(number, notice, persist=False)
+                    details[number] = notice
+                else:
+                    missing.append(number)
+            return missing
         
-        logger.info(f"Generated {len(search_queries)} search queries")
+        missing = from_cache(publication_numbers)
+        if not missing:
+            return details
+        if not await self.probe_lookup(missing):
+            return None
+        # The probe's answer is already cached
+        missing = from_cache(missing)
+        
+        chunks = [missing[i:i + self.page_size] for i in range(0, len(missing), self.page_size)]
+        started = time.perf_counter()
+        pages = await asyncio.gather(*(
+            self._post_search(self._lookup_request(chunk), use_cache=False) for chunk in chunks
+        ), return_exceptions=True)
+        metrics.add_time('enrich', time.perf_counter() - started, calls=len(chunks))
+        
+        for chunk, page in zip(chunks, pages):
+            if isinstance(page, Exception):
+                logger.warning(f"Could not fetch details of {len(chunk)} notices: {page}")
+                return None
+            self._remember_lookup(chunk, page, details)
+        
+        unanswered = len(publication_numbers) - len(details)
+        if unanswered:
+            logger.warning(f"Lookup returned no details for {unanswered} notices")
+            return None
+        return details
+    
+    async def probe_lookup(self, publication_numbers: List[str]) -> bool:
+        """Whether the API answers publication-number IN (...) with exactly those notices, probed once"""
+        if self.lookup_supported is not None:
+            return self.lookup_supported
+        sample = publication_numbers[:2]
+        started = time.perf_counter()
+        try:
+            data = await self._post_search(self._lookup_request(sample), use_cache=False)
+        except TEDAPIError as e:
+            if 400 <= e.status < 500:
+                logger.info("API rejected publication-number lookups")
+                self.lookup_supported = False
+            else:
+                logger.warning(f"Could not probe publication-number lookups: {e}")
+            return False
+        finally:
+            self.metrics.add_time('probe', time.perf_counter() - started)
         
-        # Execute searches with rate limiting
-        for i, query in enumerate(search_queries):
-            logger.info(f"Executing query {i+1}/{len(search_queries)}")
+        returned = {notice.get('publication-number', '') for notice in data.get('notices', [])}
+        self.lookup_supported = returned == set(sample)
+        if self.lookup_supported:
+            self._remember_lookup(sample, data, {})
+        else:
+            logger.info("API did not apply a publication-number lookup")
+        return self.lookup_supported
+    
+    @staticmethod
+    def _lookup_request(publication_numbers: List[str]) -> Dict[str, Any]:
+        return {
+            "query": f"publication-number IN ({' '.join(publication_numbers)})",
+            "page": 1,
+            "limit": len(publication_numbers),
+            "paginationMode": "PAGE_NUMBER",
+            "fields": ["publication-number"] + DETAIL_FIELDS
+        }
+    
+    def _remember_lookup(self, publication_numbers: List[str], page: Dict, details: Dict[str, Dict]):
+        """Cache the requested notices of a lookup answer and add them to details"""
+        requested = set(publication_numbers)
+        for notice in page.get('notices', []):
+            number = notice.get('publication-number', '')
+            if number in details or number not in requested:
+                continue
+            self._remember_details(number, notice)
+            details[number] = notice
+    
+    @staticmethod
+    def _detail_key(publication_number: str) -> Dict[str, Any]:
+        """Response cache key of one notice's details"""
+        return {'publication-number': publication_number, 'fields': DETAIL_FIELDS}
+    
+    def _apply_details(self, tender_info: Tender, notice: Dict, keywords: List[str],
+                       cpv_codes: List[str], countries: List[str], active_only: bool,
+                       min_value: int, include_documents: bool) -> Optional[Tender]:
+        """Complete a tender found on the search fields, then score and filter it as _process_result does"""
+        try:
+            strings = self.strings
+            plan = self.extraction_plan
+            tender_info.deadline_date = get_deadline(notice.get('deadline-receipt'))
+            tender_info.cpv_codes = strings.intern_all(plan.cpv_codes(notice))
+            tender_info.notice_type = strings.intern(notice.get('notice-type', ''))
+            tender_info.estimated_value_eur = self._extract_value(notice)
+            if include_documents:
+                tender_info.document_links = plan.document_links(notice, strings.intern)
             
-            try:
-                results = await self._execute_search(query)
-                all_results.extend(results)
-                
-                # Rate limiting
-                if i < len(search_queries) - 1:
-                    await asyncio.sleep(self.request_delay)
-                    
-            except Exception as e:
-                logger.error(f"Query {i+1} failed: {e}")
+            tender_info.relevance_score = self._calculate_relevance_score(
+                tender_info, keywords, cpv_codes, countries, min_value
+            )
+            tender_info.status = self._determine_status(tender_info)
+            
+            if active_only and tender_info.status != 'active':
+                return None
+            if min_value > 0 and tender_info.estimated_value_eur < min_value:
+                return None
+            return tender_info
+        
+        except Exception as e:
+            logger.error(f"Error processing result: {e}")
+            return None
+    
+    def _remember_details(self, publication_number: str, notice: Dict, persist: bool = True):
+        details = self._details
+        details[publication_number] = notice
+        details.move_to_end(publication_number)
+        if len(details) > DETAIL_CACHE_SIZE:
+            details.popitem(last=False)
+        if persist and self.cache is not None:
+            self.cache.set(self._detail_key(publication_number), notice)
+    
+    async def stream_tenders(self, keywords: List[str], cpv_codes: List[str],
+                             countries: List[str], year_from: int, year_to: int,
+                             active_only: bool = False, min_value: int = 0,
+                             include_documents: bool = True,
+                             state: Optional[CrawlState] = None,
+                             search_queries: Optional[List[Dict]] = None,
+                             fields: Optional[List[str]] = None) -> AsyncIterator[Tender]:
+        """Stream deduplicated, scored tenders as they arrive (unranked)
+        
+        With a CrawlState only notices newer than each query's high-water mark
+        are fetched, and each tender is tagged as 'new' or 'updated'. Queries
+        that return an already seen notice are added to its provenance while
+        the tender is still held by the caller. search_queries runs those
+        planned queries as given instead of planning (and sharding) them.
+        fields narrows the notice fields fetched; without the detail fields,
+        the active_only and min_value filters are left to the caller.
+        """
+        
+        logger.info(f"Starting search with {len(keywords)} keywords, {len(cpv_codes)} CPV codes")
+        
+        metrics = self.metrics
+        planned = search_queries is None
+        
+        # Build search queries
+        if planned:
+            await self.probe_pushdown()
+            with metrics.span('plan'):
+                search_queries = self._build_search_queries(
+                    keywords, cpv_codes, countries, year_from, year_to, min_value, active_only
+                )
+            logger.info(f"Generated {len(search_queries)} search queries")
+        
+        # Split broad queries into publication-date windows that fit the page cap
+        if self.shard_by_date and planned:
+            started = time.perf_counter()
+            search_queries = await self._shard_queries(search_queries, year_from, year_to)
+            metrics.add_time('shard', time.perf_counter() - started)
+            logger.info(f"Sharded into {len(search_queries)} date-window queries")
+        
+        if fields is not None:
+            search_queries = [dict(search_config, fields=fields) for search_config in search_queries]
+            if not set(DETAIL_FIELDS) <= set(fields):
+                # Deadlines and values are not fetched, so nothing can be filtered on them
+                active_only, min_value = False, 0
+        
+        raw_count = 0
+        unique_count = 0
+        emitted_count = 0
+        out_of_range = 0
+        dedup_seconds = 0.0
+        dedup = Deduplicator(self.dedup_history)
+        pending: List[Dict] = []
+        pending_meta: List[SearchMeta] = []
+        to_store: List[Dict] = []
+        self.strings.clear()
+        
+        def finish(tender_info: Tender) -> Optional[Tender]:
+            # Skip notices already emitted unchanged by a previous run
+            if state is not None:
+                change_type = state.classify(tender_info)
+                if change_type is None:
+                    return None
+                tender_info.change_type = change_type
+            dedup.emitted(tender_info)
+            return tender_info
+        
+        async for result, meta in self._stream_raw_notices(search_queries, state):
+            raw_count += 1
+            
+            # Publication years the API could not filter on
+            if self.filter_pushdown and not in_year_range(result, year_from, year_to):
+                out_of_range += 1
+                continue
+            
+            # Remove duplicates by publication-number, keeping their provenance
+            started = time.perf_counter()
+            first = dedup.first_sighting(result.get('publication-number', ''), meta)
+            dedup_seconds += time.perf_counter() - started
+            if not first:
+                continue
+            unique_count += 1
+            
+            if self.store is not None:
+                to_store.append(result)
+                if len(to_store) >= 500:
+                    self._store_notices(to_store)
+                    to_store = []
+            
+            if self.batch_size:
+                pending.append(result)
+                pending_meta.append(meta)
+                if len(pending) < self.batch_size:
+                    continue
+                batch, batch_meta, pending, pending_meta = pending, pending_meta, [], []
+                with metrics.span('score'):
+                    processed = [t for t in self._process_and_score_results(
+                        batch, keywords, cpv_codes, countries,
+                        active_only, min_value, include_documents, batch_meta
+                    ) if finish(t) is not None]
+                dedup.settle(r.get('publication-number', '') for r in batch)
+                emitted_count += len(processed)
+                for tender_info in processed:
+                    yield tender_info
                 continue
+            
+            # Process and score
+            with metrics.span('score'):
+                tender_info = self._process_result(
+                    result, keywords, cpv_codes, countries,
+                    active_only, min_value, include_documents, meta
+                )
+                emitted = tender_info is not None and finish(tender_info) is not None
+            dedup.settle([result.get('publication-number', '')])
+            if emitted:
+                emitted_count += 1
+                yield tender_info
         
-        logger.info(f"Raw results collected: {len(all_results)}")
+        with metrics.span('score'):
+            processed = [t for t in self._process_and_score_results(
+                pending, keywords, cpv_codes, countries,
+                active_only, min_value, include_documents, pending_meta
+            ) if finish(t) is not None]
+        dedup.settle(r.get('publication-number', '') for r in pending)
+        emitted_count += len(processed)
+        for tender_info in processed:
+            yield tender_info
         
-        # Remove duplicates
-        unique_results = self._remove_duplicates(all_results)
-        logger.info(f"After deduplication: {len(unique_results)}")
+        if to_store:
+            self._store_notices(to_store)
         
-        # Process and score results
-        processed_results = await self._process_and_score_results(
-            unique_results, keywords, cpv_codes, countries, 
-            active_only, min_value, include_documents
+        metrics.add_time('dedup', dedup_seconds, calls=raw_count)
+        metrics.count('notices_raw', raw_count)
+        metrics.count('notices_unique', unique_count)
+        metrics.count('tenders_emitted', emitted_count)
+        metrics.count('duplicates', dedup.repeats)
+        metrics.count('provenance_merged', dedup.merged)
+        metrics.count('history_skipped', dedup.skipped)
+        metrics.count('filtered_client', out_of_range)
+        logger.info(f"Raw results collected: {raw_count}")
+        logger.info(f"After deduplication: {unique_count}")
+        if dedup.repeats:
+            logger.info(f"Merged provenance of {dedup.merged} of {dedup.repeats} repeated notices")
+        if dedup.skipped:
+            logger.info(f"Skipped {dedup.skipped} notices emitted by earlier runs")
+    
+    async def search_profiles(self, profiles: List[SearchProfile]) -> Dict[str, List[Tender]]:
+        """Search several profiles in one pass over a shared query plan
+
+        Every notice is fetched once and scored separately for each profile
+        that would have found it on its own, with that profile's filters and
+        weights. Returns each profile's ranked results by profile name.
+        """
+        metrics = self.metrics
+        await self.probe_pushdown()
+        with metrics.span('plan'):
+            search_queries = plan_profiles(self.planner, profiles, self._pushdown())
+            separate_count = sum(
+                len(self._build_search_queries(p.keywords, p.cpv_codes, p.countries,
+                                               p.year_from, p.year_to, p.min_value, p.active_only))
+                for p in profiles
+            )
+        logger.info(
+            f"Generated {len(search_queries)} shared search queries for {len(profiles)} profiles "
+            f"(separate runs would send {separate_count})"
         )
+        metrics.count('queries_planned', len(search_queries))
+        metrics.count('queries_saved', max(0, separate_count - len(search_queries)))
+
+        if self.shard_by_date:
+            started = time.perf_counter()
+            search_queries = await self._shard_queries(
+                search_queries, min(p.year_from for p in profiles), max(p.year_to for p in profiles)
+            )
+            metrics.add_time('shard', time.perf_counter() - started)
+            logger.info(f"Sharded into {len(search_queries)} date-window queries")
+
+        self.strings.clear()
+        collectors = {p.name: ProfileResults(p, self.scoring_criteria, self.filter_pushdown) for p in profiles}
+        raw_count = 0
+        seen = set()
+        to_store: List[Dict] = []
+
+        async for result, meta in self._stream_raw_notices(search_queries):
+            raw_count += 1
+            notice_id = result.get('publication-number', '')
+            if self.store is not None and notice_id and notice_id not in seen:
+                to_store.append(result)
+                if len(to_store) >= 500:
+                    self._store_notices(to_store)
+                    to_store = []
+            seen.add(notice_id)
+
+            with metrics.span('score'):
+                for name in meta.profiles:
+                    collectors[name].add(self, result, meta)
+
+        with metrics.span('score'):
+            for collector in collectors.values():
+                collector.flush(self)
+        if to_store:
+            self._store_notices(to_store)
+
+        with metrics.span('rank'):
+            results = {name: collector.results() for name, collector in collectors.items()}
+
+        metrics.count('notices_raw', raw_count)
+        metrics.count('notices_unique', len(seen))
+        metrics.count('tenders_emitted', sum(c.emitted for c in collectors.values()))
+        metrics.count('duplicates', sum(c.dedup.repeats for c in collectors.values()))
+        metrics.count('provenance_merged', sum(c.dedup.merged for c in collectors.values()))
+        logger.info(f"Raw results collected: {raw_count}, unique notices: {len(seen)}")
+        for name, collector in collectors.items():
+            logger.info(
+                f"Profile {name}: {collector.routed} notices, {collector.emitted} after filters, "
+                f"{len(results[name])} results"
+            )
+        return results
+
+    def explain_profiles(self, profiles: List[SearchProfile]) -> Dict[str, Any]:
+        """Dry run of a multi-profile search: the shared plan next to separate plans"""
+        return explain_profiles(self.planner, profiles, self._pushdown())
+
+    def search_local(self, keywords: List[str], cpv_codes: List[str],
+                     countries: List[str], year_from: int, year_to: int,
+                     active_only: bool = False, min_value: int = 0,
+                     max_results: int = 100, include_documents: bool = True) -> List[Tender]:
+        """Answer a search_tenders-style query from the local notice store
         
-        # Sort by relevance score and limit results
-        processed_results.sort(key=lambda x: x['relevance_score'], reverse=True)
-        final_results = processed_results[:max_results]
+        Candidates are selected like the planned API queries (keywords on the
+        title, CPV subtrees, buyer countries) plus the publication year range,
+        then filtered and scored exactly as live results are.
+        """
+        if self.store is None:
+            raise ValueError("search_local needs a NoticeStore")
         
-        logger.info(f"Final results: {len(final_results)}")
+        started = time.perf_counter()
+        mapped_countries = [COUNTRY_MAPPING.get(c, c) for c in countries]
+        rows = self.store.query(
+            keywords, cpv_codes, mapped_countries, year_from, year_to,
+            min_value=min_value, active_only=active_only
+        )
+        candidates = [notice for notice, _ in rows]
+        
+        # Notices stored in one upsert share their fetch time
+        metas: Dict[float, SearchMeta] = {}
+        for _, fetched in rows:
+            if fetched not in metas:
+                metas[fetched] = SearchMeta(
+                    'local', (), time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(fetched))
+                )
+        
+        self.strings.clear()
+        processed = self._process_and_score_results(
+            candidates, keywords, cpv_codes, countries,
+            active_only, min_value, include_documents,
+            [metas[fetched] for _, fetched in rows]
+        )
+        # Stable sort, so ties keep store order like the live ranking keeps arrival order
+        final_results = sorted(processed, key=lambda t: t.relevance_score, reverse=True)[:max(0, max_results)]
+        
+        logger.info(
+            f"Local search: {len(candidates)} candidates, {len(final_results)} results "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
         return final_results
     
-    def _build_search_queries(self, keywords: List[str], cpv_codes: List[str],
-                            countries: List[str], year_from: int, year_to: int,
-                            min_value: int) -> List[Dict]:
-        """Build optimized search queries"""
-        queries = []
-        
-        # Date range formatting (must be YYYYMMDD)
-        start_date = f"{year_from}0101"
-        end_date = f"{year_to}1231"
-        
-        # Convert country codes to 3-letter ISO format
-        country_mapping = {
-            'DE': 'DEU', 'FR': 'FRA', 'IT': 'ITA', 'ES': 'ESP', 'NL': 'NLD',
-            'GB': 'GBR', 'AT': 'AUT', 'BE': 'BEL', 'DK': 'DNK', 'FI': 'FIN',
-            'SE': 'SWE', 'NO': 'NOR', 'PL': 'POL', 'CZ': 'CZE', 'SK': 'SVK',
-            'HU': 'HUN', 'RO': 'ROU', 'BG': 'BGR', 'HR': 'HRV', 'SI': 'SVN',
-            'LT': 'LTU', 'LV': 'LVA', 'EE': 'EST', 'MT': 'MLT', 'CY': 'CYP',
-            'LU': 'LUX', 'IE': 'IRL', 'PT': 'PRT', 'GR': 'GRC', 'CH': 'CHE'
-        }
-        mapped_countries = [country_mapping.get(c, c) for c in countries]
+    def _store_notices(self, results: List[Dict]):
+        """Save raw notices to the local store with their indexed columns"""
+        try:
+            self.store.upsert({
+                'publication_number': result.get('publication-number', ''),
+                'title': self._safe_get_text(result, 'notice-title'),
+                'buyer_name': self._safe_get_text(result, 'buyer-name'),
+                'country': self._extract_country(result),
+                'publication_date': str(result.get('publication-date', '') or ''),
+                'deadline_date': get_deadline(result.get('deadline-receipt')),
+                'estimated_value_eur': self._extract_value(result),
+                'cpv_codes': self._extract_cpv_codes(result),
+                'raw': result
+            } for result in results)
+        except Exception as e:
+            logger.warning(f"Could not save {len(results)} notices to the local store: {e}")
+    
+    async def _stream_raw_notices(self, search_queries: List[Dict],
+                                  state: Optional[CrawlState] = None) -> AsyncIterator[Tuple[Dict, SearchMeta]]:
+        """Yield (raw notice, search metadata) in query order while the next queries prefetch concurrently"""
+        queues = [asyncio.Queue(maxsize=self.page_size) for _ in search_queries]
+        tasks = []
         
-        # Strategy 1: Keyword-based searches
-        if keywords:
-            # Group keywords to avoid overly complex queries
-            keyword_groups = [keywords[i:i+3] for i in range(0, len(keywords), 3)]
+        def start(i: int):
+            tasks.append(asyncio.create_task(self._fill_query_queue(i, search_queries, queues[i], state)))
+        
+        try:
+            # Window of max_concurrency running queries; the oldest one is always
+            # being drained, so later queries block on their full queues instead
+            # of buffering unbounded results
+            for i in range(min(self.max_concurrency, len(search_queries))):
+                start(i)
             
-            for keyword_group in keyword_groups:
-                query_parts = []
+            for i, queue in enumerate(queues):
+                while True:
+                    hit = await queue.get()
+                    if hit is None:
+                        break
+                    yield hit
                 
-                # Keywords in title (using proper syntax)
-                keyword_queries = [f'notice-title="{kw}"' for kw in keyword_group]
-                if keyword_queries:
-                    query_parts.append(f"({' OR '.join(keyword_queries)})")
-                
-                # Country filter
-                if mapped_countries:
-                    country_query = ' OR '.join([f'buyer-country="{country}"' for country in mapped_countries])
-                    query_parts.append(f"({country_query})")
-                
-                # Date range (temporarily disabled due to API constraints)
-                # query_parts.append(f'publication-date>={start_date}')
-                # query_parts.append(f'publication-date<={end_date}')
-                
-                # Contract value filter (temporarily disabled due to API constraints)
-                # if min_value > 0:
-                #     query_parts.append(f'value-eur>={min_value}')
-                
-                final_query = ' AND '.join(query_parts)
-                queries.append({'query': final_query, 'type': 'keyword', 'group': keyword_group})
+                if i + self.max_concurrency < len(search_queries):
+                    start(i + self.max_concurrency)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _fill_query_queue(self, i: int, search_queries: List[Dict], queue: asyncio.Queue,
+                                state: Optional[CrawlState] = None):
+        """Stream one query's notices into its queue, ending with None"""
+        logger.info(f"Executing query {i+1}/{len(search_queries)}")
+        search_config = search_queries[i]
+        count = 0
+        
+        # Incremental runs read newest first and stop at the previous high-water mark
+        query_key = watermark = None
+        if state is not None:
+            query_key = state.query_key(search_config)
+            watermark = state.watermark(query_key)
+            search_config = dict(search_config, query=f"{search_config['query']} SORT BY publication-date DESC")
+        newest = ''
+        status = {}
         
-        # Strategy 2: CPV code-based searches
-        if cpv_codes:
-            cpv_groups = [cpv_codes[i:i+5] for i in range(0, len(cpv_codes), 5)]
+        try:
+            async for notice, meta in self.iter_hits(search_config, stop_before=watermark, status=status):
+                published = str(notice.get('publication-date', ''))[:10]
+                if watermark and published and published < watermark:
+                    continue
+                newest = max(newest, published)
+                await queue.put((notice, meta))
+                count += 1
+            logger.info(f"Query returned {count} notices")
             
-            for cpv_group in cpv_groups:
-                query_parts = []
-                
-                # CPV codes
-                cpv_query = ' OR '.join([f'classification-cpv="{cpv}"' for cpv in cpv_group])
-                query_parts.append(f"({cpv_query})")
-                
-                # Country filter
-                if mapped_countries:
-                    country_query = ' OR '.join([f'buyer-country="{country}"' for country in mapped_countries])
-                    query_parts.append(f"({country_query})")
-                
-                # Date range (temporarily disabled due to API constraints)
-                # query_parts.append(f'publication-date>={start_date}')
-                # query_parts.append(f'publication-date<={end_date}')
-                
-                # Contract value filter (temporarily disabled due to API constraints)
-                # if min_value > 0:
-                #     query_parts.append(f'value-eur>={min_value}')
-                
-                final_query = ' AND '.join(query_parts)
-                queries.append({'query': final_query, 'type': 'cpv', 'group': cpv_group})
-        
-        # Strategy 3: Country-focused search if no specific criteria
-        if not keywords and not cpv_codes:
-            for country in countries:
-                query_parts = []
-                query_parts.append(f'buyer-country="{country}"')
-                query_parts.append(f'publication-date>={start_date}')
-                query_parts.append(f'publication-date<={end_date}')
-                
-                if min_value > 0:
-                    query_parts.append(f'value-eur>={min_value}')
-                
-                final_query = ' AND '.join(query_parts)
-                queries.append({'query': final_query, 'type': 'country', 'group': [country]})
+            # Only a fully read query may move its high-water mark
+            if query_key is not None and status.get('complete') and newest:
+                state.advance(query_key, newest)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Keep whatever pages arrived; a failed query never stops the others
+            if count:
+                logger.warning(f"Query {i+1} stopped after {count} notices: {e}")
+            else:
+                logger.error(f"Query {i+1} failed: {e}")
+        await queue.put(None)
+    
+    def _build_search_queries(self, keywords: List[str], cpv_codes: List[str],
+                            countries: List[str], year_from: int, year_to: int,
+                            min_value: int, active_only: bool = False) -> List[Dict]:
+        """Build optimized search queries, with supported filters pushed down once probed"""
+        search_queries = self.planner.plan(keywords, cpv_codes, countries, year_from, year_to, min_value)
+        pushdown = self._pushdown()
+        if pushdown is not None:
+            search_queries = pushdown.apply(search_queries, year_from, year_to, min_value, active_only)
+        return search_queries
+    
+    def _pushdown(self) -> Optional[FilterPushdown]:
+        if not self.filter_pushdown or self.pushdown_capabilities is None:
+            return None
+        return FilterPushdown(self.pushdown_capabilities)
+    
+    async def probe_pushdown(self) -> Optional[PushdownCapabilities]:
+        """Find out once which filter predicates the API applies (None without filter_pushdown)"""
+        if not self.filter_pushdown:
+            return None
+        if self.pushdown_capabilities is None:
+            # Awaited, so timed directly rather than in a span
+            started = time.perf_counter()
+            probed = await asyncio.gather(*(self._probe_predicate(p) for p in PREDICATES))
+            self.metrics.add_time('probe', time.perf_counter() - started)
+            self.pushdown_capabilities = PushdownCapabilities(
+                {predicate: syntax for predicate, (syntax, _) in zip(PREDICATES, probed)},
+                probed_at=time.time(),
+                complete=all(conclusive for _, conclusive in probed)
+            )
+            supported = [p for p in PREDICATES if self.pushdown_capabilities.supports(p)]
+            logger.info(f"Filter pushdown: {', '.join(supported) or 'no'} predicates supported by the API")
+        return self.pushdown_capabilities
+    
+    async def _probe_predicate(self, predicate: str) -> Tuple[Optional[str], bool]:
+        """First syntax the API accepts and applies for a predicate, and whether the probes were conclusive
+        
+        A syntax whose answer cannot show the filter applied (no notices, or
+        none carrying the field) is not used, and leaves the probe inconclusive
+        so the result is not saved for later runs.
+        """
+        conclusive = True
+        for syntax, query in probe_queries(predicate):
+            search_params = {
+                "query": query,
+                "page": 1,
+                "limit": 10,
+                "paginationMode": "PAGE_NUMBER",
+                # The filtered field lets the answer show whether the filter was applied
+                "fields": probe_fields(predicate, SEARCH_FIELDS)
+            }
+            try:
+                # A cached answer would outlive the capabilities it was probed for
+                data = await self._post_search(search_params, use_cache=False)
+            except TEDAPIError as e:
+                if 400 <= e.status < 500:
+                    logger.info(f"API rejected filter {query}")
+                    continue
+                logger.warning(f"Could not probe filter {predicate}: {e}")
+                return None, False
+            honored = honors_probe(predicate, data.get('notices', []))
+            if honored:
+                return syntax, True
+            if honored is None:
+                conclusive = False
+                logger.info(f"Probe of filter {query} returned no notice to check it against")
+            else:
+                logger.info(f"API accepted but did not apply filter {query}")
+        return None, conclusive
+    
+    def explain_search(self, keywords: List[str], cpv_codes: List[str],
+                       countries: List[str], year_from: int, year_to: int,
+                       min_value: int = 0, active_only: bool = False) -> Dict[str, Any]:
+        """Dry run: the planned queries and expected API calls, without fetching
         
-        return queries
+        Filters are shown pushed down only if capabilities are already known.
+        """
+        plan = self.planner.explain(keywords, cpv_codes, countries, year_from, year_to, min_value)
+        pushdown = self._pushdown()
+        if pushdown is not None:
+            plan['pushed_filters'] = pushdown.pushed(year_from, year_to, min_value, active_only)
+            restricted = pushdown.apply(plan['queries'], year_from, year_to, min_value, active_only)
+            plan['queries'] = [dict(q, length=len(q['query'])) for q in restricted]
+            for q in plan['queries']:
+                q.pop('base_query', None)
+        return plan
     
-    async def _execute_search(self, search_config: Dict) -> List[Dict]:
-        """Execute a single search query"""
+    async def _shard_queries(self, search_queries: List[Dict], year_from: int,
+                             year_to: int) -> List[Dict]:
+        """Split queries into year, month, week and day windows by reported hit count
+        
+        A window is split while it holds more notices than max_pages_per_query
+        pages can return. Empty windows are dropped; windows whose count cannot
+        be probed are kept whole.
+        """
+        threshold = self.max_pages_per_query * self.page_size
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def shards_for(search_config: Dict, window) -> List[Dict]:
+            shard = shard_query(search_config, window)
+            async with semaphore:
+                hits = await self._count_hits(shard)
+            if hits == 0:
+                return []
+            children = window.split()
+            if hits is None or hits <= threshold or not children:
+                return [shard]
+            logger.info(f"Window {window.label} has {hits} notices, splitting by {children[0].granularity}")
+            parts = await asyncio.gather(*(shards_for(search_config, child) for child in children))
+            return [s for part in parts for s in part]
+        
+        windows = year_windows(year_from, year_to)
+        parts = await asyncio.gather(*(
+            shards_for(search_config, window)
+            for search_config in search_queries
+            for window in windows
+        ))
+        return [shard for part in parts for shard in part]
+    
+    async def _count_hits(self, search_config: Dict) -> Optional[int]:
+        """Total notices a query matches, or None if the API does not say"""
         search_params = {
             "query": search_config['query'],
-            "limit": 100,
-            "fields": [
-                "notice-identifier", "publication-number", "buyer-name", "buyer-country",
-                "publication-date", "notice-title", "BT-24-Procedure"
-            ]
+            "page": 1,
+            "limit": 1,
+            "paginationMode": "PAGE_NUMBER",
+            "fields": ["publication-number"]
         }
+        try:
+            total = (await self._post_search(search_params)).get('totalNoticeCount')
+        except TEDAPIError as e:
+            logger.warning(f"Could not count hits for window: {e}")
+            return None
+        return total if isinstance(total, int) else None
+    
+    async def iter_hits(self, search_config: Dict, stop_before: Optional[str] = None,
+                        status: Optional[Dict] = None) -> AsyncIterator[Tuple[Dict, SearchMeta]]:
+        """Stream (raw notice, search metadata) for a query, prefetching the next pages
+        
+        stop_before (YYYY-MM-DD) ends pagination after the first page holding an
+        older notice, for queries sorted newest first. status['complete'] is set
+        when pagination ended without hitting the page cap.
+        """
+        pages: asyncio.Queue = asyncio.Queue(maxsize=self.page_prefetch)
+        producer = asyncio.create_task(self._fetch_pages(search_config, pages, stop_before, status))
         
         try:
-            logger.info(f"Sending query: {search_params['query']}")
-            async with aiohttp.ClientSession() as session:
+            while True:
+                page = await pages.get()
+                if page is None:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+                notices, meta = page
+                for notice in notices:
+                    yield notice, meta
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+    
+    async def _fetch_pages(self, search_config: Dict, pages: asyncio.Queue,
+                           stop_before: Optional[str] = None, status: Optional[Dict] = None):
+        """Fetch pages in order into a bounded queue, ending with None"""
+        status = status if status is not None else {}
+        try:
+            fetched = 0
+            for page_number in range(1, self.max_pages_per_query + 1):
+                data = await self._fetch_page(search_config, page_number)
+                notices = data.get('notices', [])
+                fetched += len(notices)
+                meta = SearchMeta(search_config['type'], tuple(search_config['group']),
+                                  datetime.now().isoformat(), tuple(search_config.get('profiles', ())))
+                await pages.put((notices, meta))
+                
+                total = data.get('totalNoticeCount')
+                reached_watermark = stop_before is not None and any(
+                    '' < str(n.get('publication-date', ''))[:10] < stop_before for n in notices
+                )
+                if (len(notices) < self.page_size or reached_watermark
+                        or (isinstance(total, int) and fetched >= total)):
+                    status['complete'] = True
+                    break
+                if page_number == self.max_pages_per_query:
+                    logger.warning(
+                        f"Page cap ({self.max_pages_per_query}) reached for query "
+                        f"with {total if total is not None else 'more'} notices"
+                    )
+        except Exception as e:
+            await pages.put(e)
+            return
+        await pages.put(None)
+    
+    async def _fetch_page(self, search_config: Dict, page_number: int) -> Dict:
+        """Fetch one page of a search query"""
+        search_params = {
+            "query": search_config['query'],
+            "page": page_number,
+            "limit": self.page_size,
+            "paginationMode": "PAGE_NUMBER",
+            "fields": search_config.get('fields', SEARCH_FIELDS + DETAIL_FIELDS)
+        }
+        
+        logger.info(f"Sending query (page {page_number}): {search_params['query']}")
+        return await self._post_search(search_params)
+    
+    async def _post_search(self, search_params: Dict, use_cache: bool = True) -> Dict:
+        """POST a search request under rate control, retrying 429s, 5xx and network errors"""
+        # Cache hits skip both the network and the rate limiter
+        metrics = self.metrics
+        cache = self.cache if use_cache else None
+        if cache is not None:
+            cached = cache.get(search_params)
+            if cached is not None:
+                metrics.count('cache_hits')
+                return cached
+            metrics.count('cache_misses')
+        
+        controller = self.rate_controller
+        last_error = ''
+        
+        for attempt in range(controller.max_retries + 1):
+            if attempt:
+                metrics.count('retries')
+            await controller.acquire()
+            started = time.monotonic()
+            try:
+                session = await self._get_session()
                 async with session.post(
-                    self.api_url, 
-                    json=search_params, 
-                    headers=self.headers,
+                    self.api_url,
+                    json=search_params,
                     timeout=aiohttp.ClientTimeout(total=30)
                 ) as response:
                     
                     if response.status == 200:
-                        data = await response.json()
-                        notices = data.get('notices', [])
-                        
-                        # Add search metadata
-                        for notice in notices:
-                            notice['_search_type'] = search_config['type']
-                            notice['_search_group'] = search_config['group']
-                            notice['_search_timestamp'] = datetime.now().isoformat()
-                        
-                        logger.info(f"Query returned {len(notices)} notices")
-                        return notices
+                        data, size = await self._read_json(response)
+                        latency = time.monotonic() - started
+                        metrics.observe_request(latency, response.status, size)
+                        controller.record_success(latency, search_params.get('limit'))
+                        if cache is not None:
+                            cache.set(search_params, data)
+                        return data
                     
-                    elif response.status == 429:
-                        logger.warning("Rate limit hit, backing off")
-                        await asyncio.sleep(5)
-                        return []
+                    error_text = await response.text()
+                    metrics.observe_request(time.monotonic() - started, response.status, len(error_text))
+                    last_error = f"{response.status} - {error_text[:200]}"
                     
+                    if response.status == 429:
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        delay = controller.record_rate_limited(retry_after, attempt)
+                        logger.warning(f"Rate limit hit, retrying in {delay:.1f}s")
+                    elif response.status >= 500:
+                        delay = controller.record_failure(attempt, overloaded=response.status in (502, 503, 504))
+                        logger.warning(f"Server error {response.status}, retrying in {delay:.1f}s")
                     else:
-                        error_text = await response.text()
-                        logger.error(f"API error: {response.status} - {error_text}")
-                        return []
+                        raise TEDAPIError(response.status, error_text)
                         
-        except Exception as e:
-            logger.error(f"Search execution error: {e}")
-            return []
-    
-    def _remove_duplicates(self, results: List[Dict]) -> List[Dict]:
-        """Remove duplicate notices by publication-number"""
-        seen = set()
-        unique_results = []
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                metrics.observe_request(time.monotonic() - started, 0)
+                last_error = str(e) or type(e).__name__
+                delay = controller.record_failure(attempt)
+                logger.warning(f"Request error: {last_error}, retrying in {delay:.1f}s")
+            finally:
+                await controller.release()
+            
+            if attempt < controller.max_retries:
+                await asyncio.sleep(delay)
         
-        for result in results:
-            # Use publication-number as the unique identifier
-            notice_id = result.get('publication-number', '')
-            if notice_id and notice_id not in seen:
-                seen.add(notice_id)
-                unique_results.append(result)
+        raise TEDAPIError(0, f"giving up after {controller.max_retries + 1} attempts: {last_error}")
+    
+    async def _read_json(self, response: aiohttp.ClientResponse) -> Tuple[Dict, int]:
+        """Decode a response body, returning the data and the body size in bytes"""
+        metrics = self.metrics
+        if self.json_decoder != 'incremental':
+            body = await response.read()
+            with metrics.span('parse'):
+                return self._json_loads(body), len(body)
         
-        return unique_results
+        # Decode notices chunk by chunk while the rest of the body downloads
+        decoder = NoticeStreamDecoder()
+        size = 0
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            size += len(chunk)
+            with metrics.span('parse'):
+                decoder.feed(chunk)
+        with metrics.span('parse'):
+            return decoder.close(), size
     
-    async def _process_and_score_results(self, results: List[Dict], keywords: List[str],
-                                       cpv_codes: List[str], countries: List[str],
-                                       active_only: bool, min_value: int,
-                                       include_documents: bool) -> List[Dict]:
-        """Process and score all results"""
-        processed_results = []
+    def _process_and_score_results(self, results: List[Dict], keywords: List[str],
+                                   cpv_codes: List[str], countries: List[str],
+                                   active_only: bool, min_value: int,
+                                   include_documents: bool,
+                                   metas: Optional[List[SearchMeta]] = None) -> List[Tender]:
+        """Process and score all results, columnar when batching is enabled
         
-        for result in results:
+        metas holds the search metadata of each result (none when omitted).
+        """
+        metas = metas if metas is not None else [NO_META] * len(results)
+        if self.batch_size and results:
             try:
-                # Extract basic info
-                tender_info = {
-                    'notice_id': result.get('publication-number', ''),  # Use publication-number as ID
-                    'title': self._safe_get_text(result, 'notice-title'),
-                    'buyer_name': self._safe_get_text(result, 'buyer-name'),
-                    'country': self._extract_country(result),  # Handle country list
-                    'publication_date': result.get('publication-date', ''),
-                    'deadline_date': result.get('deadline-receipt', ''),
-                    'cpv_codes': self._extract_cpv_codes(result),
-                    'notice_type': result.get('notice-type', ''),
-                    'estimated_value_eur': self._extract_value(result),
-                    'ted_url': self._generate_ted_url(result),
-                    'search_metadata': {
-                        'search_type': result.get('_search_type', ''),
-                        'search_group': result.get('_search_group', []),
-                        'found_timestamp': result.get('_search_timestamp', '')
-                    }
-                }
-                
-                # Add document links if requested
-                if include_documents:
-                    tender_info['document_links'] = self._extract_document_links(result)
-                
-                # Calculate relevance score
-                relevance_score = self._calculate_relevance_score(
-                    tender_info, keywords, cpv_codes, countries, min_value
+                return process_batch(
+                    self, results, keywords, cpv_codes, countries,
+                    active_only, min_value, include_documents, metas
                 )
-                tender_info['relevance_score'] = relevance_score
-                
-                # Determine tender status
-                tender_info['status'] = self._determine_status(tender_info)
-                
-                # Apply filters
-                if active_only and tender_info['status'] != 'active':
-                    continue
-                
-                if min_value > 0 and tender_info['estimated_value_eur'] < min_value:
-                    continue
-                
-                processed_results.append(tender_info)
-                
             except Exception as e:
-                logger.error(f"Error processing result: {e}")
-                continue
+                logger.warning(f"Batch processing failed, falling back to per-notice path: {e}")
+        
+        processed_results = []
+        
+        for result, meta in zip(results, metas):
+            tender_info = self._process_result(
+                result, keywords, cpv_codes, countries,
+                active_only, min_value, include_documents, meta
+            )
+            if tender_info is not None:
+                processed_results.append(tender_info)
         
         return processed_results
     
+    def _process_result(self, result: Dict, keywords: List[str],
+                        cpv_codes: List[str], countries: List[str],
+                        active_only: bool, min_value: int,
+                        include_documents: bool, meta: SearchMeta = NO_META) -> Optional[Tender]:
+        """Process and score a single result, or None if it is filtered out"""
+        try:
+            strings = self.strings
+            plan = self.extraction_plan
+            
+            # Extract basic info
+            tender_info = Tender(
+                notice_id=result.get('publication-number', ''),  # Use publication-number as ID
+                title=plan.title(result),
+                buyer_name=strings.intern(plan.buyer_name(result)),
+                country=strings.intern(plan.country(result)),  # Handle country list
+                publication_date=result.get('publication-date', ''),
+                deadline_date=get_deadline(result.get('deadline-receipt')),
+                cpv_codes=strings.intern_all(plan.cpv_codes(result)),
+                notice_type=strings.intern(result.get('notice-type', '')),
+                estimated_value_eur=self._extract_value(result),
+                ted_url=plan.ted_url(result),
+                search_type=meta.type,
+                search_group=strings.intern(meta.group),
+                found_timestamp=strings.intern(meta.timestamp)
+            )
+            
+            # Add document links if requested
+            if include_documents:
+                tender_info.document_links = plan.document_links(result, strings.intern)
+            
+            # Calculate relevance score
+            tender_info.relevance_score = self._calculate_relevance_score(
+                tender_info, keywords, cpv_codes, countries, min_value
+            )
+            
+            # Determine tender status
+            tender_info.status = self._determine_status(tender_info)
+            
+            # Apply filters
+            if active_only and tender_info.status != 'active':
+                return None
+            
+            if min_value > 0 and tender_info.estimated_value_eur < min_value:
+                return None
+            
+            return tender_info
+            
+        except Exception as e:
+            logger.error(f"Error processing result: {e}")
+            return None
+    
     def _extract_country(self, result: Dict) -> str:
         """Extract country code from buyer-country field (which can be a list)"""
-        try:
-            country_data = result.get('buyer-country', '')
-            if isinstance(country_data, list) and country_data:
-                return str(country_data[0])
-            return str(country_data) if country_data else ''
-        except:
-            return ''
+        return get_country(result.get('buyer-country', ''))
     
     def _safe_get_text(self, obj: Dict, field: str) -> str:
         """Safely extract text from multilingual fields"""
-        try:
-            value = obj.get(field, {})
-            if isinstance(value, dict):
-                # Try English first, then any available language
-                first_lang_key = list(value.keys())[0] if value else ''
-                lang_value = value.get('eng', value.get(first_lang_key, ''))
-                
-                # Handle case where language value is a list
-                if isinstance(lang_value, list) and lang_value:
-                    return str(lang_value[0])
-                return str(lang_value) if lang_value else ''
-            elif isinstance(value, list) and value:
-                if isinstance(value[0], dict):
-                    # Handle nested dict in list
-                    first_item = value[0]
-                    first_lang_key = list(first_item.keys())[0] if first_item else ''
-                    lang_value = first_item.get('eng', first_item.get(first_lang_key, ''))
-                    if isinstance(lang_value, list) and lang_value:
-                        return str(lang_value[0])
-                    return str(lang_value)
-                return str(value[0])
-            return str(value) if value else ''
-        except:
-            return ''
+        return get_text(obj.get(field, {}))
     
     def _extract_cpv_codes(self, result: Dict) -> List[str]:
         """Extract CPV codes from result"""
-        try:
-            cpv_data = result.get('classification-cpv', [])
-            if isinstance(cpv_data, list):
-                return [str(cpv.get('cpv-code', '')) for cpv in cpv_data if cpv.get('cpv-code')]
-            elif isinstance(cpv_data, dict):
-                return [str(cpv_data.get('cpv-code', ''))] if cpv_data.get('cpv-code') else []
-            return []
-        except:
-            return []
+        return get_cpv_codes(result.get('classification-cpv', []))
     
     def _extract_value(self, result: Dict) -> int:
         """Extract estimated contract value"""
@@ -534,96 +1459,77 @@ class TEDSearchEngine:
     
     def _generate_ted_url(self, result: Dict) -> str:
         """Generate TED URL for the tender"""
-        try:
-            # Try to get direct link first
-            links = result.get('links', [])
-            if links and isinstance(links, list):
-                for link in links:
-                    if isinstance(link, dict) and link.get('href'):
-                        return link['href']
-            
-            # Fallback to publication number
-            pub_number = result.get('publication-number', '')
-            if pub_number:
-                return f"https://ted.europa.eu/udl?uri=TED:NOTICE:{pub_number}:TEXT:EN:HTML"
-            
-            # Final fallback
-            notice_id = result.get('notice-identifier', '')
-            if notice_id:
-                return f"https://ted.europa.eu/notices/{notice_id}"
-            
-            return ''
-        except:
-            return ''
+        return get_ted_url(result)
     
-    def _extract_document_links(self, result: Dict) -> List[Dict]:
+    def _extract_document_links(self, result: Dict) -> Tuple[DocumentLink, ...]:
         """Extract document links from result"""
-        try:
-            links = result.get('links', [])
-            document_links = []
-            
-            if isinstance(links, list):
-                for link in links:
-                    if isinstance(link, dict):
-                        link_info = {
-                            'url': link.get('href', ''),
-                            'type': link.get('type', 'document'),
-                            'description': link.get('description', '')
-                        }
-                        if link_info['url']:
-                            document_links.append(link_info)
-            
-            return document_links
-        except:
-            return []
+        return get_document_links(result.get('links', []), self.strings.intern)
+    
+    def _get_keyword_matcher(self, keywords: List[str]) -> KeywordMatcher:
+        """Compiled matcher for the keyword list, rebuilt only when the list changes"""
+        cached = self._keyword_matchers.get(id(keywords))
+        if cached is not None and cached[0] is keywords and len(keywords) == len(cached[1]):
+            return cached[1]
+        matcher = IndustryTemplates.find_matcher(keywords) or KeywordMatcher(keywords)
+        if len(self._keyword_matchers) >= 64:
+            self._keyword_matchers.clear()
+        # The cached list is kept alive, so its id cannot be reused by another list
+        self._keyword_matchers[id(keywords)] = (keywords, matcher)
+        return matcher
     
-    def _calculate_relevance_score(self, tender_info: Dict, keywords: List[str],
+    def _calculate_relevance_score(self, tender_info: Tender, keywords: List[str],
                                  cpv_codes: List[str], countries: List[str],
                                  min_value: int) -> int:
         """Calculate relevance score based on criteria"""
         score = 0
-        title_lower = tender_info['title'].lower()
-        buyer_lower = tender_info['buyer_name'].lower()
-        tender_cpv = tender_info['cpv_codes']
+        tender_cpv = tender_info.cpv_codes
         
         # Keyword matching (configurable weight)
         keyword_score = 0
         if keywords:
-            keyword_matches = sum(1 for kw in keywords if kw.lower() in title_lower or kw.lower() in buyer_lower)
+            matcher = self._get_keyword_matcher(keywords)
+            keyword_matches = matcher.count_matches(tender_info.title, tender_info.buyer_name)
             keyword_score = min(100, (keyword_matches / len(keywords)) * 100)
         score += (keyword_score * self.scoring_criteria['keywordMatch'] / 100)
         
         # CPV code matching (configurable weight)
         cpv_score = 0
         if cpv_codes and tender_cpv:
-            cpv_matches = sum(1 for cpv in cpv_codes if any(tcpv.startswith(cpv[:4]) for tcpv in tender_cpv))
+            # Full credit inside a requested code's subtree, partial credit by shared depth
+            tender_prefixes = CPVIndex.prefix_set(tender_cpv)
+            cpv_matches = sum(self.cpv_index.match_score(cpv, tender_prefixes) for cpv in cpv_codes)
             cpv_score = min(100, (cpv_matches / len(cpv_codes)) * 100)
         score += (cpv_score * self.scoring_criteria['cpvMatch'] / 100)
         
         # Country preference (configurable weight)
         country_score = 0
-        if tender_info['country'] in countries:
+        if tender_info.country in countries:
             country_score = 100
         score += (country_score * self.scoring_criteria['countryMatch'] / 100)
         
         # Value matching (configurable weight)
         value_score = 0
-        if tender_info['estimated_value_eur'] >= min_value:
+        estimated_value = tender_info.estimated_value_eur
+        if estimated_value >= min_value:
             # Higher value tenders get higher scores
-            if tender_info['estimated_value_eur'] > min_value * 10:
+            if estimated_value > min_value * 10:
                 value_score = 100
-            elif tender_info['estimated_value_eur'] > min_value * 5:
+            elif estimated_value > min_value * 5:
                 value_score = 75
-            elif tender_info['estimated_value_eur'] > min_value:
+            elif estimated_value > min_value:
                 value_score = 50
         score += (value_score * self.scoring_criteria['valueMatch'] / 100)
         
         return min(100, int(score))
     
-    def _determine_status(self, tender_info: Dict) -> str:
+    def _determine_status(self, tender_info: Tender) -> str:
         """Determine if tender is active, expired, or awarded"""
+        return self._status_for_deadline(tender_info.deadline_date)
+    
+    @staticmethod
+    def _status_for_deadline(deadline_str: str) -> str:
+        """Status implied by a submission deadline"""
         try:
-            deadline_str = tender_info['deadline_date']
             if not deadline_str:
                 return 'unknown'
             
@@ -637,4 +1543,4 @@ class TEDSearchEngine:
                 return 'expired'
                 
         except:
-            return 'unknown'
\ No newline at end of file
+            return 'unknown'
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Crawl state for incremental (delta) runs
+Per-query publication-date high-water marks plus fingerprints of emitted notices,
+and the polling statistics of watch mode
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+from ted_models import Tender
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlState:
+    """What previous runs have already fetched and emitted"""
+
+    def __init__(self, watermarks: Optional[Dict[str, str]] = None,
+                 emitted: Optional[Dict[str, list]] = None, retention_days: int = 400,
+                 schedule: Optional[Dict[str, Dict[str, Any]]] = None):
+        # query key -> newest publication date (YYYY-MM-DD) fully fetched
+        self.watermarks = watermarks or {}
+        # publication-number -> [fingerprint, date it was emitted]
+        self.emitted = emitted or {}
+        # query key -> watch-mode polling statistics (see ted_watch)
+        self.schedule = schedule or {}
+        self.retention_days = retention_days
+
+    @staticmethod
+    def query_key(search_config: Dict) -> str:
+        """Stable key for a planned query, independent of whitespace and the pushed deadline clause"""
+        normalized = ' '.join(search_config.get('base_query', search_config['query']).split())
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def fingerprint(tender_info: Tender) -> str:
+        """Hash of the fields whose change makes a notice worth re-emitting"""
+        material = json.dumps([
+            tender_info.title,
+            tender_info.buyer_name,
+            tender_info.deadline_date,
+            tender_info.estimated_value_eur,
+            tender_info.notice_type,
+            sorted(tender_info.cpv_codes)
+        ], separators=(',', ':'))
+        return hashlib.sha1(material.encode('utf-8')).hexdigest()[:16]
+
+    def watermark(self, query_key: str) -> Optional[str]:
+        return self.watermarks.get(query_key)
+
+    def advance(self, query_key: str, publication_date: str):
+        """Move a query's high-water mark forward (never backwards)"""
+        day = publication_date[:10]
+        if day and day > self.watermarks.get(query_key, ''):
+            self.watermarks[query_key] = day
+
+    def classify(self, tender_info: Tender) -> Optional[str]:
+        """'new', 'updated', or None if the notice was already emitted unchanged"""
+        previous = self.emitted.get(tender_info.notice_id)
+        if previous is None:
+            return 'new'
+        if previous[0] != self.fingerprint(tender_info):
+            return 'updated'
+        return None
+
+    def mark_emitted(self, tender_info: Tender):
+        self.emitted[tender_info.notice_id] = [self.fingerprint(tender_info), date.today().isoformat()]
+
+    def prune(self):
+        """Forget notices emitted longer ago than the retention window"""
+        cutoff = (date.today() - timedelta(days=self.retention_days)).isoformat()
+        before = len(self.emitted)
+        self.emitted = {k: v for k, v in self.emitted.items() if not v[1] or v[1] >= cutoff}
+        if before != len(self.emitted):
+            logger.info(f"Pruned {before - len(self.emitted)} notices emitted before {cutoff}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {'version': 1, 'watermarks': self.watermarks, 'emitted': self.emitted}
+        if self.schedule:
+            data['schedule'] = self.schedule
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> 'CrawlState':
+        if not data:
+            return cls()
+        return cls(watermarks=data.get('watermarks', {}), emitted=data.get('emitted', {}),
+                   schedule=data.get('schedule', {}))
+
+
+class KeyValueStateStore:
+    """Keeps crawl state as a JSON record in an Apify key-value store"""
+
+    def __init__(self, kv_store, key: str = 'CRAWL_STATE'):
+        self.kv_store = kv_store
+        self.key = key
+
+    async def load(self) -> CrawlState:
+        return CrawlState.from_dict(await self.kv_store.get_value(self.key))
+
+    async def save(self, state: CrawlState):
+        state.prune()
+        await self.kv_store.set_value(self.key, state.to_dict())
+
+
+class LocalStateStore:
+    """Keeps crawl state as a JSON file in a local directory"""
+
+    def __init__(self, directory: str, key: str = 'CRAWL_STATE'):
+        self.path = os.path.join(directory, f"{key}.json")
+
+    async def load(self) -> CrawlState:
+        if not os.path.exists(self.path):
+            return CrawlState()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return CrawlState.from_dict(json.load(f))
+
+    async def save(self, state: CrawlState):
+        state.prune()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state.to_dict(), f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Local notice store for offline search
+SQLite table of fetched notices with an FTS5 index on title and buyer name
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ted_cpv import significant_digits
+from ted_json import loads
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS notices ("
+    " id INTEGER PRIMARY KEY,"
+    " publication_number TEXT NOT NULL UNIQUE,"
+    " title TEXT NOT NULL,"
+    " buyer_name TEXT NOT NULL,"
+    " country TEXT NOT NULL,"
+    " publication_date TEXT NOT NULL,"
+    " deadline_date TEXT NOT NULL,"
+    " estimated_value_eur INTEGER NOT NULL,"
+    " raw TEXT NOT NULL,"
+    " fetched REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS notice_cpv ("
+    " notice_id INTEGER NOT NULL REFERENCES notices(id) ON DELETE CASCADE,"
+    " cpv_code TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS notices_country ON notices(country)",
+    "CREATE INDEX IF NOT EXISTS notices_publication_date ON notices(publication_date)",
+    "CREATE INDEX IF NOT EXISTS notices_deadline_date ON notices(deadline_date)",
+    "CREATE INDEX IF NOT EXISTS notice_cpv_code ON notice_cpv(cpv_code)",
+    "CREATE INDEX IF NOT EXISTS notice_cpv_notice ON notice_cpv(notice_id)",
+    # External-content FTS index kept in sync by triggers
+    "CREATE VIRTUAL TABLE IF NOT EXISTS notices_fts USING fts5("
+    " title, buyer_name, content='notices', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS notices_ai AFTER INSERT ON notices BEGIN"
+    " INSERT INTO notices_fts(rowid, title, buyer_name) VALUES (new.id, new.title, new.buyer_name);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS notices_ad AFTER DELETE ON notices BEGIN"
+    " INSERT INTO notices_fts(notices_fts, rowid, title, buyer_name)"
+    " VALUES ('delete', old.id, old.title, old.buyer_name);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS notices_au AFTER UPDATE ON notices BEGIN"
+    " INSERT INTO notices_fts(notices_fts, rowid, title, buyer_name)"
+    " VALUES ('delete', old.id, old.title, old.buyer_name);"
+    " INSERT INTO notices_fts(rowid, title, buyer_name) VALUES (new.id, new.title, new.buyer_name);"
+    " END",
+]
+
+
+def _fts_phrase(text: str) -> str:
+    """Quote text as an FTS5 phrase"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+class NoticeStore:
+    """SQLite store of raw notices from every crawl, searchable without the API"""
+
+    def __init__(self, path: str = 'storage/ted_notices.sqlite'):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM notices").fetchone()[0]
+
+    def upsert(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Insert or refresh notices in one transaction
+
+        Each record has publication_number, title, buyer_name, country,
+        publication_date, deadline_date, estimated_value_eur, cpv_codes and
+        the raw notice as returned by the API.
+        """
+        now = time.time()
+        count = 0
+        with self._conn:
+            for record in records:
+                # SQLite integers are 64-bit
+                value = max(-2 ** 63, min(2 ** 63 - 1, record['estimated_value_eur']))
+                raw = json.dumps(record['raw'], separators=(',', ':'))
+                notice_id = self._conn.execute(
+                    "INSERT INTO notices (publication_number, title, buyer_name, country, publication_date,"
+                    " deadline_date, estimated_value_eur, raw, fetched) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(publication_number) DO UPDATE SET title = excluded.title,"
+                    " buyer_name = excluded.buyer_name, country = excluded.country,"
+                    " publication_date = excluded.publication_date, deadline_date = excluded.deadline_date,"
+                    " estimated_value_eur = excluded.estimated_value_eur, raw = excluded.raw,"
+                    " fetched = excluded.fetched"
+                    " RETURNING id",
+                    (record['publication_number'], record['title'], record['buyer_name'], record['country'],
+                     record['publication_date'], record['deadline_date'], value, raw, now)
+                ).fetchone()[0]
+                self._conn.execute("DELETE FROM notice_cpv WHERE notice_id = ?", (notice_id,))
+                self._conn.executemany(
+                    "INSERT INTO notice_cpv (notice_id, cpv_code) VALUES (?, ?)",
+                    [(notice_id, code) for code in dict.fromkeys(record['cpv_codes'])]
+                )
+                count += 1
+        return count
+
+    def query(self, keywords: List[str], cpv_codes: List[str], countries: List[str],
+              year_from: Optional[int] = None, year_to: Optional[int] = None,
+              min_value: int = 0, active_only: bool = False) -> List[Tuple[Dict, float]]:
+        """(raw notice, fetch time) of notices matching the criteria a planned API search uses
+
+        (title matches any keyword OR a CPV code lies in a requested subtree)
+        AND buyer country in countries, narrowed by publication year and, as a
+        conservative pre-filter, value and deadline. Exact filtering and
+        scoring are left to the engine.
+        """
+        conditions, params = [], []
+
+        topic = []
+        if keywords:
+            phrases = ' OR '.join(_fts_phrase(kw) for kw in keywords if kw.strip())
+            if phrases:
+                topic.append("n.id IN (SELECT rowid FROM notices_fts WHERE notices_fts MATCH ?)")
+                params.append(f"title : ({phrases})")
+        if cpv_codes:
+            prefixes = list(dict.fromkeys(significant_digits(c) for c in cpv_codes if significant_digits(c)))
+            if prefixes:
+                globs = ' OR '.join('c.cpv_code GLOB ?' for _ in prefixes)
+                topic.append(f"n.id IN (SELECT c.notice_id FROM notice_cpv c WHERE {globs})")
+                params.extend(f"{prefix}*" for prefix in prefixes)
+        if topic:
+            conditions.append(f"({' OR '.join(topic)})")
+        elif keywords or cpv_codes:
+            return []
+
+        if countries:
+            conditions.append(f"n.country IN ({', '.join('?' for _ in countries)})")
+            params.extend(countries)
+        if year_from:
+            conditions.append("n.publication_date >= ?")
+            params.append(f"{year_from}-01-01")
+        if year_to:
+            conditions.append("n.publication_date < ?")
+            params.append(f"{year_to + 1}-01-01")
+        if min_value > 0:
+            conditions.append("n.estimated_value_eur >= ?")
+            params.append(min(min_value, 2 ** 63 - 1))
+        if active_only:
+            # A day of slack for time zone offsets; status is decided exactly later
+            conditions.append("n.deadline_date >= ?")
+            params.append((date.today() - timedelta(days=1)).isoformat())
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = self._conn.execute(f"SELECT n.raw, n.fetched FROM notices n {where} ORDER BY n.id", params)
+
+        return [(loads(raw), fetched) for raw, fetched in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        count, oldest, newest = self._conn.execute(
+            "SELECT COUNT(*), MIN(publication_date), MAX(publication_date) FROM notices"
+        ).fetchone()
+        return {'notices': count, 'oldest_publication': oldest, 'newest_publication': newest}
+
+    def close(self):
+        self._conn.close()
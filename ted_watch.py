@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Watch mode: a long-running poller over the planned queries
+Each query is polled on its own interval, shortened for queries that keep
+finding new notices and stretched for quiet ones; only new or changed
+tenders are emitted, and the crawl state is checkpointed after every poll
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ted_models import Tender
+from ted_state import CrawlState
+
+logger = logging.getLogger(__name__)
+
+# Weight of older polls in a query's yield rate
+YIELD_DECAY = 0.8
+
+# Intervals range from base / SPREAD (always yields) to base * SPREAD (never yields)
+INTERVAL_SPREAD = 4.0
+
+
+class ScheduledQuery:
+    """A planned query with its polling statistics"""
+
+    def __init__(self, search_config: Dict, key: str, base_interval: float,
+                 stats: Optional[Dict[str, Any]] = None):
+        stats = stats or {}
+        self.search_config = search_config
+        self.key = key
+        self.base_interval = base_interval
+        self.polls = stats.get('polls', 0)
+        self.found = stats.get('found', 0)
+        # Smoothed share of polls that found something new; unknown queries start in the middle
+        self.yield_rate = stats.get('yield_rate', 0.5)
+        self.last_poll = stats.get('last_poll', 0.0)
+        self.next_due = 0.0
+
+    @property
+    def interval(self) -> float:
+        """Seconds between polls, between base / SPREAD and base * SPREAD by yield rate"""
+        return self.base_interval * INTERVAL_SPREAD ** (1 - 2 * self.yield_rate)
+
+    def schedule_from(self, now: float):
+        """Next due time on the monotonic clock, resuming the previous run's schedule"""
+        wait = self.last_poll + self.interval - time.time() if self.last_poll else 0.0
+        self.next_due = now + max(0.0, wait)
+
+    def record(self, found: int, now: float):
+        self.polls += 1
+        self.found += found
+        self.yield_rate = YIELD_DECAY * self.yield_rate + (1 - YIELD_DECAY) * (1.0 if found else 0.0)
+        self.last_poll = time.time()
+        self.next_due = now + self.interval
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'polls': self.polls,
+            'found': self.found,
+            'yield_rate': round(self.yield_rate, 4),
+            'last_poll': round(self.last_poll, 3)
+        }
+
+
+class QueryWatcher:
+    """Polls a search's planned queries until stopped or out of budget
+
+    Polls are incremental searches over the queries that are due, highest
+    yield rate first, so every query reads only past its own high-water
+    mark. A poll interrupted by stop() or the budget has its watermarks
+    rolled back: the next poll fetches its notices again, and skips the
+    ones already pushed since those are marked emitted.
+    """
+
+    def __init__(self, engine, state: CrawlState, search_args: Dict[str, Any],
+                 interval_seconds: float = 900.0, budget_seconds: float = 0.0):
+        self.engine = engine
+        self.state = state
+        self.search_args = search_args
+        self.interval_seconds = max(1.0, interval_seconds)
+        self.budget_seconds = max(0.0, budget_seconds)
+        self.polls = 0
+        self.emitted = 0
+        self._stop = asyncio.Event()
+
+    def stop(self):
+        """Finish at the next opportunity, rolling back a poll in progress"""
+        if not self._stop.is_set():
+            logger.info("Watch mode stopping")
+        self._stop.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def _plan(self) -> List[ScheduledQuery]:
+        args = self.search_args
+        search_queries = self.engine._build_search_queries(
+            args['keywords'], args['cpv_codes'], args['countries'],
+            args['year_from'], args['year_to'], args['min_value'], args['active_only']
+        )
+        now = time.monotonic()
+        scheduled = []
+        for search_config in search_queries:
+            key = CrawlState.query_key(search_config)
+            entry = ScheduledQuery(search_config, key, self.interval_seconds, self.state.schedule.get(key))
+            entry.schedule_from(now)
+            scheduled.append(entry)
+        return scheduled
+
+    async def _wait(self, seconds: float):
+        """Sleep, waking early on stop()"""
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=max(0.0, seconds))
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self, emit: Callable[[AsyncIterator[Tender]], Awaitable[Any]],
+                  checkpoint: Callable[[], Awaitable[Any]]) -> Dict[str, Any]:
+        """Poll until stopped or out of budget
+
+        emit receives each poll's tenders as they arrive and must mark them
+        emitted in the state once they are delivered, not before;
+        checkpoint persists the state after every poll.
+        """
+        await self.engine.probe_pushdown()
+        scheduled = self._plan()
+        if not scheduled:
+            logger.warning("Watch mode has no queries to poll")
+            return self.summary(scheduled)
+        started = time.monotonic()
+        deadline = started + self.budget_seconds if self.budget_seconds else None
+        logger.info(
+            f"Watching {len(scheduled)} queries every {self.interval_seconds / 60:g} min "
+            f"(adaptive), budget {f'{self.budget_seconds / 60:g} min' if deadline else 'unlimited'}"
+        )
+
+        while not self.stopped:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                logger.info("Watch mode run-time budget reached")
+                break
+            due = [entry for entry in scheduled if entry.next_due <= now]
+            if not due:
+                wake = min(entry.next_due for entry in scheduled)
+                await self._wait((min(wake, deadline) if deadline is not None else wake) - now)
+                continue
+
+            # Queries that usually find something go first
+            due.sort(key=lambda entry: (-entry.yield_rate, entry.next_due))
+            completed = await self._poll(due, emit, deadline)
+            if completed:
+                await checkpoint()
+
+        # Persist what the completed polls left behind
+        await checkpoint()
+        return self.summary(scheduled)
+
+    async def _poll(self, due: List[ScheduledQuery],
+                    emit: Callable[[AsyncIterator[Tender]], Awaitable[Any]],
+                    deadline: Optional[float]) -> bool:
+        """One incremental search over the due queries; False if it was interrupted"""
+        state = self.state
+        by_match: Dict[Tuple[str, Tuple[str, ...]], ScheduledQuery] = {
+            (entry.search_config['type'], tuple(entry.search_config['group'])): entry for entry in due
+        }
+        found = {entry.key: 0 for entry in due}
+        changes = {'new': 0, 'updated': 0}
+        # Rolled back if the poll does not finish, so nothing is skipped next time
+        watermarks = dict(state.watermarks)
+
+        async def records() -> AsyncIterator[Tender]:
+            async for tender_info in self.engine.stream_tenders(
+                state=state, search_queries=[entry.search_config for entry in due], **self.search_args
+            ):
+                changes[tender_info.change_type] += 1
+                for match in tender_info.matched_by():
+                    entry = by_match.get((match['search_type'], tuple(match['search_group'])))
+                    if entry is not None:
+                        found[entry.key] += 1
+                yield tender_info
+
+        poll = asyncio.create_task(emit(records()))
+        stop = asyncio.create_task(self._stop.wait())
+        timeout = deadline - time.monotonic() if deadline is not None else None
+        interrupted = False
+        try:
+            await asyncio.wait({poll, stop}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stop.cancel()
+            if not poll.done():
+                interrupted = True
+                poll.cancel()
+                await asyncio.gather(poll, return_exceptions=True)
+                # Tenders pushed before the interruption stay marked emitted
+                state.watermarks = watermarks
+                logger.info(f"Poll of {len(due)} queries interrupted and rolled back")
+        if interrupted:
+            return False
+        poll.result()
+
+        now = time.monotonic()
+        for entry in due:
+            entry.record(found[entry.key], now)
+            state.schedule[entry.key] = entry.stats()
+        self.polls += 1
+        self.emitted += sum(changes.values())
+        self.engine.metrics.count('polls')
+        logger.info(f"Poll of {len(due)} queries: {changes['new']} new, {changes['updated']} updated tenders")
+        return True
+
+    def summary(self, scheduled: List[ScheduledQuery]) -> Dict[str, Any]:
+        return {
+            'polls': self.polls,
+            'emitted': self.emitted,
+            'queries': [
+                {'type': e.search_config['type'], 'group': e.search_config['group'],
+                 'interval_seconds': round(e.interval, 1), **e.stats()}
+                for e in scheduled
+            ]
+        }
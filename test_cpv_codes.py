@@ -6,9 +6,11 @@ Test script to validate which CPV codes are supported by TED API
 import asyncio
 import aiohttp
 import json
-from typing import List, Dict
+from typing import List, Dict, Optional
 
-async def test_cpv_code(cpv_code: str) -> Dict:
+from ted_cache import ResponseCache
+
+async def test_cpv_code(cpv_code: str, cache: Optional[ResponseCache] = None) -> Dict:
     """Test a single CPV code against TED API"""
 
     api_url = "https://api.ted.europa.eu/v3/notices/search"
@@ -25,6 +27,19 @@ async def test_cpv_code(cpv_code: str) -> Dict:
         "fields": ["notice-identifier", "publication-number"]
     }
 
+    if cache is not None:
+        cached = cache.get(search_params)
+        if cached is not None:
+            count = len(cached.get('notices', []))
+            return {
+                'cpv_code': cpv_code,
+                'status': 'VALID',
+                'http_status': 200,
+                'results': count,
+                'message': f'✅ Valid - Found {count} tenders (cached)',
+                'cached': True
+            }
+
     try:
         async with aiohttp.ClientSession() as session:
             async with session.post(
@@ -38,6 +53,8 @@ async def test_cpv_code(cpv_code: str) -> Dict:
 
                 if status == 200:
                     data = await response.json()
+                    if cache is not None:
+                        cache.set(search_params, data)
                     count = len(data.get('notices', []))
                     return {
                         'cpv_code': cpv_code,
@@ -65,7 +82,7 @@ async def test_cpv_code(cpv_code: str) -> Dict:
             'message': f'⚠️ Exception: {str(e)[:200]}'
         }
 
-async def test_all_cpv_codes(cpv_codes: List[str]):
+async def test_all_cpv_codes(cpv_codes: List[str], cache: Optional[ResponseCache] = None):
     """Test all CPV codes with rate limiting"""
 
     print("=" * 80)
@@ -78,13 +95,13 @@ async def test_all_cpv_codes(cpv_codes: List[str]):
     for i, cpv_code in enumerate(cpv_codes, 1):
         print(f"[{i}/{len(cpv_codes)}] Testing CPV code: {cpv_code}...", end=" ")
 
-        result = await test_cpv_code(cpv_code)
+        result = await test_cpv_code(cpv_code, cache)
         results.append(result)
 
         print(result['message'])
 
-        # Rate limiting - wait 1 second between requests
-        if i < len(cpv_codes):
+        # Rate limiting - wait 1 second between requests (not needed for cache hits)
+        if i < len(cpv_codes) and not result.get('cached'):
             await asyncio.sleep(1)
 
     # Summary
@@ -116,6 +133,10 @@ async def test_all_cpv_codes(cpv_codes: List[str]):
 
     print("\n📄 Detailed results saved to: cpv_validation_results.json")
 
+    if cache is not None:
+        stats = cache.stats()
+        print(f"🗄️ Cache: {stats['hits']} hits, {stats['misses']} misses")
+
 if __name__ == '__main__':
     # Your CPV codes from the configuration
     cpv_codes_to_test = [
@@ -129,11 +150,14 @@ if __name__ == '__main__':
         "42122000", "71320000"
     ]
 
+    # Validation results change rarely, so reuse responses for a day
+    cache = ResponseCache('storage/ted_response_cache.sqlite', ttl_seconds=24 * 3600)
+
     # Also test recommended division-level alternatives
     print("\n" + "=" * 80)
     print("PART 1: Testing your original CPV codes")
     print("=" * 80)
-    asyncio.run(test_all_cpv_codes(cpv_codes_to_test))
+    asyncio.run(test_all_cpv_codes(cpv_codes_to_test, cache))
 
     print("\n\n" + "=" * 80)
     print("PART 2: Testing recommended division-level codes")
@@ -148,4 +172,5 @@ if __name__ == '__main__':
         "71000000"   # Architectural, engineering
     ]
 
-    asyncio.run(test_all_cpv_codes(recommended_codes))
+    asyncio.run(test_all_cpv_codes(recommended_codes, cache))
+    cache.close()
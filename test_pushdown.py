@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for filter pushdown probing against a local mock of the search API
+"""
+
+import asyncio
+from typing import Dict, List
+
+from aiohttp import web
+
+from ted_pushdown import PREDICATES, honors_probe
+from ted_search_engine import TEDSearchEngine
+
+FILTERED_FIELDS = [field for field, _ in PREDICATES.values()]
+
+SEARCH_ARGS = dict(keywords=['software'], cpv_codes=[], countries=[], year_from=2024, year_to=2024,
+                   active_only=True, min_value=100000, max_results=100)
+
+
+def make_notices(count: int) -> List[Dict]:
+    return [{
+        'publication-number': f"{i:08d}-2024",
+        'notice-title': {'eng': f"Software platform {i}"},
+        'buyer-name': {'eng': ['City council']},
+        'buyer-country': ['DEU'],
+        'publication-date': '2024-03-01+01:00',
+        'deadline-receipt': '2099-01-01T12:00:00Z',
+        'value-eur': 5000000,
+        'notice-type': 'cn-standard'
+    } for i in range(count)]
+
+
+async def search_with_api(filter_pushdown: bool, hits: int = 50):
+    """Search against an API that accepts filter clauses but answers them with no notices"""
+    notices = make_notices(hits)
+
+    async def handle_search(request: web.Request) -> web.Response:
+        body = await request.json()
+        if any(f"{field}>=" in body['query'] for field in FILTERED_FIELDS):
+            return web.json_response({'notices': [], 'totalNoticeCount': 0})
+        page, limit = body.get('page', 1), body.get('limit', 10)
+        return web.json_response({
+            'notices': notices[(page - 1) * limit:page * limit],
+            'totalNoticeCount': len(notices)
+        })
+
+    app = web.Application()
+    app.router.add_post('/search', handle_search)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    try:
+        engine = TEDSearchEngine(requests_per_second=100, filter_pushdown=filter_pushdown, two_phase=False)
+        engine.api_url = f"http://{host}:{port}/search"
+        async with engine:
+            results = await engine.search_tenders(**SEARCH_ARGS)
+        return results, engine.pushdown_capabilities
+    finally:
+        await runner.cleanup()
+
+
+def test_empty_probe_is_inconclusive():
+    assert honors_probe('publication_date', []) is None
+    assert honors_probe('value', [{'publication-number': '1-2024'}]) is None
+    assert honors_probe('value', [{'value-eur': 5000000}]) is True
+    assert honors_probe('value', [{'value-eur': 5000000}, {'value-eur': 10}]) is False
+
+
+def test_filters_answered_with_nothing_are_not_pushed():
+    results, capabilities = asyncio.run(search_with_api(filter_pushdown=True))
+    baseline, _ = asyncio.run(search_with_api(filter_pushdown=False))
+
+    assert len(baseline) == 50
+    assert sorted(t.notice_id for t in results) == sorted(t.notice_id for t in baseline)
+    assert not any(capabilities.supports(predicate) for predicate in PREDICATES)
+    # Inconclusive probes are not kept for later runs
+    assert not capabilities.complete